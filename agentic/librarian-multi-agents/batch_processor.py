@@ -0,0 +1,220 @@
+"""
+Batch Processor
+Concurrent processing of many documents through the interactive API, with a
+JSON manifest recording each document's progress so interrupted runs resume
+"""
+
+import glob
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Iterable
+
+from document_loader import DocumentLoader, DocumentSaver
+from document_preprocessor import DocumentPreprocessor
+
+MANIFEST_VERSION = 1
+OUTPUT_FORMATS = ("md", "txt", "html", "docx")
+
+class BatchProcessor:
+    """
+    Runs one request over many documents with a pool of workers
+
+    The manifest maps each input path to its status ("pending", "done" or
+    "failed"), output path and timing, and is rewritten atomically after
+    every document. Re-running with the same manifest skips documents that
+    are done (and whose output still exists) and retries the rest.
+
+    All workers share one team, and with it the backend, plan cache and
+    chunk indexes.
+    """
+
+    def __init__(self, team: Any, manifest_path: str,
+                 output_dir: str = "batch_output", output_format: str = "md",
+                 workers: int = 4, preprocess: bool = True, **process_options):
+        """
+        Initialize processor, resuming from manifest_path if it exists
+
+        Args:
+            team: LibrarianAgentsTeam used by every worker
+            manifest_path: JSON progress file
+            output_dir: Directory for the per-document outputs
+            output_format: Output file type: md, txt, html or docx
+            workers: Documents processed concurrently
+            preprocess: Remove repeated headers/footers and page numbers first
+            **process_options: Passed to process_document (e.g. budget_ratio)
+        """
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unsupported output format: {output_format}. "
+                             f"Supported formats: {', '.join(OUTPUT_FORMATS)}")
+        self.team = team
+        self.manifest_path = manifest_path
+        self.output_dir = output_dir
+        self.output_format = output_format
+        self.workers = max(1, workers)
+        self.preprocess = preprocess
+        self.process_options = process_options
+        self._lock = threading.Lock()
+
+        if os.path.exists(manifest_path):
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                self.manifest = json.load(f)
+            if self.manifest.get("version") != MANIFEST_VERSION:
+                raise ValueError(f"Unsupported manifest version in {manifest_path}")
+        else:
+            self.manifest = {"version": MANIFEST_VERSION, "documents": {}}
+
+    @staticmethod
+    def expand_inputs(patterns: Iterable[str] = (), list_file: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Resolve input documents from glob patterns and/or a list file
+
+        A list file is either JSON (a list of paths, or of objects with
+        "input" and optionally "request") or plain text with one path per
+        line; blank lines and lines starting with # are ignored.
+
+        Args:
+            patterns: Glob patterns (recursive ** allowed) or plain paths
+            list_file: Path of a list file
+
+        Returns:
+            Entries {"input": path, "request": per-document request or None},
+            without duplicates, in input order
+        """
+        entries: List[Dict[str, Any]] = []
+        for pattern in patterns:
+            matches = sorted(glob.glob(pattern, recursive=True)) if glob.has_magic(pattern) else [pattern]
+            entries.extend({"input": path, "request": None} for path in matches if os.path.isfile(path))
+
+        if list_file:
+            with open(list_file, 'r', encoding='utf-8') as f:
+                text = f.read()
+            if list_file.lower().endswith(".json"):
+                for item in json.loads(text):
+                    if isinstance(item, str):
+                        entries.append({"input": item, "request": None})
+                    else:
+                        entries.append({"input": item["input"], "request": item.get("request")})
+            else:
+                entries.extend({"input": line.strip(), "request": None} for line in text.splitlines()
+                               if line.strip() and not line.strip().startswith("#"))
+
+        unique: Dict[str, Dict[str, Any]] = {}
+        for entry in entries:
+            unique.setdefault(os.path.normpath(entry["input"]), entry)
+        return list(unique.values())
+
+    def _output_path(self, input_path: str) -> str:
+        """Output file for a new document, numbered if the name is taken"""
+        taken = {document["output"] for document in self.manifest["documents"].values()}
+        stem = Path(input_path).stem
+        candidate = os.path.join(self.output_dir, f"{stem}.{self.output_format}")
+        number = 2
+        while candidate in taken:
+            candidate = os.path.join(self.output_dir, f"{stem}-{number}.{self.output_format}")
+            number += 1
+        return candidate
+
+    def add(self, input_path: str, request: str):
+        """
+        Add a document to the manifest; documents already in it are kept
+
+        Args:
+            input_path: Path of the document
+            request: Processing request for this document
+        """
+        key = os.path.normpath(input_path)
+        with self._lock:
+            if key in self.manifest["documents"]:
+                return
+            self.manifest["documents"][key] = {
+                "request": request, "output": self._output_path(key),
+                "status": "pending", "error": None, "seconds": None
+            }
+
+    def save(self):
+        """Write the manifest atomically (one writer at a time)"""
+        with self._lock:
+            tmp_path = f"{self.manifest_path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.manifest, f, indent=2)
+            os.replace(tmp_path, self.manifest_path)
+
+    def remaining(self) -> List[str]:
+        """Documents still to process: not done, or done but their output is missing"""
+        return [key for key, document in self.manifest["documents"].items()
+                if document["status"] != "done" or not os.path.exists(document["output"])]
+
+    def process_one(self, key: str) -> Dict[str, Any]:
+        """
+        Load, process and save one document
+
+        Args:
+            key: Input path as stored in the manifest
+
+        Returns:
+            The document's manifest entry, updated
+        """
+        document = self.manifest["documents"][key]
+        start = time.perf_counter()
+        try:
+            doc_data = DocumentLoader.load_document(key)
+            if self.preprocess and isinstance(doc_data.get('content'), str):
+                doc_data = DocumentPreprocessor().process(doc_data)
+            result = self.team.process_document(document["request"], doc_data.get('content', ''),
+                                                tables=doc_data.get('tables'), **self.process_options)
+
+            os.makedirs(os.path.dirname(document["output"]) or ".", exist_ok=True)
+            title = Path(key).stem
+            if self.output_format == "html":
+                DocumentSaver.save_html(result, document["output"], title=title)
+            elif self.output_format == "docx":
+                DocumentSaver.save_to_docx(result, document["output"], title=title)
+            else:
+                DocumentSaver.save_text(result, document["output"])
+            update = {"status": "done", "error": None}
+        except Exception as e:
+            update = {"status": "failed", "error": f"{type(e).__name__}: {e}"}
+
+        update["seconds"] = round(time.perf_counter() - start, 2)
+        with self._lock:
+            document.update(update)
+        self.save()
+        return document
+
+    def run(self) -> Dict[str, int]:
+        """
+        Process every remaining document
+
+        Returns:
+            Counts of documents by status
+        """
+        keys = self.remaining()
+        total = len(self.manifest["documents"])
+        print(f"[SYSTEM] {total - len(keys)} of {total} documents already done; "
+              f"processing {len(keys)} with {self.workers} workers")
+        self.save()
+
+        executor = ThreadPoolExecutor(max_workers=self.workers)
+        try:
+            futures = {executor.submit(self.process_one, key): key for key in keys}
+            for finished, future in enumerate(as_completed(futures), 1):
+                key = futures[future]
+                document = future.result()
+                outcome = document["output"] if document["status"] == "done" else document["error"]
+                print(f"[SYSTEM] [{finished}/{len(keys)}] {key}: {document['status']} "
+                      f"({document['seconds']}s) -> {outcome}")
+        finally:
+            # On interrupt, documents not yet started stay pending for the next run
+            executor.shutdown(wait=True, cancel_futures=True)
+        return self.summary()
+
+    def summary(self) -> Dict[str, int]:
+        """Counts of documents by status"""
+        counts = {"pending": 0, "done": 0, "failed": 0}
+        for document in self.manifest["documents"].values():
+            counts[document["status"]] += 1
+        return counts
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+Batch Runner
+Offline processing of many documents through the Message Batches API:
+each stage (planning, subagent tasks, compilation) is one batch across all
+documents, at roughly half the price of interactive calls
+
+Usage:
+    python batch_runner.py -r "Write an executive summary" --state run.json reports/*.pdf
+    python batch_runner.py --state run.json            # resume a submitted run
+"""
+
+import argparse
+import json
+import os
+import re
+import time
+from typing import List, Dict, Any, Optional
+
+from document_loader import DocumentLoader
+from librarian_agents_team import LibrarianAgentsTeam, Task, AgentRole
+
+STATE_VERSION = 1
+STAGES = ("plan", "subagents", "compile", "done")
+JOB_ID = re.compile(r'^[A-Za-z0-9-]{1,48}$')
+
+class BatchRunner:
+    """
+    Runs documents through the team stage by stage with message batches
+
+    All progress lives in a JSON state file, written after every step, so a
+    run can be submitted, left overnight, and resumed by a new process. The
+    team's fast path, plan cache and chunk retrieval apply as in
+    process_document; clarification questions cannot be answered in a batch
+    and are compiled as they are.
+    """
+
+    def __init__(self, team: Optional[LibrarianAgentsTeam] = None,
+                 state_path: str = "batch_state.json", poll_interval: float = 60.0,
+                 max_batch_requests: int = 10000, client=None):
+        """
+        Initialize runner, resuming from state_path if it exists
+
+        Args:
+            team: Team whose agents build the requests (a default team if omitted)
+            state_path: JSON file holding jobs, tasks and in-flight batch ids
+            poll_interval: Seconds between status checks in run()
+            max_batch_requests: Requests per batch; larger stages are split
+            client: Anthropic client for the batch endpoints (defaults to the team's)
+        """
+        self.team = team or LibrarianAgentsTeam()
+        self.state_path = state_path
+        self.poll_interval = poll_interval
+        self.max_batch_requests = max_batch_requests
+        self._client = client
+        self._documents: Dict[str, Any] = {}
+
+        if os.path.exists(state_path):
+            with open(state_path, 'r', encoding='utf-8') as f:
+                self.state = json.load(f)
+            if self.state.get("version") != STATE_VERSION:
+                raise ValueError(f"Unsupported batch state version in {state_path}")
+        else:
+            self.state = {"version": STATE_VERSION, "stage": "plan", "batch_ids": [], "jobs": {}}
+
+    @property
+    def client(self):
+        """Client used for the batch endpoints"""
+        if self._client is not None:
+            return self._client
+        client = getattr(self.team.backend, "client", None)
+        if client is None:
+            raise ValueError("The team's backend has no Anthropic client; pass client= to BatchRunner")
+        return client
+
+    @property
+    def stage(self) -> str:
+        """Current stage: plan, subagents, compile or done"""
+        return self.state["stage"]
+
+    def save(self):
+        """Write the state file atomically"""
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def add_job(self, document_path: str, user_request: str, job_id: Optional[str] = None) -> str:
+        """
+        Queue a document for processing (only before the run starts)
+
+        Args:
+            document_path: Path of the document to load
+            user_request: Instruction for this document
+            job_id: Identifier (letters, digits, dashes); generated if omitted
+
+        Returns:
+            Job id
+        """
+        if self.state["batch_ids"] or self.stage != "plan":
+            raise ValueError("Jobs can only be added before the first batch is submitted")
+        jobs = self.state["jobs"]
+        job_id = job_id or f"job-{len(jobs) + 1:05d}"
+        if not JOB_ID.match(job_id):
+            raise ValueError(f"Invalid job id {job_id!r}: use 1-48 letters, digits or dashes")
+        if job_id in jobs:
+            raise ValueError(f"Duplicate job id: {job_id}")
+        jobs[job_id] = {"document": str(document_path), "request": user_request,
+                        "tasks": None, "direct": False, "output": None, "error": None}
+        return job_id
+
+    def _document(self, job_id: str) -> Any:
+        """Load (once per process) the content of a job's document"""
+        if job_id not in self._documents:
+            doc_data = DocumentLoader.load_document(self.state["jobs"][job_id]["document"])
+            self._documents[job_id] = doc_data["content"]
+        return self._documents[job_id]
+
+    def _active_jobs(self) -> Dict[str, Dict[str, Any]]:
+        return {job_id: job for job_id, job in self.state["jobs"].items() if job["error"] is None}
+
+    def _bind_tasks(self, job_id: str, tasks: List[Task]):
+        """Attach retrieved chunks to planned tasks and store them in the job"""
+        if self.team.retrieval_top_k:
+            content = self._document(job_id)
+            self.team.lead.attach_chunks(tasks, self.team.get_index(content),
+                                         self.team.retrieval_top_k, content)
+        self.state["jobs"][job_id]["tasks"] = [task.to_dict() for task in tasks]
+
+    def _stage_requests(self) -> List[Dict[str, Any]]:
+        """Build the batch requests for the current stage; jobs needing none are settled locally"""
+        requests = []
+        lead = self.team.lead
+        for job_id, job in self._active_jobs().items():
+            if self.stage == "plan":
+                content = self._document(job_id)
+                direct_task = None
+                if self.team.fast_path:
+                    direct_task = self.team.direct_dispatch_task(job["request"], content)
+                if direct_task is not None:
+                    job["direct"] = True
+                    job["tasks"] = [direct_task.to_dict()]
+                    continue
+                if self.team.plan_cache is not None:
+                    cached = self.team.plan_cache.get(self.team.plan_cache.key(job["request"], content))
+                    if cached is not None:
+                        self._bind_tasks(job_id, lead._parse_plan(cached))
+                        continue
+                requests.append({"custom_id": f"{job_id}_plan",
+                                 "params": lead.build_plan_request(job["request"], content)})
+
+            elif job["tasks"] is None:
+                job["error"] = "plan: no result returned"
+
+            elif self.stage == "subagents":
+                for position, data in enumerate(job["tasks"]):
+                    if data["result"] is not None:
+                        continue
+                    task = Task.from_dict(data)
+                    agent = self.team.agents[task.assigned_to]
+                    requests.append({"custom_id": f"{job_id}_t{position}",
+                                     "params": agent.build_request(task, {})})
+
+            elif self.stage == "compile":
+                tasks = [Task.from_dict(data) for data in job["tasks"]]
+                if job["direct"]:
+                    job["output"] = tasks[0].result
+                    continue
+                requests.append({"custom_id": f"{job_id}_compile",
+                                 "params": lead.build_compile_request(tasks, job["request"])})
+        return requests
+
+    def _apply_result(self, custom_id: str, text: Optional[str], error: Optional[str]):
+        """Store one batch result in the job it belongs to"""
+        job_id, _, step = custom_id.rpartition("_")
+        job = self.state["jobs"].get(job_id)
+        if job is None:
+            return
+        if error is not None:
+            job["error"] = f"{step}: {error}"
+            return
+
+        if step == "plan":
+            content = self._document(job_id)
+            task_data = self.team.lead.parse_plan_text(text)
+            try:
+                tasks = self.team.lead._parse_plan(task_data)
+            except (KeyError, TypeError, AttributeError):
+                tasks = None
+            if tasks is None:
+                tasks = [Task(task_id="task_1", description=job["request"], content=content,
+                              assigned_to=AgentRole.SUBAGENT_1)]
+            elif tasks and self.team.plan_cache is not None:
+                self.team.plan_cache.put(self.team.plan_cache.key(job["request"], content), task_data)
+            self._bind_tasks(job_id, tasks)
+        elif step.startswith("t"):
+            data = job["tasks"][int(step[1:])]
+            agent = self.team.agents[AgentRole(data["assigned_to"])]
+            result = agent.parse_result(text)
+            data["result"] = result["result"]
+            data["status"] = result["status"]
+            data["requires_clarification"] = result["needs_clarification"]
+        elif step == "compile":
+            job["output"] = text
+
+    def submit(self) -> List[str]:
+        """
+        Submit the current stage, advancing past stages with nothing to send
+
+        Returns:
+            Ids of the submitted batches (empty once the run is done)
+        """
+        # "submitted" lists the custom ids already sent while a stage is partly submitted
+        while self.stage != "done" and (not self.state["batch_ids"] or "submitted" in self.state):
+            submitted = set(self.state.get("submitted", ()))
+            requests = [request for request in self._stage_requests()
+                        if request["custom_id"] not in submitted]
+            if not requests and not self.state["batch_ids"]:
+                self.state["stage"] = STAGES[STAGES.index(self.stage) + 1]
+                self.save()
+                continue
+            self.state.setdefault("submitted", [])
+            for start in range(0, len(requests), self.max_batch_requests):
+                part = requests[start:start + self.max_batch_requests]
+                batch = self.client.messages.batches.create(requests=part)
+                # Record each batch as soon as it exists, so a failure later in the
+                # loop cannot orphan it or get its requests submitted twice
+                self.state["batch_ids"].append(batch.id)
+                self.state["submitted"].extend(request["custom_id"] for request in part)
+                self.save()
+            print(f"[SYSTEM] Submitted {self.stage} stage: {len(self.state['submitted'])} requests "
+                  f"in {len(self.state['batch_ids'])} batch(es)")
+            del self.state["submitted"]
+            self.save()
+        return list(self.state["batch_ids"])
+
+    def poll(self) -> bool:
+        """
+        Check the in-flight batches; when all have ended, apply their results
+        and move to the next stage
+
+        Returns:
+            True if the stage advanced (or nothing was in flight)
+        """
+        batch_ids = self.state["batch_ids"]
+        if not batch_ids:
+            return True
+        if "submitted" in self.state:
+            # The stage is only partly submitted; submit() sends the rest first
+            return False
+        batches = [self.client.messages.batches.retrieve(batch_id) for batch_id in batch_ids]
+        if any(batch.processing_status != "ended" for batch in batches):
+            return False
+
+        for batch_id in batch_ids:
+            for entry in self.client.messages.batches.results(batch_id):
+                result = entry.result
+                if result.type == "succeeded":
+                    # Join the text blocks as AnthropicBackend does; a reply may have none
+                    text = "".join(block.text for block in result.message.content
+                                   if getattr(block, "type", "text") == "text")
+                    if text:
+                        self._apply_result(entry.custom_id, text, None)
+                    else:
+                        stop_reason = getattr(result.message, "stop_reason", None)
+                        self._apply_result(entry.custom_id, None, f"empty reply (stop_reason {stop_reason})")
+                else:
+                    error = getattr(result, "error", None)
+                    self._apply_result(entry.custom_id, None, str(error) if error else result.type)
+
+        print(f"[SYSTEM] {self.stage} stage finished")
+        self.state["batch_ids"] = []
+        self.state["stage"] = STAGES[STAGES.index(self.stage) + 1]
+        self.save()
+        return True
+
+    def run(self, wait: bool = True) -> Dict[str, Any]:
+        """
+        Drive the run to completion (or one step when wait is False)
+
+        Args:
+            wait: Sleep and poll until every stage has finished
+
+        Returns:
+            Current results (see results())
+        """
+        while True:
+            self.submit()
+            if self.stage == "done":
+                break
+            if self.poll():
+                continue
+            if not wait:
+                break
+            time.sleep(self.poll_interval)
+        return self.results()
+
+    def results(self) -> Dict[str, Any]:
+        """
+        Outputs of finished jobs and errors of failed ones
+
+        Returns:
+            Dictionary of job id -> {"document", "output", "error"}
+        """
+        return {
+            job_id: {"document": job["document"], "output": job["output"], "error": job["error"]}
+            for job_id, job in self.state["jobs"].items()
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description="Process documents with the Message Batches API")
+    parser.add_argument("documents", nargs="*", help="Documents to process (omit to resume)")
+    parser.add_argument("-r", "--request", help="Processing request applied to every document")
+    parser.add_argument("--state", default="batch_state.json", help="State file (default: batch_state.json)")
+    parser.add_argument("--poll-interval", type=float, default=60.0,
+                        help="Seconds between status checks (default: 60)")
+    parser.add_argument("--no-wait", action="store_true", help="Submit or poll once, then exit")
+    args = parser.parse_args()
+
+    runner = BatchRunner(state_path=args.state, poll_interval=args.poll_interval)
+    if args.documents:
+        if not args.request:
+            parser.error("--request is required when adding documents")
+        for path in args.documents:
+            runner.add_job(path, args.request)
+        runner.save()
+    elif not runner.state["jobs"]:
+        parser.error("no documents given and no run to resume")
+
+    results = runner.run(wait=not args.no_wait)
+    if runner.stage != "done":
+        print(f"Run in progress ({runner.stage} stage); resume with: python batch_runner.py --state {args.state}")
+        return
+    for job_id, result in results.items():
+        print(f"\n{'=' * 60}\n{job_id}: {result['document']}\n{'=' * 60}")
+        print(result["output"] if result["error"] is None else f"❌ {result['error']}")
+
+if __name__ == "__main__":
+    main()
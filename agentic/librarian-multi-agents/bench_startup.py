@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Startup Benchmark
+Measures CLI start-up latency and module import cost in fresh interpreters
+
+Usage:
+    python bench_startup.py            # 20 runs per measurement
+    python bench_startup.py --runs 50
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+MEASUREMENTS = [
+    ("cli.py --help", [os.path.join(HERE, "cli.py"), "--help"]),
+    ("cli.py (usage error)", [os.path.join(HERE, "cli.py")]),
+    ("import librarian_agents_team", ["-c", "import librarian_agents_team"]),
+    ("import document_loader", ["-c", "import document_loader"]),
+    ("first get_client()", ["-c", "import librarian_agents_team as t; t.get_client()"]),
+    ("python -c pass (baseline)", ["-c", "pass"]),
+]
+
+def time_command(args, runs: int):
+    """Run a Python command repeatedly in fresh interpreters, returning wall times in ms"""
+    env = dict(os.environ, ANTHROPIC_API_KEY=os.environ.get("ANTHROPIC_API_KEY", "bench"))
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + args, cwd=HERE, env=env,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+def import_breakdown(module: str, top: int = 5):
+    """Return the slowest cumulative imports reported by -X importtime"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=HERE, capture_output=True, text=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line.replace("import time:", "").split("|")
+        rows.append((int(cumulative_us), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark CLI start-up and import latency")
+    parser.add_argument("--runs", type=int, default=20, help="Runs per measurement (default: 20)")
+    args = parser.parse_args()
+
+    print(f"{'Measurement':<32} {'median ms':>10} {'p90 ms':>10} {'min ms':>10}")
+    print("-" * 66)
+    for label, command in MEASUREMENTS:
+        timings = sorted(time_command(command, args.runs))
+        p90 = timings[min(len(timings) - 1, int(len(timings) * 0.9))]
+        print(f"{label:<32} {statistics.median(timings):>10.1f} {p90:>10.1f} {timings[0]:>10.1f}")
+
+    print("\nSlowest imports for `import cli` (cumulative ms):")
+    for cumulative_us, name in import_breakdown("cli"):
+        print(f"  {cumulative_us / 1000:>8.1f}  {name}")
+
+if __name__ == "__main__":
+    main()
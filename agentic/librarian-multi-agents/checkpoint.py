@@ -0,0 +1,114 @@
+"""
+Checkpoint Log
+Append-only JSONL record of a run's plan and finished task results, so a
+crashed or interrupted process_document resumes without repeating paid calls
+"""
+
+import hashlib
+import json
+import os
+import threading
+from typing import List, Dict, Any, Optional, Union
+
+from document_source import MappedDocument
+
+CHECKPOINT_VERSION = 1
+
+class CheckpointLog:
+    """
+    Crash-safe progress log for one request over one document
+
+    Each line is one JSON record, written with flush + fsync before the
+    call returns:
+
+        {"type": "plan", "version", "request", "document", "direct", "tasks": [...]}
+        {"type": "result", "task_id", "result", "status"}   (one per finished task)
+        {"type": "output", "output"}                         (compiled output)
+
+    A torn last line (a crash mid-write) is ignored on load, so everything
+    before it is kept. The document is identified by a content hash; a log
+    is only resumed for the same request and document.
+    """
+
+    def __init__(self, path: str):
+        """
+        Open a checkpoint log, reading any records already in it
+
+        Args:
+            path: JSONL file; created on the first write
+        """
+        self.path = path
+        self.plan: Optional[Dict[str, Any]] = None
+        self.results: Dict[str, Dict[str, Any]] = {}
+        self.output: Optional[str] = None
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            self._load()
+
+    @staticmethod
+    def document_fingerprint(document_content: Union[str, MappedDocument]) -> str:
+        """Content hash identifying a document"""
+        if isinstance(document_content, MappedDocument):
+            return hashlib.sha1(document_content.buffer).hexdigest()
+        return hashlib.sha1(str(document_content).encode('utf-8')).hexdigest()
+
+    def _load(self):
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                if record.get("type") == "plan":
+                    if record.get("version") != CHECKPOINT_VERSION:
+                        raise ValueError(f"Unsupported checkpoint version in {self.path}")
+                    self.plan = record
+                elif record.get("type") == "result":
+                    self.results[record["task_id"]] = record
+                elif record.get("type") == "output":
+                    self.output = record["output"]
+
+    def _append(self, record: Dict[str, Any]):
+        line = json.dumps(record) + "\n"
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def matches(self, user_request: str, document_content: Union[str, MappedDocument]) -> bool:
+        """True if the logged plan is for this request and document"""
+        return (self.plan is not None and self.plan["request"] == user_request
+                and self.plan["document"] == self.document_fingerprint(document_content))
+
+    def record_plan(self, user_request: str, document_content: Union[str, MappedDocument],
+                    tasks: List[Dict[str, Any]], direct: bool = False):
+        """
+        Start the log with a plan (replacing any earlier log at this path)
+
+        Args:
+            user_request: The user's request
+            document_content: The document being processed
+            tasks: Planned tasks (Task.to_dict()); a task whose content is
+                the whole document should have content None
+            direct: The single task is the answer (fast path; no compile)
+        """
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.plan = {"type": "plan", "version": CHECKPOINT_VERSION, "request": user_request,
+                     "document": self.document_fingerprint(document_content), "direct": direct,
+                     "tasks": tasks}
+        self.results = {}
+        self.output = None
+        self._append(self.plan)
+
+    def record_result(self, task_id: str, result: str, status: str = "completed"):
+        """Append a finished task's result"""
+        record = {"type": "result", "task_id": task_id, "result": result, "status": status}
+        self.results[task_id] = record
+        self._append(record)
+
+    def record_output(self, output: str):
+        """Append the compiled output; the run is complete"""
+        self.output = output
+        self._append({"type": "output", "output": output})
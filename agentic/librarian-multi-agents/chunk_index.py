@@ -0,0 +1,233 @@
+"""
+Chunk Retrieval Index
+In-process BM25 inverted index over DocumentChunker output, used to attach
+only the relevant chunks of a document to each agent task
+"""
+
+import hashlib
+import heapq
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+from typing import List, Dict, Any, Optional, Tuple, Union
+
+from document_chunker import DocumentChunker
+from document_source import MappedDocument
+
+INDEX_VERSION = 1
+TOKEN = re.compile(r'[a-z0-9]+')
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have in into is it its of on or that the
+their this to was were will with which what who how all any each these those
+""".split())
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens with common stopwords removed"""
+    return [token for token in TOKEN.findall(text.lower()) if token not in STOPWORDS]
+
+def document_key(content: Union[str, MappedDocument]) -> str:
+    """
+    Stable identity for a document, used to cache and validate indexes
+
+    Args:
+        content: Document text or MappedDocument
+
+    Returns:
+        SHA-1 of the text, or path/size/mtime for a mapped file
+    """
+    if isinstance(content, MappedDocument):
+        stat = os.stat(content.file_path)
+        return f"mmap:{os.path.abspath(content.file_path)}:{stat.st_size}:{stat.st_mtime_ns}"
+    return hashlib.sha1(content.encode('utf-8', errors='replace')).hexdigest()
+
+class BM25Index:
+    """
+    BM25 inverted index over document chunks
+
+    Term weights are fully computed at build time (impact-ordered postings),
+    so a query is a handful of dictionary lookups and additions.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        """
+        Initialize an empty index
+
+        Args:
+            k1: Term-frequency saturation parameter
+            b: Length normalization parameter
+        """
+        self.k1 = k1
+        self.b = b
+        self.chunks: List[Dict[str, Any]] = []
+        self.postings: Dict[str, Dict[int, float]] = {}
+        self.document_key: Optional[str] = None
+
+    @staticmethod
+    def _chunk_text(chunk: Dict[str, Any]) -> str:
+        """Text indexed for a chunk: its content plus structural labels"""
+        labels = []
+        if "chapter" in chunk:
+            labels.append(f"chapter {chunk['chapter']}")
+        if "pages" in chunk:
+            labels.append(" ".join(f"page {page}" for page in chunk["pages"]))
+        return " ".join(labels + [chunk.get("content", "")])
+
+    @classmethod
+    def build(cls, chunks: List[Dict[str, Any]], document_key: Optional[str] = None,
+              k1: float = 1.5, b: float = 0.75) -> "BM25Index":
+        """
+        Build an index from chunks
+
+        Args:
+            chunks: Chunks from DocumentChunker
+            document_key: Identity of the source document (see document_key())
+            k1: Term-frequency saturation parameter
+            b: Length normalization parameter
+
+        Returns:
+            Populated BM25Index
+        """
+        index = cls(k1, b)
+        index.chunks = list(chunks)
+        index.document_key = document_key
+
+        term_counts = [Counter(tokenize(cls._chunk_text(chunk))) for chunk in index.chunks]
+        lengths = [sum(counts.values()) for counts in term_counts]
+        total = len(index.chunks)
+        average = (sum(lengths) / total) if total else 0.0
+
+        document_frequency = Counter()
+        for counts in term_counts:
+            document_frequency.update(counts.keys())
+
+        for chunk_id, counts in enumerate(term_counts):
+            norm = k1 * (1 - b + b * lengths[chunk_id] / average) if average else k1
+            for term, tf in counts.items():
+                df = document_frequency[term]
+                idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+                index.postings.setdefault(term, {})[chunk_id] = idf * tf * (k1 + 1) / (tf + norm)
+
+        return index
+
+    def search(self, query: str, top_k: int = 3) -> List[Tuple[int, float]]:
+        """
+        Rank chunks against a query
+
+        Args:
+            query: Free-text query
+            top_k: Number of results
+
+        Returns:
+            List of (chunk index, score), best first; chunks with no matching
+            terms are never returned
+        """
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            for chunk_id, weight in self.postings.get(term, {}).items():
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + weight
+        return heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+
+    def top_chunks(self, query: str, top_k: int = 3) -> List[Dict[str, Any]]:
+        """
+        Return the best matching chunks in document order
+
+        Args:
+            query: Free-text query
+            top_k: Number of chunks
+
+        Returns:
+            Chunk dictionaries, each with an added "chunk_index" and "score"
+        """
+        hits = sorted(self.search(query, top_k))
+        return [{**self.chunks[chunk_id], "chunk_index": chunk_id, "score": score}
+                for chunk_id, score in hits]
+
+    def save(self, path: str):
+        """
+        Persist the index as JSON
+
+        Args:
+            path: Output file path
+        """
+        data = {
+            "version": INDEX_VERSION,
+            "document_key": self.document_key,
+            "k1": self.k1,
+            "b": self.b,
+            "chunks": self.chunks,
+            "postings": {term: [[chunk_id, weight] for chunk_id, weight in postings.items()]
+                         for term, postings in self.postings.items()}
+        }
+        # Unique per process and thread, so concurrent saves never share a temp file
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, default=str)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        """
+        Load an index saved with save()
+
+        Args:
+            path: Index file path
+
+        Returns:
+            BM25Index
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get("version") != INDEX_VERSION:
+            raise ValueError(f"Unsupported index version in {path}: {data.get('version')}")
+
+        index = cls(data["k1"], data["b"])
+        index.document_key = data.get("document_key")
+        index.chunks = data["chunks"]
+        index.postings = {term: {chunk_id: weight for chunk_id, weight in postings}
+                          for term, postings in data["postings"].items()}
+        return index
+
+    @staticmethod
+    def index_path(document_path: str) -> str:
+        """Conventional location of the index saved next to a document"""
+        return f"{document_path}.bm25.json"
+
+    @classmethod
+    def load_or_build(cls, document_path: str, content: Union[str, MappedDocument],
+                      chunker: Optional[DocumentChunker] = None) -> "BM25Index":
+        """
+        Reuse the index stored next to a document, rebuilding it if stale
+
+        Args:
+            document_path: Path of the source document
+            content: Loaded document content (used to validate the index)
+            chunker: Chunker used if a rebuild is needed
+
+        Returns:
+            BM25Index for the current content
+        """
+        path = cls.index_path(document_path)
+        key = document_key(content)
+        if os.path.exists(path):
+            try:
+                index = cls.load(path)
+                if index.document_key == key:
+                    return index
+            except (ValueError, KeyError, json.JSONDecodeError):
+                pass
+
+        chunks = (chunker or DocumentChunker()).smart_chunk(content)
+        index = cls.build(chunks, document_key=key)
+        # A read-only directory only costs the rebuild next time
+        try:
+            index.save(path)
+        except OSError as e:
+            print(f"[SYSTEM] Could not save chunk index to {path}: {e}")
+        return index
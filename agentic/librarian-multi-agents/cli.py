@@ -7,11 +7,339 @@ Easy-to-use CLI for document processing
 import argparse, sys, os
 from pathlib import Path
 
-from librarian_agents_team import LibrarianAgentsTeam
-from document_loader import DocumentLoader, DocumentSaver
-from document_chunker import DocumentChunker
+# Project modules are imported inside main() once arguments are validated,
+# so --help and usage errors return without loading the agents stack
+
+def add_api_arguments(parser: argparse.ArgumentParser):
+    """Options selecting and configuring the model backend"""
+    parser.add_argument(
+        '--base-url',
+        metavar='URL',
+        help='API endpoint, e.g. a local mock_server.py (no API key needed)'
+    )
+    
+    parser.add_argument(
+        '--max-retries',
+        type=int,
+        default=None,
+        help='SDK retries on rate limits and overloads (default: SDK default)'
+    )
+    
+    parser.add_argument(
+        '--record',
+        metavar='DIR',
+        help='Record every API request/response pair to DIR'
+    )
+    
+    parser.add_argument(
+        '--replay',
+        metavar='DIR',
+        help='Answer API calls from recordings in DIR (no network or API key needed)'
+    )
+    
+    parser.add_argument(
+        '--replay-latency',
+        default=None,
+        help='Simulated latency on replay: seconds, or "recorded" for the original timings'
+    )
+
+def check_api_arguments(args):
+    """Exit with an error if the backend options are unusable"""
+    if args.record and args.replay:
+        print("❌ Error: --record and --replay cannot be combined", file=sys.stderr)
+        sys.exit(1)
+    
+    if not args.replay and not args.base_url and not os.environ.get('ANTHROPIC_API_KEY'):
+        print("❌ Error: ANTHROPIC_API_KEY environment variable not set", file=sys.stderr)
+        print("Set it with: export ANTHROPIC_API_KEY='your-key'", file=sys.stderr)
+        sys.exit(1)
+
+def build_backend(args):
+    """The backend selected by the API options, or None for the default"""
+    from llm_backend import AnthropicBackend, RecordReplayBackend
+    backend = None
+    if args.base_url or args.max_retries is not None:
+        backend = AnthropicBackend(
+            base_url=args.base_url,
+            api_key=os.environ.get('ANTHROPIC_API_KEY') or ('mock' if args.base_url else None),
+            max_retries=args.max_retries
+        )
+    if args.record or args.replay:
+        latency = args.replay_latency
+        if latency not in (None, 'recorded'):
+            latency = float(latency)
+        backend = RecordReplayBackend(args.record or args.replay,
+                                      mode='record' if args.record else 'replay',
+                                      inner=backend, latency=latency)
+    return backend
+
+def batch_main(argv):
+    """Process many documents concurrently, resuming from a manifest"""
+    parser = argparse.ArgumentParser(
+        prog='cli.py batch',
+        description='Process many documents with one request, resumably',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Summarize every PDF under reports/ with 8 workers
+  python cli.py batch "reports/**/*.pdf" -r "Create a 1-page summary" -w 8 -d summaries
+  
+  # Inputs listed in a file; rerun the same command to resume after an interruption
+  python cli.py batch --from-list inputs.txt -r "Extract all tables" -f html
+        """
+    )
+    
+    parser.add_argument(
+        'inputs',
+        nargs='*',
+        help='Input documents or glob patterns (quote patterns to expand ** recursively)'
+    )
+    
+    parser.add_argument(
+        '--from-list',
+        metavar='FILE',
+        help='File listing inputs: one path per line, or JSON [{"input": ..., "request": ...}]'
+    )
+    
+    parser.add_argument(
+        '-r', '--request',
+        type=str,
+        help='Processing request applied to every document without its own'
+    )
+    
+    parser.add_argument(
+        '-d', '--output-dir',
+        default='batch_output',
+        help='Directory for the outputs, one file per document (default: batch_output)'
+    )
+    
+    parser.add_argument(
+        '-f', '--format',
+        choices=['md', 'txt', 'html', 'docx'],
+        default='md',
+        help='Output format (default: md)'
+    )
+    
+    parser.add_argument(
+        '-w', '--workers',
+        type=int,
+        default=4,
+        help='Documents processed concurrently (default: 4)'
+    )
+    
+    parser.add_argument(
+        '--manifest',
+        metavar='FILE',
+        help='Progress manifest, used to resume (default: <output-dir>/manifest.json)'
+    )
+    
+    parser.add_argument(
+        '--chunk-size',
+        type=int,
+        default=8000,
+        help='Maximum chunk size for document processing (default: 8000)'
+    )
+    
+    parser.add_argument(
+        '--budget-mode',
+        type=float,
+        default=None,
+        metavar='RATIO',
+        help='Shrink text sections to RATIO of their tokens before the text agents see them'
+    )
+    
+    parser.add_argument(
+        '--deadline',
+        type=float,
+        default=None,
+        metavar='SECONDS',
+        help='Give up on a document after SECONDS; it is marked failed and retried on the next run'
+    )
+    
+    parser.add_argument(
+        '--best-effort',
+        action='store_true',
+        help='With --deadline, save what finished in time instead of failing the document'
+    )
+    
+    parser.add_argument(
+        '--no-preprocess',
+        action='store_true',
+        help='Skip removal of repeated headers/footers, page numbers and extra whitespace'
+    )
+    
+    parser.add_argument(
+        '--no-fast-path',
+        action='store_true',
+        help='Always plan and compile, even for documents that fit in one chunk'
+    )
+    
+    add_api_arguments(parser)
+    
+    args = parser.parse_args(argv)
+    manifest_path = args.manifest or os.path.join(args.output_dir, 'manifest.json')
+    if not args.inputs and not args.from_list and not os.path.exists(manifest_path):
+        parser.error("no inputs given and no manifest to resume")
+    check_api_arguments(args)
+    
+    from batch_processor import BatchProcessor
+    from document_chunker import DocumentChunker
+    from librarian_agents_team import LibrarianAgentsTeam
+    from plan_cache import PlanCache
+    
+    try:
+        entries = BatchProcessor.expand_inputs(args.inputs, args.from_list)
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"❌ Error reading inputs: {e}", file=sys.stderr)
+        sys.exit(1)
+    if any(entry['request'] is None for entry in entries) and not args.request:
+        parser.error("--request is required for inputs without their own request")
+    
+    # One warm team (backend, plan cache, indexes) shared by all workers
+    team = LibrarianAgentsTeam(backend=build_backend(args),
+                               chunker=DocumentChunker(max_chunk_size=args.chunk_size),
+                               plan_cache=PlanCache(), fast_path=not args.no_fast_path)
+    
+    os.makedirs(os.path.dirname(manifest_path) or '.', exist_ok=True)
+    processor = BatchProcessor(team, manifest_path, output_dir=args.output_dir,
+                               output_format=args.format, workers=args.workers,
+                               preprocess=not args.no_preprocess, budget_ratio=args.budget_mode,
+                               deadline=args.deadline, best_effort=args.best_effort)
+    for entry in entries:
+        processor.add(entry['input'], entry['request'] or args.request)
+    
+    try:
+        counts = processor.run()
+    except KeyboardInterrupt:
+        print(f"\nInterrupted; resume with the same command or --manifest {manifest_path}", file=sys.stderr)
+        sys.exit(130)
+    
+    print(f"✓ {counts['done']} done, {counts['failed']} failed, {counts['pending']} pending "
+          f"(manifest: {manifest_path})")
+    if counts['failed']:
+        sys.exit(1)
+
+def serve_main(argv):
+    """Run the HTTP job server (librarian_server.py) until interrupted"""
+    parser = argparse.ArgumentParser(
+        prog='cli.py serve',
+        description='Serve document jobs over HTTP from one warm process',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python cli.py serve --port 8080 --workers 8 --rpm 50
+  curl -X POST localhost:8080/jobs -d '{"request": "Summarize", "document": "..."}'
+  curl -X POST localhost:8080/jobs -d '{"request": "Summarize", "path": "a.pdf",
+                                        "options": {"priority": "batch", "tenant": "archive"}}'
+  curl localhost:8080/jobs/<job_id>/events
+        """
+    )
+    
+    parser.add_argument('--host', default='127.0.0.1', help='Interface to bind (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8080, help='Port to bind (default: 8080)')
+    
+    parser.add_argument(
+        '-w', '--workers',
+        type=int,
+        default=4,
+        help='Jobs processed concurrently (default: 4)'
+    )
+    
+    parser.add_argument(
+        '--queue-size',
+        type=int,
+        default=100,
+        help='Jobs that may wait before submissions get 429 (default: 100)'
+    )
+    
+    parser.add_argument(
+        '--rpm',
+        type=float,
+        default=None,
+        help='Model requests per minute across all jobs (default: unlimited)'
+    )
+    
+    parser.add_argument(
+        '--max-concurrent-calls',
+        type=int,
+        default=None,
+        help='Model calls in flight at once across all jobs; when all are in use, '
+             'calls of interactive jobs go first and tenants share by weight (default: unlimited)'
+    )
+    
+    parser.add_argument(
+        '--tenant-weight',
+        action='append',
+        default=[],
+        metavar='TENANT=WEIGHT',
+        help='Relative share of model calls for a tenant (default weight: 1; repeatable)'
+    )
+    
+    parser.add_argument(
+        '--no-coalesce',
+        action='store_true',
+        help='Send identical concurrent model calls separately instead of sharing one response'
+    )
+    
+    parser.add_argument(
+        '--document-root',
+        metavar='DIR',
+        help='Let jobs name files under DIR with "path" instead of sending the text'
+    )
+    
+    parser.add_argument(
+        '--chunk-size',
+        type=int,
+        default=8000,
+        help='Maximum chunk size for document processing (default: 8000)'
+    )
+    
+    add_api_arguments(parser)
+    
+    args = parser.parse_args(argv)
+    check_api_arguments(args)
+    tenant_weights = {}
+    for item in args.tenant_weight:
+        tenant, _, weight = item.partition('=')
+        try:
+            tenant_weights[tenant] = float(weight)
+        except ValueError:
+            parser.error(f"--tenant-weight expects TENANT=WEIGHT, got: {item}")
+        if not tenant or tenant_weights[tenant] <= 0:
+            parser.error(f"--tenant-weight expects TENANT=WEIGHT with a positive weight, got: {item}")
+    
+    import asyncio
+    from document_chunker import DocumentChunker
+    from librarian_agents_team import LibrarianAgentsTeam
+    from librarian_server import LibrarianServer
+    from llm_backend import AnthropicBackend, RateLimitedBackend, ScheduledBackend, SingleFlightBackend
+    from plan_cache import PlanCache
+    
+    # One client, rate limiter, scheduler and plan cache for every job;
+    # identical calls from concurrent jobs (same document and request) are made once
+    backend = build_backend(args) or AnthropicBackend()
+    if args.rpm:
+        backend = RateLimitedBackend(backend, requests_per_minute=args.rpm)
+    if args.max_concurrent_calls:
+        backend = ScheduledBackend(backend, args.max_concurrent_calls, tenant_weights=tenant_weights)
+    if not args.no_coalesce:
+        backend = SingleFlightBackend(backend)
+    team = LibrarianAgentsTeam(backend=backend, chunker=DocumentChunker(max_chunk_size=args.chunk_size),
+                               plan_cache=PlanCache())
+    
+    server = LibrarianServer(team, host=args.host, port=args.port, workers=args.workers,
+                             queue_size=args.queue_size, document_root=args.document_root)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        print("\nServer stopped", file=sys.stderr)
 
 def main():
+    if sys.argv[1:2] == ['batch']:
+        return batch_main(sys.argv[2:])
+    if sys.argv[1:2] == ['serve']:
+        return serve_main(sys.argv[2:])
+    
     parser = argparse.ArgumentParser(
         description='Librarian Agents Team - Intelligent Document Processing',
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -28,6 +356,12 @@ Examples:
   
   # Interactive mode
   python cli.py -i document.pdf --interactive
+  
+  # Many documents at once (see: python cli.py batch --help)
+  python cli.py batch "docs/*.pdf" -r "Summarize" -d summaries
+  
+  # HTTP job server (see: python cli.py serve --help)
+  python cli.py serve --port 8080 --workers 8
 
 Supported input formats: .txt, .md, .pdf, .docx, .html
 Supported output formats: .txt, .md, .html, .docx
@@ -62,6 +396,63 @@ Supported output formats: .txt, .md, .html, .docx
         help='Maximum chunk size for document processing (default: 8000)'
     )
     
+    parser.add_argument(
+        '--mmap-threshold',
+        type=int,
+        default=None,
+        metavar='MB',
+        help='Memory-map .txt/.md inputs at least this many megabytes instead of reading them'
+    )
+    
+    parser.add_argument(
+        '--budget-mode',
+        type=float,
+        default=None,
+        metavar='RATIO',
+        help='Shrink text sections to RATIO of their tokens with a local extractive summary '
+             'before the text agents see them (e.g. 0.3; requires numpy)'
+    )
+    
+    parser.add_argument(
+        '--save-index',
+        action='store_true',
+        help='Keep the chunk retrieval index next to the input (<input>.bm25.json) and reuse it on later runs'
+    )
+    
+    parser.add_argument(
+        '--no-preprocess',
+        action='store_true',
+        help='Skip removal of repeated headers/footers, page numbers and extra whitespace'
+    )
+    
+    parser.add_argument(
+        '--no-fast-path',
+        action='store_true',
+        help='Always plan and compile, even for documents that fit in one chunk'
+    )
+    
+    add_api_arguments(parser)
+    
+    parser.add_argument(
+        '--checkpoint',
+        metavar='FILE',
+        help='Log the plan and each finished task to FILE; rerunning the same command resumes from it'
+    )
+    
+    parser.add_argument(
+        '--deadline',
+        type=float,
+        default=None,
+        metavar='SECONDS',
+        help='Give up if the request takes longer than SECONDS (planning, subagents and compilation)'
+    )
+    
+    parser.add_argument(
+        '--best-effort',
+        action='store_true',
+        help='With --deadline, return a compile of the parts that finished in time instead of failing'
+    )
+    
     parser.add_argument(
         '--interactive',
         action='store_true',
@@ -88,23 +479,31 @@ Supported output formats: .txt, .md, .html, .docx
         print(f"❌ Error: Input file not found: {args.input}", file=sys.stderr)
         sys.exit(1)
     
-    # Check API key
-    if not os.environ.get('ANTHROPIC_API_KEY'):
-        print("❌ Error: ANTHROPIC_API_KEY environment variable not set", file=sys.stderr)
-        print("Set it with: export ANTHROPIC_API_KEY='your-key'", file=sys.stderr)
-        sys.exit(1)
+    # Check backend options and API key
+    check_api_arguments(args)
+    
+    from document_loader import DocumentLoader, DocumentSaver
+    from document_preprocessor import DocumentPreprocessor
     
     # Load document
     print("📄 Loading document...", file=sys.stderr)
     try:
         loader = DocumentLoader()
-        doc_data = loader.load_document(str(input_path))
+        mmap_threshold = args.mmap_threshold * 1024 * 1024 if args.mmap_threshold is not None else None
+        doc_data = loader.load_document(str(input_path), mmap_threshold=mmap_threshold)
+        if not args.no_preprocess and isinstance(doc_data.get('content'), str):
+            doc_data = DocumentPreprocessor().process(doc_data)
         content = doc_data.get('content', '')
         
         if args.verbose:
             print(f"✓ Loaded {len(content)} characters", file=sys.stderr)
             if 'page_count' in doc_data:
                 print(f"✓ Document has {doc_data['page_count']} pages", file=sys.stderr)
+            if 'preprocessing' in doc_data:
+                report = doc_data['preprocessing']
+                print(f"✓ Pre-processing saved ~{report['tokens_saved']} tokens "
+                      f"({report['reduction_pct']}%, {report['lines_removed']} header/footer lines)",
+                      file=sys.stderr)
         
         if args.metadata and 'metadata' in doc_data:
             print("\n📊 Document Metadata:", file=sys.stderr)
@@ -120,10 +519,26 @@ Supported output formats: .txt, .md, .html, .docx
     if args.verbose:
         print("🤖 Initializing Librarian Agents Team...", file=sys.stderr)
     
-    team = LibrarianAgentsTeam()
+    from librarian_agents_team import LibrarianAgentsTeam
+    from document_chunker import DocumentChunker
+    chunker = DocumentChunker(max_chunk_size=args.chunk_size)
+    backend = build_backend(args)
+    team = LibrarianAgentsTeam(backend=backend, chunker=chunker, fast_path=not args.no_fast_path)
+    
+    chunk_index = None
+    if args.save_index:
+        from chunk_index import BM25Index
+        chunk_index = BM25Index.load_or_build(str(input_path), content, chunker)
+        if args.verbose:
+            print(f"✓ Retrieval index: {len(chunk_index.chunks)} chunks "
+                  f"({BM25Index.index_path(str(input_path))})", file=sys.stderr)
     
     # Interactive mode
     if args.interactive:
+        from document_session import DocumentSession
+        session = DocumentSession(team, content, tables=doc_data.get('tables'),
+                                  chunk_index=chunk_index, budget_ratio=args.budget_mode)
+        
         print("\n" + "="*60)
         print("Interactive Mode - Librarian Agents Team")
         print("="*60)
@@ -147,10 +562,10 @@ Supported output formats: .txt, .md, .html, .docx
                 
                 if request.lower() == 'continue':
                     print("\n🤖 Processing continuation...\n")
-                    result = team.continue_processing()
+                    result = session.continue_answer()
                 else:
                     print("\n🤖 Processing request...\n")
-                    result = team.process_document(request, content)
+                    result = session.ask(request)
                 
                 print("\n" + "="*60)
                 print("RESULT")
@@ -185,7 +600,16 @@ Supported output formats: .txt, .md, .html, .docx
             print("🤖 Processing...\n", file=sys.stderr)
         
         try:
-            result = team.process_document(args.request, content)
+            result = team.process_document(args.request, content, chunk_index=chunk_index,
+                                           budget_ratio=args.budget_mode,
+                                           tables=doc_data.get('tables'),
+                                           checkpoint=args.checkpoint,
+                                           deadline=args.deadline, best_effort=args.best_effort)
+            
+            if args.verbose and 'budget_mode' in team.run_stats:
+                savings = team.run_stats['budget_mode']
+                print(f"✓ Budget mode saved ~{savings['tokens_saved']} input tokens "
+                      f"({savings['reduction_pct']}%)", file=sys.stderr)
             
             # Output result
             if args.output:
@@ -3,9 +3,13 @@ Document Chunking Utilities
 Helper functions for splitting large documents into manageable chunks
 """
 
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Iterator, Union
 import re
 
+from document_source import MappedDocument
+
+PAGE_MARKER_BYTES = re.compile(rb'-{3,}\s*Page\s+(\d+)\s*-{3,}')
+
 class DocumentChunker:
     """Handles intelligent document chunking based on structure"""
     
@@ -162,17 +166,117 @@ class DocumentChunker:
         
         return chunks
     
-    def smart_chunk(self, content: str, preserve_structure: bool = True) -> List[Dict[str, any]]:
+    def iter_mapped_chunks(self, source: MappedDocument) -> Iterator[Dict[str, any]]:
+        """
+        Chunk a memory-mapped document by byte ranges
+        
+        Page markers are located with a bytes regex over the mapping; otherwise
+        paragraph offsets are used. Adjacent spans are grouped up to
+        max_chunk_size bytes and each chunk is decoded only when yielded.
+        Spans larger than max_chunk_size (e.g. a file without blank lines)
+        are cut at line breaks, or at the byte limit when a line is longer.
+        
+        Args:
+            source: Memory-mapped document
+            
+        Yields:
+            Chunks with content, byte offsets and metadata
+        """
+        page_numbers = {}
+        markers = list(PAGE_MARKER_BYTES.finditer(source.buffer))
+        if markers:
+            spans = []
+            if markers[0].start() > 0:
+                spans.append((0, markers[0].start()))
+            for i, marker in enumerate(markers):
+                end = markers[i + 1].start() if i + 1 < len(markers) else len(source)
+                spans.append((marker.start(), end))
+                page_numbers[marker.start()] = int(marker.group(1))
+        else:
+            spans = source.iter_paragraph_spans()
+        
+        chunk_num = 0
+        chunk_start = chunk_end = None
+        chunk_pages = []
+        
+        def build():
+            chunk = {
+                "content": source.slice(chunk_start, chunk_end),
+                "chunk_id": chunk_num,
+                "start_offset": chunk_start,
+                "end_offset": chunk_end,
+                "type": "pages" if chunk_pages else "section"
+            }
+            if chunk_pages:
+                chunk.update({
+                    "pages": chunk_pages.copy(),
+                    "start_page": chunk_pages[0],
+                    "end_page": chunk_pages[-1]
+                })
+            return chunk
+        
+        page = None
+        for span_start, span_end in spans:
+            if span_start in page_numbers:
+                page = page_numbers[span_start]
+            for start, end in self._split_span(source, span_start, span_end):
+                if chunk_start is not None and end - chunk_start > self.max_chunk_size:
+                    yield build()
+                    chunk_num += 1
+                    chunk_start = None
+                    chunk_pages = []
+                if chunk_start is None:
+                    chunk_start = start
+                chunk_end = end
+                if page is not None and (not chunk_pages or chunk_pages[-1] != page):
+                    chunk_pages.append(page)
+        
+        if chunk_start is not None:
+            yield build()
+    
+    def _split_span(self, source: MappedDocument, start: int, end: int) -> Iterator[Tuple[int, int]]:
+        """Cut a byte range into pieces of at most max_chunk_size bytes"""
+        buffer = source.buffer
+        while end - start > self.max_chunk_size:
+            limit = start + self.max_chunk_size
+            cut = buffer.rfind(b'\n', start, limit) + 1
+            if cut <= start:
+                # No line break: cut at the limit, on a UTF-8 character boundary
+                cut = limit
+                while cut > start + 1 and (buffer[cut] & 0xC0) == 0x80:
+                    cut -= 1
+            yield start, cut
+            start = cut
+        if end > start:
+            yield start, end
+    
+    def chunk_mapped(self, source: MappedDocument) -> List[Dict[str, any]]:
+        """
+        Split a memory-mapped document into chunks
+        
+        Args:
+            source: Memory-mapped document
+            
+        Returns:
+            List of chunks with metadata
+        """
+        return list(self.iter_mapped_chunks(source))
+    
+    def smart_chunk(self, content: Union[str, MappedDocument],
+                    preserve_structure: bool = True) -> List[Dict[str, any]]:
         """
         Intelligently chunk document based on its structure
         
         Args:
-            content: Document content
+            content: Document content, or a MappedDocument for very large files
             preserve_structure: Try to preserve document structure in chunks
             
         Returns:
             List of chunks with metadata
         """
+        if isinstance(content, MappedDocument):
+            return self.chunk_mapped(content)
+        
         # Try to detect document structure
         has_pages = bool(re.search(r'-{3,}\s*Page\s+\d+\s*-{3,}', content))
         has_chapters = bool(re.search(r'(CHAPTER|Chapter)\s+(\d+|[IVXLCDM]+)', content))
@@ -214,6 +318,29 @@ class ChunkMerger:
         """
         return separator.join([chunk.get("content", "") for chunk in chunks])
     
+    @staticmethod
+    def expand_duplicates(chunks: List[Dict[str, any]]) -> List[Dict[str, any]]:
+        """
+        Restore chunks collapsed by NearDuplicateDetector.collapse_chunks
+        
+        Each processed representative is copied back into the positions of
+        the near-duplicates it stood in for, so the result can be merged
+        like the original sequence.
+        
+        Args:
+            chunks: Processed unique chunks carrying "position" and "duplicates"
+            
+        Returns:
+            Full chunk list in original order; copies carry "duplicate_of"
+        """
+        expanded = {}
+        for chunk in chunks:
+            position = chunk.get("position", len(expanded))
+            expanded[position] = chunk
+            for duplicate in chunk.get("duplicates", []):
+                expanded[duplicate] = {**chunk, "position": duplicate, "duplicate_of": position}
+        return [expanded[position] for position in sorted(expanded)]
+    
     @staticmethod
     def merge_with_headers(chunks: List[Dict[str, any]]) -> str:
         """
@@ -242,16 +369,32 @@ class ChunkMerger:
         
         return "".join(result)
 
-def load_document(file_path: str) -> str:
+def estimate_tokens(content: str, chars_per_token: int = 4) -> int:
+    """
+    Estimate the number of input tokens in a piece of text
+    
+    Args:
+        content: Text to measure
+        chars_per_token: Average characters per token
+        
+    Returns:
+        Estimated token count
+    """
+    return (len(content) + chars_per_token - 1) // chars_per_token
+
+def load_document(file_path: str, use_mmap: bool = False) -> Union[str, MappedDocument]:
     """
     Load document from file
     
     Args:
         file_path: Path to document file
+        use_mmap: Return a lazily decoded MappedDocument instead of a string
         
     Returns:
-        Document content as string
+        Document content as string, or a MappedDocument when use_mmap is set
     """
+    if use_mmap:
+        return MappedDocument(file_path)
     with open(file_path, 'r', encoding='utf-8') as f:
         return f.read()
 
@@ -0,0 +1,256 @@
+"""
+Near-Duplicate Detection
+MinHash/LSH detection of near-identical paragraphs or chunks, so repeated
+boilerplate is sent to the agents only once
+"""
+
+import string
+import zlib
+from typing import List, Dict, Any, Tuple, Iterable
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+MAX_HASH = (1 << 32) - 1
+# Punctuation becomes whitespace so str.split() yields bare words
+PUNCTUATION_TO_SPACE = str.maketrans({char: ' ' for char in string.punctuation})
+
+# Work is done in blocks of this many shingles to bound peak memory
+SHINGLE_BLOCK = 1 << 18
+PERM_BLOCK = 32
+
+class NearDuplicateDetector:
+    """
+    Groups near-identical texts using MinHash signatures and LSH banding
+
+    Texts are shingled into word n-grams, hashed, and reduced to MinHash
+    signatures with NumPy. Locality-sensitive hashing over signature bands
+    yields candidate groups, which are confirmed by estimated Jaccard
+    similarity. Each group is represented by its earliest member.
+    """
+
+    def __init__(self, threshold: float = 0.85, num_perm: int = 128,
+                 shingle_size: int = 3, seed: int = 1):
+        """
+        Initialize detector
+
+        Args:
+            threshold: Minimum estimated Jaccard similarity to treat two
+                texts as duplicates
+            num_perm: Number of MinHash permutations (signature length)
+            shingle_size: Words per shingle
+            seed: Random seed for the hash permutations
+        """
+        if np is None:
+            raise ImportError(
+                "numpy is required for near-duplicate detection. "
+                "Install it with: pip install numpy --break-system-packages"
+            )
+
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.bands, self.rows = self._choose_bands(threshold, num_perm)
+
+        # Multiply-shift hash family: h(x) = (a * x + b) >> 32 with odd a,
+        # computed in wrapping uint64 arithmetic (no modulo needed)
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(0, 1 << 62, size=num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self._b = rng.randint(0, 1 << 62, size=num_perm, dtype=np.uint64)
+        self._band_mix = rng.randint(0, 1 << 62, size=self.rows, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+
+    @staticmethod
+    def _choose_bands(threshold: float, num_perm: int) -> Tuple[int, int]:
+        """Pick (bands, rows) whose LSH S-curve threshold is closest to the target"""
+        best = (num_perm, 1)
+        best_error = float('inf')
+        for rows in range(1, num_perm + 1):
+            bands = num_perm // rows
+            if bands == 0:
+                break
+            error = abs((1.0 / bands) ** (1.0 / rows) - threshold)
+            if error < best_error:
+                best, best_error = (bands, rows), error
+        return best
+
+    def _shingle_hashes(self, texts: List[str]) -> Tuple["np.ndarray", "np.ndarray"]:
+        """
+        Hash every word n-gram of every text
+
+        Returns:
+            Tuple of (uint64 shingle hashes, owning text index per shingle)
+        """
+        all_tokens: List[str] = []
+        lengths = np.zeros(len(texts), dtype=np.int64)
+        for i, text in enumerate(texts):
+            tokens = text.lower().translate(PUNCTUATION_TO_SPACE).split()
+            lengths[i] = len(tokens)
+            all_tokens.extend(tokens)
+
+        # Hash each distinct word once (crc32 keeps hashes stable across runs),
+        # then map the token stream through the table at C speed
+        vocabulary = {token: i for i, token in enumerate(dict.fromkeys(all_tokens))}
+        vocab_hashes = np.fromiter(
+            (zlib.crc32(token.encode('utf-8')) for token in vocabulary),
+            dtype=np.uint64, count=len(vocabulary)
+        )
+        token_ids = np.fromiter(map(vocabulary.__getitem__, all_tokens),
+                                dtype=np.int64, count=len(all_tokens))
+        tokens = vocab_hashes[token_ids]
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1])) if len(texts) else lengths
+        owner = np.repeat(np.arange(len(texts)), lengths)
+
+        # Texts shorter than one shingle are hashed as a single shorter shingle
+        k = np.minimum(self.shingle_size, lengths)
+        valid = np.zeros(len(tokens), dtype=bool)
+        if len(tokens):
+            position = np.arange(len(tokens)) - starts[owner]
+            valid = position <= (lengths - k)[owner]
+
+        hashes = np.zeros(int(valid.sum()), dtype=np.uint64)
+        index = np.nonzero(valid)[0]
+        span = k[owner[index]]
+        for offset in range(self.shingle_size):
+            inside = offset < span
+            term = np.zeros(len(index), dtype=np.uint64)
+            term[inside] = tokens[index[inside] + offset]
+            hashes = hashes * np.uint64(1000003) + term
+        hashes &= np.uint64(MAX_HASH)
+        return hashes, owner[index]
+
+    def signatures(self, texts: Iterable[str]) -> "np.ndarray":
+        """
+        Compute MinHash signatures
+
+        Args:
+            texts: Texts to sign
+
+        Returns:
+            Array of shape (len(texts), num_perm); texts without words get a
+            signature of MAX_HASH values
+        """
+        texts = list(texts)
+        hashes, owner = self._shingle_hashes(texts)
+        signatures = np.full((len(texts), self.num_perm), MAX_HASH, dtype=np.uint64)
+        if not len(hashes):
+            return signatures
+
+        # Shingle blocks are cut on text boundaries so reduceat stays per-text
+        boundaries = np.nonzero(np.diff(owner))[0] + 1
+        segment_starts = np.concatenate(([0], boundaries))
+        block_start = 0
+        while block_start < len(segment_starts):
+            first = segment_starts[block_start]
+            block_end = np.searchsorted(segment_starts, first + SHINGLE_BLOCK, side='left')
+            block_end = max(block_end, block_start + 1)
+            last = segment_starts[block_end] if block_end < len(segment_starts) else len(hashes)
+
+            block = hashes[first:last]
+            seg = segment_starts[block_start:block_end] - first
+            texts_in_block = owner[segment_starts[block_start:block_end]]
+            for p in range(0, self.num_perm, PERM_BLOCK):
+                a = self._a[p:p + PERM_BLOCK, None]
+                b = self._b[p:p + PERM_BLOCK, None]
+                permuted = (a * block[None, :] + b) >> np.uint64(32)
+                signatures[texts_in_block, p:p + PERM_BLOCK] = np.minimum.reduceat(permuted, seg, axis=1).T
+            block_start = block_end
+
+        return signatures
+
+    def find_representatives(self, texts: Iterable[str]) -> List[int]:
+        """
+        Map each text to the index of its group's representative
+
+        Args:
+            texts: Texts to compare
+
+        Returns:
+            List where entry i is the index of the earliest near-duplicate
+            of text i (i itself for unique texts)
+        """
+        signatures = self.signatures(texts)
+        count = len(signatures)
+        parent = np.arange(count)
+        has_words = (signatures != MAX_HASH).any(axis=1)
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        candidates = np.nonzero(has_words)[0]
+        edges = []
+        # With fewer than two texts that have words there is nothing to compare
+        for band in range(self.bands if len(candidates) > 1 else 0):
+            columns = signatures[candidates, band * self.rows:(band + 1) * self.rows]
+            # Fold each band into one uint64 key so bucketing is a 1-D sort
+            keys = (columns * self._band_mix).sum(axis=1)
+            order = np.argsort(keys, kind='stable')
+            sorted_keys = keys[order]
+            is_start = np.concatenate(([True], sorted_keys[1:] != sorted_keys[:-1]))
+            leaders = order[np.maximum.accumulate(np.where(is_start, np.arange(len(order)), 0))]
+            members = candidates[order[~is_start]]
+            heads = candidates[leaders[~is_start]]
+            if len(members):
+                edges.append(np.stack((heads, members), axis=1))
+
+        if edges:
+            # Each candidate pair is verified once, however many bands it shared
+            pairs = np.unique(np.concatenate(edges), axis=0)
+            similarity = (signatures[pairs[:, 0]] == signatures[pairs[:, 1]]).mean(axis=1)
+            for head, member in pairs[similarity >= self.threshold].tolist():
+                root_head, root_member = find(head), find(member)
+                if root_member != root_head:
+                    # The earliest index stays the root, so it becomes the representative
+                    parent[max(root_member, root_head)] = min(root_member, root_head)
+
+        return [int(find(i)) for i in range(count)]
+
+    def collapse(self, texts: Iterable[str]) -> Tuple[List[str], Dict[int, List[int]]]:
+        """
+        Keep one representative per group of near-duplicates
+
+        Args:
+            texts: Texts to collapse (e.g. paragraphs)
+
+        Returns:
+            Tuple of (unique texts in original order, back-references mapping
+            each unique text's position to all original indexes it stands for)
+        """
+        texts = list(texts)
+        representatives = self.find_representatives(texts)
+        unique_index: Dict[int, int] = {}
+        unique: List[str] = []
+        back_refs: Dict[int, List[int]] = {}
+        for i, representative in enumerate(representatives):
+            if representative not in unique_index:
+                unique_index[representative] = len(unique)
+                unique.append(texts[representative])
+            back_refs.setdefault(unique_index[representative], []).append(i)
+        return unique, back_refs
+
+    def collapse_chunks(self, chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Drop near-duplicate chunks, recording back-references on the survivors
+
+        Each returned chunk gets a "position" (its index in the input) and a
+        "duplicates" list of positions it stands in for. Pass the processed
+        chunks to ChunkMerger.expand_duplicates to restore the full sequence.
+
+        Args:
+            chunks: Chunks from DocumentChunker
+
+        Returns:
+            Unique chunks in original order
+        """
+        representatives = self.find_representatives(chunk.get("content", "") for chunk in chunks)
+        unique: Dict[int, Dict[str, Any]] = {}
+        for position, representative in enumerate(representatives):
+            if representative == position:
+                unique[position] = {**chunks[position], "position": position, "duplicates": []}
+            else:
+                unique[representative]["duplicates"].append(position)
+        return list(unique.values())
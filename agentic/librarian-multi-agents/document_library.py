@@ -0,0 +1,287 @@
+"""
+Document Library
+Persistent SQLite (FTS5) store of loaded documents and their chunks, so
+requests can span a whole collection without re-loading every file
+"""
+
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Iterable, Union
+
+from document_chunker import DocumentChunker
+from document_loader import DocumentLoader
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL UNIQUE,
+    title TEXT,
+    content_hash TEXT NOT NULL,
+    structure TEXT,
+    metadata TEXT,
+    added_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS chunks (
+    id INTEGER PRIMARY KEY,
+    document_id INTEGER NOT NULL REFERENCES documents(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    content TEXT NOT NULL,
+    metadata TEXT
+);
+
+CREATE INDEX IF NOT EXISTS chunks_document ON chunks(document_id, position);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(
+    content, content='chunks', content_rowid='id', tokenize='porter unicode61'
+);
+
+CREATE TRIGGER IF NOT EXISTS chunks_ai AFTER INSERT ON chunks BEGIN
+    INSERT INTO chunks_fts(rowid, content) VALUES (new.id, new.content);
+END;
+
+CREATE TRIGGER IF NOT EXISTS chunks_ad AFTER DELETE ON chunks BEGIN
+    INSERT INTO chunks_fts(chunks_fts, rowid, content) VALUES ('delete', old.id, old.content);
+END;
+"""
+
+class DocumentLibrary:
+    """
+    Local library of documents backed by SQLite with full-text search
+
+    Documents are keyed by their source (file path or caller-supplied name).
+    Re-adding an unchanged document is a no-op; a changed one has its chunks
+    replaced. Chunks are searchable with FTS5 BM25 ranking.
+    """
+
+    def __init__(self, db_path: str = "library.db", chunker: Optional[DocumentChunker] = None):
+        """
+        Open (or create) a library
+
+        Args:
+            db_path: SQLite database file (":memory:" for a throwaway library)
+            chunker: Chunker used when documents are added
+        """
+        self.db_path = db_path
+        self.chunker = chunker or DocumentChunker()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA foreign_keys = ON")
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        """Close the database connection"""
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @staticmethod
+    def _structure(content: str, doc_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Structure metadata recorded for each document"""
+        return {
+            "characters": len(content),
+            "page_count": doc_data.get("page_count", len(re.findall(r'-{3,}\s*Page\s+\d+\s*-{3,}', content))),
+            "chapter_count": len(re.findall(r'(?m)^\s*(?:CHAPTER|Chapter)\s+(?:\d+|[IVXLCDM]+)', content)),
+            "table_count": len(doc_data.get("tables", [])),
+            "file_type": doc_data.get("file_type")
+        }
+
+    def add_document(self, source: Union[str, Path], content: Optional[str] = None,
+                     title: Optional[str] = None,
+                     doc_data: Optional[Dict[str, Any]] = None) -> int:
+        """
+        Add or update a document
+
+        Args:
+            source: File path, or a unique name when content is given directly
+            content: Document text; loaded from source when omitted
+            title: Display title (defaults to the file name)
+            doc_data: Result of DocumentLoader.load_document, if already loaded
+
+        Returns:
+            Document id
+        """
+        source = str(source)
+        if doc_data is None and content is None:
+            doc_data = DocumentLoader.load_document(source)
+        doc_data = doc_data or {}
+        if content is None:
+            content = str(doc_data.get("content", ""))
+
+        content_hash = hashlib.sha1(content.encode('utf-8', errors='replace')).hexdigest()
+        title = title or Path(source).name
+
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT id, content_hash FROM documents WHERE source = ?", (source,)
+            ).fetchone()
+            if row and row["content_hash"] == content_hash:
+                return row["id"]
+
+            structure = json.dumps(self._structure(content, doc_data))
+            metadata = json.dumps(doc_data.get("metadata", {}), default=str)
+            if row:
+                document_id = row["id"]
+                self._conn.execute("DELETE FROM chunks WHERE document_id = ?", (document_id,))
+                self._conn.execute(
+                    "UPDATE documents SET title = ?, content_hash = ?, structure = ?, "
+                    "metadata = ?, added_at = ? WHERE id = ?",
+                    (title, content_hash, structure, metadata, time.time(), document_id)
+                )
+            else:
+                document_id = self._conn.execute(
+                    "INSERT INTO documents (source, title, content_hash, structure, metadata, added_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (source, title, content_hash, structure, metadata, time.time())
+                ).lastrowid
+
+            chunks = self.chunker.smart_chunk(content)
+            self._conn.executemany(
+                "INSERT INTO chunks (document_id, position, content, metadata) VALUES (?, ?, ?, ?)",
+                [
+                    (document_id, position, chunk.get("content", ""),
+                     json.dumps({k: v for k, v in chunk.items() if k != "content"}, default=str))
+                    for position, chunk in enumerate(chunks)
+                ]
+            )
+            return document_id
+
+    def add_directory(self, directory: str, patterns: Iterable[str] = ('*',), **kwargs) -> List[int]:
+        """
+        Add every supported document in a directory, loading files concurrently
+
+        Args:
+            directory: Directory to scan
+            patterns: Glob patterns to include
+            **kwargs: Passed to DocumentLoader.load_directory
+
+        Returns:
+            Ids of the added or updated documents
+        """
+        return [
+            self.add_document(path, doc_data=doc_data)
+            for path, doc_data in DocumentLoader.load_directory(directory, patterns, **kwargs)
+        ]
+
+    def remove_document(self, document: Union[int, str]) -> bool:
+        """
+        Remove a document and its chunks
+
+        Args:
+            document: Document id or source
+
+        Returns:
+            True if a document was removed
+        """
+        column = "id" if isinstance(document, int) else "source"
+        with self._lock, self._conn:
+            cursor = self._conn.execute(f"DELETE FROM documents WHERE {column} = ?", (document,))
+            return cursor.rowcount > 0
+
+    def list_documents(self) -> List[Dict[str, Any]]:
+        """
+        List documents in the library
+
+        Returns:
+            Document records with structure metadata and chunk counts
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT d.id, d.source, d.title, d.structure, d.added_at, COUNT(c.id) AS chunk_count "
+                "FROM documents d LEFT JOIN chunks c ON c.document_id = d.id "
+                "GROUP BY d.id ORDER BY d.id"
+            ).fetchall()
+        return [{**dict(row), "structure": json.loads(row["structure"] or "{}")} for row in rows]
+
+    def get_document(self, document: Union[int, str]) -> Optional[Dict[str, Any]]:
+        """
+        Fetch a document with its reassembled content
+
+        Args:
+            document: Document id or source
+
+        Returns:
+            Document record with "content" and "chunks", or None
+        """
+        column = "id" if isinstance(document, int) else "source"
+        with self._lock:
+            row = self._conn.execute(f"SELECT * FROM documents WHERE {column} = ?", (document,)).fetchone()
+            if row is None:
+                return None
+            chunks = self._conn.execute(
+                "SELECT content, metadata FROM chunks WHERE document_id = ? ORDER BY position", (row["id"],)
+            ).fetchall()
+        chunk_list = [{**json.loads(c["metadata"] or "{}"), "content": c["content"]} for c in chunks]
+        return {
+            **dict(row),
+            "structure": json.loads(row["structure"] or "{}"),
+            "metadata": json.loads(row["metadata"] or "{}"),
+            "chunks": chunk_list,
+            "content": "\n\n".join(chunk["content"] for chunk in chunk_list)
+        }
+
+    @staticmethod
+    def _fts_query(query: str) -> str:
+        """Turn free text into an FTS5 OR-query of quoted terms"""
+        terms = re.findall(r'\w+', query.lower())
+        return " OR ".join(f'"{term}"' for term in dict.fromkeys(terms))
+
+    def search(self, query: str, limit: int = 20,
+               document_ids: Optional[Iterable[int]] = None) -> List[Dict[str, Any]]:
+        """
+        Full-text search over all chunks in the library
+
+        Args:
+            query: Free-text query
+            limit: Maximum number of chunks
+            document_ids: Restrict the search to these documents
+
+        Returns:
+            Chunk dictionaries (best first) with content, chunk metadata,
+            document_id, source, title, position and score
+        """
+        fts_query = self._fts_query(query)
+        if not fts_query:
+            return []
+
+        sql = (
+            "SELECT c.id AS chunk_row, c.document_id, c.position, c.content, c.metadata, "
+            "d.source, d.title, bm25(chunks_fts) AS rank "
+            "FROM chunks_fts JOIN chunks c ON c.id = chunks_fts.rowid "
+            "JOIN documents d ON d.id = c.document_id "
+            "WHERE chunks_fts MATCH ?"
+        )
+        params: List[Any] = [fts_query]
+        if document_ids is not None:
+            document_ids = list(document_ids)
+            sql += f" AND c.document_id IN ({', '.join('?' for _ in document_ids)})"
+            params.extend(document_ids)
+        sql += " ORDER BY rank LIMIT ?"
+        params.append(limit)
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [
+            {
+                **json.loads(row["metadata"] or "{}"),
+                "content": row["content"],
+                "document_id": row["document_id"],
+                "source": row["source"],
+                "title": row["title"],
+                "position": row["position"],
+                # FTS5 bm25() is lower-is-better; flip it so higher is better
+                "score": -row["rank"]
+            }
+            for row in rows
+        ]
@@ -4,15 +4,24 @@ Handles loading and extracting text from various document formats
 """
 
 import os
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Callable, Iterable, Iterator, List, Tuple
 from pathlib import Path
 
+from document_source import MappedDocument
+from table_renderer import TableRenderer
+
 class DocumentLoader:
     """
     Utility class for loading documents from various formats
     Supports: PDF, DOCX, TXT, MD, HTML
     """
     
+    SUPPORTED_EXTENSIONS = ('.txt', '.md', '.pdf', '.docx', '.html', '.htm')
+    
+    # Parsing these is CPU-bound pure Python, so they go to a process pool;
+    # everything else is I/O-bound and loads fine on threads
+    CPU_BOUND_EXTENSIONS = ('.pdf', '.docx')
+    
     @staticmethod
     def load_text_file(file_path: str) -> str:
         """
@@ -27,6 +36,19 @@ class DocumentLoader:
         with open(file_path, 'r', encoding='utf-8') as f:
             return f.read()
     
+    @staticmethod
+    def load_mapped(file_path: str) -> MappedDocument:
+        """
+        Memory-map a plain text or Markdown file without reading it
+        
+        Args:
+            file_path: Path to text file
+            
+        Returns:
+            MappedDocument that decodes byte ranges on demand
+        """
+        return MappedDocument(file_path)
+    
     @staticmethod
     def load_pdf(file_path: str) -> Dict[str, Any]:
         """
@@ -102,13 +124,20 @@ class DocumentLoader:
         tables_content = []
         for table_num, table in enumerate(doc.tables, 1):
             table_data = []
+            cell_grid = []
             for row in table.rows:
-                row_data = [cell.text for cell in row.cells]
-                table_data.append(row_data)
-            tables_content.append({
+                cells = row.cells
+                table_data.append([cell.text for cell in cells])
+                # A merged cell repeats the same underlying <w:tc> at every position it covers
+                cell_grid.append([cell._tc for cell in cells])
+            table_entry = {
                 "table_number": table_num,
                 "data": table_data
-            })
+            }
+            spans = TableRenderer.spans_from_cells(cell_grid)
+            if spans is not None:
+                table_entry["spans"] = spans
+            tables_content.append(table_entry)
         
         return {
             "content": full_content,
@@ -151,13 +180,16 @@ class DocumentLoader:
         return DocumentLoader.load_text_file(file_path)
     
     @staticmethod
-    def load_document(file_path: str, extract_metadata: bool = True) -> Dict[str, Any]:
+    def load_document(file_path: str, extract_metadata: bool = True,
+                      mmap_threshold: Optional[int] = None) -> Dict[str, Any]:
         """
         Auto-detect file type and load document
         
         Args:
             file_path: Path to document
             extract_metadata: Whether to extract metadata
+            mmap_threshold: If set, .txt and .md files of at least this many
+                bytes are memory-mapped and returned as a MappedDocument
             
         Returns:
             Dictionary with content and metadata
@@ -187,6 +219,16 @@ class DocumentLoader:
         loader = loaders[extension]
         
         # Load the document
+        file_size = file_path.stat().st_size
+        if (mmap_threshold is not None and extension in ['.txt', '.md']
+                and file_size >= mmap_threshold):
+            return {
+                "content": DocumentLoader.load_mapped(str(file_path)),
+                "file_type": extension,
+                "file_size": file_size,
+                "mapped": True
+            }
+        
         if extension in ['.pdf', '.docx']:
             result = loader(str(file_path))
             return result
@@ -195,9 +237,129 @@ class DocumentLoader:
             return {
                 "content": content,
                 "file_type": extension,
-                "file_size": file_path.stat().st_size
+                "file_size": file_size
             }
 
+    @staticmethod
+    def load_many(paths: Iterable[str],
+                  process_workers: Optional[int] = None,
+                  thread_workers: Optional[int] = None,
+                  on_progress: Optional[Callable[[int, int, str, Optional[Exception]], None]] = None,
+                  mmap_threshold: Optional[int] = None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Load many documents concurrently, yielding each one as it finishes
+        
+        PDF and DOCX files are parsed in a process pool; text, Markdown and
+        HTML files are read in a thread pool. Results arrive in completion
+        order, not input order.
+        
+        Args:
+            paths: Document paths to load
+            process_workers: Process pool size for PDF/DOCX (default: CPU count)
+            thread_workers: Thread pool size for text formats (default: executor default)
+            on_progress: Called after every file as
+                on_progress(completed, total, path, error); error is None on success
+            mmap_threshold: Passed through to load_document for text formats
+            
+        Yields:
+            (path, document) tuples for files that loaded successfully.
+            Failed files are skipped and reported through on_progress only.
+        """
+        # Executors pull in multiprocessing and logging; only pay for them here
+        from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+        
+        paths = [str(path) for path in paths]
+        cpu_bound = [p for p in paths if Path(p).suffix.lower() in DocumentLoader.CPU_BOUND_EXTENSIONS]
+        io_bound = [p for p in paths if Path(p).suffix.lower() not in DocumentLoader.CPU_BOUND_EXTENSIONS]
+        
+        total = len(paths)
+        completed = 0
+        process_pool = ProcessPoolExecutor(max_workers=process_workers) if cpu_bound else None
+        thread_pool = ThreadPoolExecutor(max_workers=thread_workers) if io_bound else None
+        
+        futures = {}
+        try:
+            for path in cpu_bound:
+                futures[process_pool.submit(DocumentLoader.load_document, path)] = path
+            for path in io_bound:
+                futures[thread_pool.submit(
+                    DocumentLoader.load_document, path, mmap_threshold=mmap_threshold
+                )] = path
+            
+            for future in as_completed(futures):
+                path = futures[future]
+                completed += 1
+                try:
+                    document = future.result()
+                except Exception as e:
+                    if on_progress:
+                        on_progress(completed, total, path, e)
+                    continue
+                if on_progress:
+                    on_progress(completed, total, path, None)
+                yield path, document
+        finally:
+            # If the consumer stops early, drop queued work instead of finishing it
+            for future in futures:
+                future.cancel()
+            for pool in (process_pool, thread_pool):
+                if pool is not None:
+                    pool.shutdown(wait=True)
+    
+    @staticmethod
+    def find_documents(directory: str, patterns: Iterable[str] = ('*',),
+                       recursive: bool = True,
+                       exclude: Iterable[str] = ()) -> List[str]:
+        """
+        List supported documents in a directory
+        
+        Args:
+            directory: Directory to search
+            patterns: Glob patterns to include (e.g. "*.pdf")
+            recursive: Search subdirectories too
+            exclude: Glob patterns to skip, matched against the relative path
+            
+        Returns:
+            Sorted list of matching file paths
+        """
+        root = Path(directory)
+        if not root.is_dir():
+            raise NotADirectoryError(f"Not a directory: {directory}")
+        
+        exclude = list(exclude)
+        found = set()
+        for pattern in patterns:
+            matches = root.rglob(pattern) if recursive else root.glob(pattern)
+            for path in matches:
+                if not path.is_file() or path.suffix.lower() not in DocumentLoader.SUPPORTED_EXTENSIONS:
+                    continue
+                relative = path.relative_to(root)
+                if any(relative.match(skip) for skip in exclude):
+                    continue
+                found.add(str(path))
+        
+        return sorted(found)
+    
+    @staticmethod
+    def load_directory(directory: str, patterns: Iterable[str] = ('*',),
+                       recursive: bool = True, exclude: Iterable[str] = (),
+                       **kwargs) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Load every supported document in a directory concurrently
+        
+        Args:
+            directory: Directory to search
+            patterns: Glob patterns to include (e.g. "*.pdf", "reports/*.docx")
+            recursive: Search subdirectories too
+            exclude: Glob patterns to skip
+            **kwargs: Passed to load_many (worker counts, on_progress, mmap_threshold)
+            
+        Yields:
+            (path, document) tuples as each file finishes loading
+        """
+        paths = DocumentLoader.find_documents(directory, patterns, recursive, exclude)
+        return DocumentLoader.load_many(paths, **kwargs)
+
 class DocumentSaver:
     """
     Utility class for saving processed documents
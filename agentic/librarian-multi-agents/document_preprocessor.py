@@ -0,0 +1,242 @@
+"""
+Document Pre-processing Utilities
+Strips running headers, footers, page numbers and redundant whitespace
+before a document is chunked and sent to the agents
+"""
+
+import re
+from collections import Counter
+from typing import List, Dict, Any, Tuple, Optional, Iterable
+
+from document_chunker import estimate_tokens
+
+PAGE_MARKER = re.compile(r'-{3,}\s*Page\s+(\d+)\s*-{3,}')
+# Whitespace runs inside a line (indentation is matched separately)
+INLINE_SPACE = re.compile(r'[ \t\f\v\u00a0]+')
+PAGE_NUMBER_LINE = re.compile(r'^(page\s*)?#+(\s*(of|/)\s*#+)?$|^-\s*#+\s*-$')
+
+DEFAULT_BOILERPLATE_PATTERNS = [
+    r'^all rights reserved\.?$',
+    r'^(©|\(c\)|copyright)\s.*$',
+    r'^(strictly\s+)?confidential$',
+    r'^this page (is )?intentionally (left )?blank\.?$',
+]
+
+class DocumentPreprocessor:
+    """
+    Token-saving clean-up stage between DocumentLoader and DocumentChunker
+
+    Lines near the top or bottom of a page that repeat across many pages
+    (running headers and footers) are removed, as are bare page numbers and
+    common boilerplate lines. Whitespace runs inside lines are collapsed;
+    indentation and fenced code blocks are kept. Page markers
+    ("--- Page N ---") are kept so page-based chunking still works.
+    """
+
+    def __init__(self, min_repeat_ratio: float = 0.5, edge_lines: int = 3,
+                 collapse_whitespace: bool = True,
+                 boilerplate_patterns: Optional[Iterable[str]] = None):
+        """
+        Initialize preprocessor
+
+        Args:
+            min_repeat_ratio: Fraction of pages a line must appear on to be
+                treated as a running header/footer
+            edge_lines: Number of non-empty lines at the top and bottom of
+                each page that are checked for repeats
+            collapse_whitespace: Collapse runs of spaces and blank lines
+            boilerplate_patterns: Regexes (matched case-insensitively against
+                header/footer lines) to remove; defaults to common notices
+        """
+        self.min_repeat_ratio = min_repeat_ratio
+        self.edge_lines = edge_lines
+        self.collapse_whitespace = collapse_whitespace
+        patterns = DEFAULT_BOILERPLATE_PATTERNS if boilerplate_patterns is None else boilerplate_patterns
+        self.boilerplate = [re.compile(pattern, re.IGNORECASE) for pattern in patterns]
+
+    @staticmethod
+    def _normalize(line: str) -> str:
+        """Normalize a line so headers differing only in numbers compare equal"""
+        line = re.sub(r'\s+', ' ', line.strip().lower())
+        return re.sub(r'\d+', '#', line)
+
+    def _edge_indexes(self, lines: List[str]) -> List[int]:
+        """Indexes of the first and last edge_lines non-empty lines"""
+        non_empty = [i for i, line in enumerate(lines) if line.strip()]
+        # Short pages get a narrower edge so body text is never all "edge"
+        edge = min(self.edge_lines, max(1, len(non_empty) // 4))
+        return sorted(set(non_empty[:edge] + non_empty[-edge:]))
+
+    def find_repeated_lines(self, pages: List[str]) -> set:
+        """
+        Find normalized header/footer lines that repeat across pages
+
+        Args:
+            pages: Text of each page
+
+        Returns:
+            Set of normalized lines considered running headers or footers
+        """
+        if len(pages) < 2:
+            return set()
+
+        counts = Counter()
+        for page in pages:
+            lines = page.split('\n')
+            counts.update({self._normalize(lines[i]) for i in self._edge_indexes(lines)})
+
+        threshold = max(2, self.min_repeat_ratio * len(pages))
+        return {line for line, count in counts.items() if line and count >= threshold}
+
+    def _is_removable(self, line: str, repeated: set) -> bool:
+        normalized = self._normalize(line)
+        if normalized in repeated or PAGE_NUMBER_LINE.match(normalized):
+            return True
+        return any(pattern.match(line.strip()) for pattern in self.boilerplate)
+
+    def clean_page(self, page: str, repeated: set) -> Tuple[str, int]:
+        """
+        Remove header/footer lines from one page
+
+        Args:
+            page: Page text
+            repeated: Normalized lines from find_repeated_lines
+
+        Returns:
+            Tuple of (cleaned page text, number of lines removed)
+        """
+        lines = page.split('\n')
+        drop = {i for i in self._edge_indexes(lines) if self._is_removable(lines[i], repeated)}
+        kept = [line for i, line in enumerate(lines) if i not in drop]
+        return '\n'.join(kept), len(drop)
+
+    @staticmethod
+    def normalize_whitespace(content: str) -> str:
+        """
+        Collapse whitespace runs without losing paragraph breaks or structure
+
+        Leading indentation is kept (nested lists, indented code), and lines
+        inside fenced code blocks are left as they are apart from trailing
+        spaces; elsewhere runs of spaces inside a line become one space.
+
+        Args:
+            content: Text to clean
+
+        Returns:
+            Text without trailing spaces and with at most one blank line in a row
+        """
+        lines = []
+        in_code = False
+        for line in content.split('\n'):
+            if line.lstrip().startswith(('```', '~~~')):
+                in_code = not in_code
+            elif not in_code:
+                text = line.lstrip(' \t\f\v\u00a0')
+                line = line[:len(line) - len(text)] + INLINE_SPACE.sub(' ', text)
+            lines.append(line.rstrip())
+        content = re.sub(r'\n{3,}', '\n\n', '\n'.join(lines))
+        return content.strip('\n')
+
+    def _split_pages(self, content: str) -> Tuple[str, List[Tuple[int, str]]]:
+        """Split content on page markers into a preamble and (number, text) pages"""
+        parts = PAGE_MARKER.split(content)
+        preamble = parts[0]
+        pages = [(int(parts[i]), parts[i + 1]) for i in range(1, len(parts), 2)]
+        return preamble, pages
+
+    def process_text(self, content: str) -> Tuple[str, Dict[str, Any]]:
+        """
+        Clean document text
+
+        Args:
+            content: Document content, optionally with page markers
+
+        Returns:
+            Tuple of (cleaned content, report)
+        """
+        preamble, pages = self._split_pages(content)
+        repeated = self.find_repeated_lines([text for _, text in pages])
+
+        removed = 0
+        cleaned_pages = []
+        for number, text in pages:
+            text, dropped = self.clean_page(text, repeated)
+            removed += dropped
+            if self.collapse_whitespace:
+                text = self.normalize_whitespace(text)
+            cleaned_pages.append((number, text))
+
+        if self.collapse_whitespace:
+            preamble = self.normalize_whitespace(preamble)
+
+        if pages:
+            # Same layout DocumentLoader.load_pdf produces
+            body = "\n\n".join(f"--- Page {number} ---\n{text}" for number, text in cleaned_pages)
+            cleaned = f"{preamble}\n\n{body}" if preamble else body
+        else:
+            cleaned = preamble
+
+        return cleaned, self.report(content, cleaned, removed, sorted(repeated))
+
+    def process(self, doc_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Clean a document dictionary returned by DocumentLoader.load_document
+
+        Args:
+            doc_data: Loaded document with "content" and optionally "pages"
+
+        Returns:
+            Copy of doc_data with cleaned content (and pages) plus a
+            "preprocessing" report
+        """
+        result = dict(doc_data)
+
+        if "pages" in doc_data:
+            texts = [page["content"] for page in doc_data["pages"]]
+            repeated = self.find_repeated_lines(texts)
+            removed = 0
+            pages = []
+            for page in doc_data["pages"]:
+                text, dropped = self.clean_page(page["content"], repeated)
+                removed += dropped
+                if self.collapse_whitespace:
+                    text = self.normalize_whitespace(text)
+                pages.append({**page, "content": text})
+
+            cleaned = "\n\n".join(
+                f"--- Page {page['page_number']} ---\n{page['content']}" for page in pages
+            )
+            result["pages"] = pages
+            result["content"] = cleaned
+            result["preprocessing"] = self.report(doc_data["content"], cleaned, removed, sorted(repeated))
+        else:
+            result["content"], result["preprocessing"] = self.process_text(doc_data["content"])
+
+        return result
+
+    @staticmethod
+    def report(original: str, cleaned: str, lines_removed: int,
+               repeated_lines: List[str]) -> Dict[str, Any]:
+        """
+        Summarize the token reduction achieved
+
+        Args:
+            original: Content before pre-processing
+            cleaned: Content after pre-processing
+            lines_removed: Header/footer/boilerplate lines removed
+            repeated_lines: Normalized repeated lines that were detected
+
+        Returns:
+            Dictionary with token counts and reduction percentage
+        """
+        original_tokens = estimate_tokens(original)
+        processed_tokens = estimate_tokens(cleaned)
+        saved = original_tokens - processed_tokens
+        return {
+            "original_tokens": original_tokens,
+            "processed_tokens": processed_tokens,
+            "tokens_saved": saved,
+            "reduction_pct": round(100.0 * saved / original_tokens, 1) if original_tokens else 0.0,
+            "lines_removed": lines_removed,
+            "repeated_lines": repeated_lines
+        }
@@ -0,0 +1,299 @@
+"""
+Document Session
+Conversation state for interactive use: chunk digests, earlier task results
+and an append-only prompt, so follow-up questions reuse earlier work and
+warm prompt-cache prefixes instead of re-processing the whole document
+"""
+
+import re
+from collections import Counter
+from typing import List, Dict, Any, Optional, Iterable
+
+from chunk_index import BM25Index
+from librarian_agents_team import (
+    LibrarianAgentsTeam, RunContext, Task, AgentRole, MODEL, DIGEST_DESCRIPTION
+)
+
+# Requests that rework the previous answer rather than ask something new
+REFINEMENT = re.compile(
+    r'\b(shorter|longer|more (detail|detailed|concise|formal|casual)|less (detail|formal)|'
+    r'simplif\w*|rephrase|reword|bullet(ed)? ?(points|list)?|expand on|elaborate|'
+    r'in (plain|simple) (english|language|terms)|tone|(make|turn|format|rewrite|shorten|translate) '
+    r'(it|that|this|them)|'
+    r'(your|the) (last|previous) (answer|response|result)|the (answer|summary|result|table) above)\b',
+    re.IGNORECASE
+)
+# Requests that need the document's exact text, not digests of it
+RAW_TEXT = re.compile(
+    r'\b(quote|quotes|verbatim|exact (wording|text|words)|word for word|rewrite the|restructure|'
+    r'convert|tables?|tabulate|extract|list (all|every)|every (mention|instance|occurrence))\b',
+    re.IGNORECASE
+)
+# Requests about the document as a whole, which a few chunk digests cannot answer
+DOCUMENT_WIDE = re.compile(
+    r'\b((whole|entire|full|complete) (document|report|book|paper|text|file)|overall|throughout|'
+    r'executive summary|overview|tl;?dr|(all|every|each) (the )?(sections?|chapters?|parts?|pages?)|'
+    r'summar\w* (it|this|everything|the (document|report|book|paper|text|file)))\b|^\W*summar\w*\W*$',
+    re.IGNORECASE
+)
+
+class DocumentSession:
+    """
+    Interactive session over one document
+
+    Each question is answered the cheapest way that can work:
+
+    - refinements of the previous answer use only the conversation so far
+    - follow-up questions are answered from digests of the most relevant
+      chunks; each chunk is read and digested at most once per session
+    - the first question, questions about the whole document and requests
+      that need exact text (quotes, tables, rewrites) run the full team
+      pipeline, reusing any task result already computed this session
+
+    The conversation is kept as an append-only message list with one cache
+    breakpoint on the newest block, so every turn re-reads the previous
+    turns from the prompt cache. Past max_turns, the oldest half of the
+    turns is dropped at once, so the cached prefix stays stable between
+    trims.
+    """
+
+    def __init__(self, team: LibrarianAgentsTeam, document_content: Any,
+                 tables: Optional[List[Dict[str, Any]]] = None,
+                 chunk_index: Optional[BM25Index] = None, top_k: int = 4,
+                 digest_workers: int = 4, max_turns: int = 20, **process_options):
+        """
+        Initialize session
+
+        Args:
+            team: Team used for digests and full pipeline runs
+            document_content: The document content
+            tables: Structured tables extracted from the document
+            chunk_index: Prebuilt index; built through the team when omitted
+            top_k: Chunks consulted for a question answered from digests
+            digest_workers: Chunks digested concurrently
+            max_turns: Question and answer pairs kept in the conversation
+            **process_options: Passed to process_document on pipeline runs
+                (e.g. budget_ratio)
+        """
+        self.team = team
+        self.document_content = document_content
+        self.tables = tables
+        self.index = chunk_index or team.get_index(document_content)
+        self.top_k = top_k
+        self.digest_workers = digest_workers
+        self.process_options = process_options
+        self.digests: Dict[int, str] = {}
+        self.task_results: Dict[str, Dict[str, Any]] = {}
+        self.max_turns = max_turns
+        self.messages: List[Dict[str, Any]] = []
+        # Chunk ids whose digests each turn in messages carries
+        self._turn_digests: List[List[int]] = []
+        # Turn whose answer stopped at max_tokens: {"content", "output", "run"}
+        self._pending: Optional[Dict[str, Any]] = None
+        self.stats: Counter = Counter()
+
+    @staticmethod
+    def is_refinement(request: str) -> bool:
+        """True if the request reworks the previous answer"""
+        return bool(REFINEMENT.search(request))
+
+    @staticmethod
+    def needs_raw_text(request: str) -> bool:
+        """True if the request needs the document's exact text"""
+        return bool(RAW_TEXT.search(request))
+
+    @staticmethod
+    def is_document_wide(request: str) -> bool:
+        """True if the request is about the whole document"""
+        return bool(DOCUMENT_WIDE.search(request))
+
+    @property
+    def awaiting_continuation(self) -> bool:
+        """True if the last answer stopped at max_tokens"""
+        return self._pending is not None
+
+    def digest_chunks(self, chunk_ids: Iterable[int]) -> Dict[int, str]:
+        """
+        Digest chunks not yet digested in this session
+
+        Args:
+            chunk_ids: Chunk indexes in the session's index
+
+        Returns:
+            The newly created digests, by chunk index
+        """
+        missing = [chunk_id for chunk_id in dict.fromkeys(chunk_ids) if chunk_id not in self.digests]
+        if not missing:
+            return {}
+
+        def digest(chunk_id: int) -> str:
+            task = Task(
+                task_id=f"digest_{chunk_id}",
+                description=DIGEST_DESCRIPTION,
+                content=self.index.chunks[chunk_id].get("content", ""),
+                assigned_to=AgentRole.SUBAGENT_2
+            )
+            return self.team.subagent2.process(task, {})["result"]
+
+        if len(missing) == 1 or self.digest_workers <= 1:
+            results = [digest(chunk_id) for chunk_id in missing]
+        else:
+            from concurrent.futures import ThreadPoolExecutor
+            with ThreadPoolExecutor(max_workers=min(self.digest_workers, len(missing))) as executor:
+                results = list(executor.map(digest, missing))
+
+        created = dict(zip(missing, results))
+        self.digests.update(created)
+        self.stats["chunks_digested"] += len(created)
+        return created
+
+    def _section_label(self, chunk_id: int) -> str:
+        chunk = self.index.chunks[chunk_id]
+        label = f"Section {chunk_id + 1}"
+        if "chapter" in chunk:
+            label += f", chapter {chunk['chapter']}"
+        if chunk.get("pages"):
+            label += f", pages {chunk['pages'][0]}-{chunk['pages'][-1]}"
+        return label
+
+    def build_turn_request(self, request: str, digests: Dict[int, str]) -> Dict[str, Any]:
+        """
+        Messages API parameters for a turn answered from session state
+
+        Earlier turns are sent unchanged (so their prefix is cached); only
+        the new digests and the question are added, with the single cache
+        breakpoint on the last block.
+
+        Args:
+            request: The user's question
+            digests: Digests first used in this turn, by chunk index
+
+        Returns:
+            Parameters for backend.create()
+        """
+        content = []
+        if digests:
+            content.append({
+                "type": "text",
+                "text": "Section digests:\n\n" + "\n\n".join(
+                    f"[{self._section_label(chunk_id)}]\n{digest}" for chunk_id, digest in sorted(digests.items())
+                )
+            })
+        content.append({
+            "type": "text",
+            "text": f"""Question: {request}
+
+Answer from the section digests and earlier answers in this conversation.
+- Be direct; do not mention digests, sections or subagents
+- If they do not contain the answer, say which part of the document is needed""",
+            "cache_control": {"type": "ephemeral", "ttl": "1h"}
+        })
+        return {
+            "model": MODEL,
+            "max_tokens": 32000,
+            "system": self.team.lead.get_system_prompt(),
+            "messages": self.messages + [{"role": "user", "content": content}]
+        }
+
+    def _record(self, user_content: List[Dict[str, Any]], answer: str,
+                chunk_ids: Iterable[int] = ()):
+        """Append a finished turn to the conversation, without cache breakpoints"""
+        stripped = [{key: value for key, value in block.items() if key != "cache_control"}
+                    for block in user_content]
+        self.messages.append({"role": "user", "content": stripped})
+        self.messages.append({"role": "assistant", "content": answer})
+        self._turn_digests.append(list(chunk_ids))
+        if len(self._turn_digests) > self.max_turns:
+            dropped = len(self._turn_digests) - self.max_turns // 2
+            del self.messages[:2 * dropped]
+            del self._turn_digests[:dropped]
+            self.stats["turns_dropped"] += dropped
+
+    def _in_conversation(self) -> set:
+        """Chunk ids whose digests are in the kept turns"""
+        return {chunk_id for chunk_ids in self._turn_digests for chunk_id in chunk_ids}
+
+    def _settle_pending(self):
+        """Record a cut-off answer as it stands, once the user moves on"""
+        if self._pending is not None:
+            pending, self._pending = self._pending, None
+            self._record(pending["content"], pending["output"], pending["chunk_ids"])
+
+    def ask(self, request: str) -> str:
+        """
+        Answer a request, reusing session state where possible
+
+        Args:
+            request: The user's question or instruction
+
+        Returns:
+            Answer text; it ends with the 'continue' notice if it stopped at
+            max_tokens (see continue_answer)
+        """
+        self._settle_pending()
+        if self.messages and self.is_refinement(request) and not self.needs_raw_text(request):
+            print(f"[SYSTEM] Refining the previous answer")
+            self.stats["refinements"] += 1
+            return self._answer(request, {})
+
+        if not self.messages or self.needs_raw_text(request) or self.is_document_wide(request):
+            print(f"[SYSTEM] Request needs the whole document; running the full pipeline")
+            self.stats["pipeline_runs"] += 1
+            answer = self.team.process_document(
+                request, self.document_content, chunk_index=self.index, tables=self.tables,
+                result_cache=self.task_results, **self.process_options
+            )
+            content = [{"type": "text", "text": f"Request: {request}"}]
+            run = self.team.last_run
+            if run is not None and run.awaiting_continuation:
+                self._pending = {"content": content, "output": run.truncated["output"],
+                                 "chunk_ids": [], "run": run}
+            else:
+                self._record(content, answer)
+            return answer
+
+        chunk_ids = [hit["chunk_index"] for hit in self.index.top_chunks(request, self.top_k)]
+        if not chunk_ids:
+            chunk_ids = list(range(min(self.top_k, len(self.index.chunks))))
+        reused = sum(1 for chunk_id in chunk_ids if chunk_id in self.digests)
+        created = self.digest_chunks(chunk_ids)
+        print(f"[SYSTEM] Answering from {len(chunk_ids)} section digests "
+              f"({reused} reused, {len(created)} new)")
+        self.stats["digest_answers"] += 1
+        self.stats["digests_reused"] += reused
+        # Digests still in the kept conversation are not repeated
+        sent = self._in_conversation()
+        return self._answer(request, {chunk_id: self.digests[chunk_id]
+                                      for chunk_id in chunk_ids if chunk_id not in sent})
+
+    def _answer(self, request: str, digests: Dict[int, str]) -> str:
+        params = self.build_turn_request(request, digests)
+        response = self.team.lead.backend.create(**params)
+        content = params["messages"][-1]["content"]
+        if response.stop_reason == "max_tokens":
+            run = RunContext(user_request=request,
+                             truncated={"params": params, "output": response.text})
+            self._pending = {"content": content, "output": response.text,
+                             "chunk_ids": list(digests), "run": run}
+            return LibrarianAgentsTeam._track_continuation(run, response.text)
+        self._record(content, response.text, digests)
+        return response.text
+
+    def continue_answer(self) -> str:
+        """
+        Generate the rest of an answer that stopped at max_tokens
+
+        Returns:
+            Only the newly generated text, with the 'continue' notice again
+            if it was cut off too
+        """
+        if self._pending is None:
+            return "No pending continuation. Please ask a new question."
+        pending = self._pending
+        run = pending["run"]
+        text = self.team.lead.continue_compilation(run)
+        pending["output"] += text
+        if run.awaiting_continuation:
+            return LibrarianAgentsTeam._track_continuation(run, text)
+        self._settle_pending()
+        return text
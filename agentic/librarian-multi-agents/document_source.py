@@ -0,0 +1,176 @@
+"""
+Memory-Mapped Document Source
+Lazy, byte-range access to very large plain-text and Markdown files
+"""
+
+import mmap
+import os
+import re
+from array import array
+from typing import Iterator, Optional, Tuple
+
+# Paragraph breaks: a newline followed by one or more blank (or whitespace-only) lines
+PARAGRAPH_BREAK = re.compile(rb'\n(?:[ \t\r\f\v]*\n)+')
+
+class MappedDocument:
+    """
+    Read-only, memory-mapped view of a UTF-8 text file
+
+    Opening a MappedDocument costs the same regardless of file size: nothing is
+    read or decoded until a byte range is requested. Line and paragraph offsets
+    are computed on first use and stored as compact integer arrays.
+
+    Indexing works on byte offsets, so ``doc[:5000]`` returns the decoded
+    first ~5000 bytes and ``len(doc)`` is the file size in bytes. Ranges are
+    widened to UTF-8 character boundaries, so slices never split a character.
+    """
+
+    def __init__(self, file_path: str, encoding: str = 'utf-8'):
+        """
+        Map a file into memory
+
+        Args:
+            file_path: Path to text or Markdown file
+            encoding: Text encoding used when decoding byte ranges
+        """
+        self.file_path = str(file_path)
+        self.encoding = encoding
+        self._file = open(self.file_path, 'rb')
+        self.size = os.fstat(self._file.fileno()).st_size
+        # mmap cannot map an empty file
+        self._map = (
+            mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            if self.size else b''
+        )
+        self._line_offsets: Optional[array] = None
+        self._paragraph_offsets: Optional[array] = None
+
+    def close(self):
+        """Release the mapping and the underlying file handle"""
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __getitem__(self, key) -> str:
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self.size)
+            if step != 1:
+                raise ValueError("MappedDocument slices do not support a step")
+            return self.slice(start, stop)
+        raise TypeError("MappedDocument supports slice indexing only")
+
+    def __str__(self) -> str:
+        return self.slice(0, self.size)
+
+    @property
+    def buffer(self):
+        """Raw mapped bytes, usable with bytes regular expressions"""
+        return self._map
+
+    def _align(self, offset: int) -> int:
+        """Move an offset back to the start of the UTF-8 character it falls in"""
+        offset = max(0, min(offset, self.size))
+        # Continuation bytes look like 0b10xxxxxx
+        while 0 < offset < self.size and (self._map[offset] & 0xC0) == 0x80:
+            offset -= 1
+        return offset
+
+    def slice(self, start: int, end: int) -> str:
+        """
+        Decode a byte range
+
+        Args:
+            start: Start byte offset (inclusive)
+            end: End byte offset (exclusive)
+
+        Returns:
+            Decoded text for the range
+        """
+        start, end = self._align(start), self._align(end)
+        if end <= start:
+            return ""
+        return self._map[start:end].decode(self.encoding, errors='replace')
+
+    def line_offsets(self) -> array:
+        """
+        Byte offsets at which each line starts
+
+        Returns:
+            Array of start offsets, one per line
+        """
+        if self._line_offsets is None:
+            offsets = array('q', [0])
+            find = self._map.find
+            position = find(b'\n')
+            while position != -1:
+                if position + 1 < self.size:
+                    offsets.append(position + 1)
+                position = find(b'\n', position + 1)
+            self._line_offsets = offsets
+        return self._line_offsets
+
+    def paragraph_offsets(self) -> array:
+        """
+        Byte offsets at which each paragraph starts
+
+        Paragraphs are separated by one or more blank lines, matching the
+        ``'\\n\\n'`` split used by ``DocumentChunker.chunk_by_sections``.
+
+        Returns:
+            Array of start offsets, one per paragraph
+        """
+        if self._paragraph_offsets is None:
+            offsets = array('q', [0])
+            for match in PARAGRAPH_BREAK.finditer(self._map):
+                if match.end() < self.size:
+                    offsets.append(match.end())
+            self._paragraph_offsets = offsets
+        return self._paragraph_offsets
+
+    def line_count(self) -> int:
+        """Number of lines in the file"""
+        return len(self.line_offsets()) if self.size else 0
+
+    def line(self, index: int) -> str:
+        """
+        Decode a single line without its trailing newline
+
+        Args:
+            index: Zero-based line number
+
+        Returns:
+            Line text
+        """
+        offsets = self.line_offsets()
+        start = offsets[index]
+        end = offsets[index + 1] if index + 1 < len(offsets) else self.size
+        return self.slice(start, end).rstrip('\r\n')
+
+    def iter_paragraph_spans(self) -> Iterator[Tuple[int, int]]:
+        """
+        Yield ``(start, end)`` byte ranges for each paragraph
+
+        The range excludes the blank lines separating paragraphs.
+        """
+        if not self.size:
+            return
+        offsets = self.paragraph_offsets()
+        for i, start in enumerate(offsets):
+            end = offsets[i + 1] if i + 1 < len(offsets) else self.size
+            # Trim the separator that belongs to the break
+            match = PARAGRAPH_BREAK.search(self._map, start, end) if i + 1 < len(offsets) else None
+            yield start, match.start() if match else end
+
+    def iter_paragraphs(self) -> Iterator[str]:
+        """Yield decoded paragraphs one at a time"""
+        for start, end in self.iter_paragraph_spans():
+            yield self.slice(start, end)
@@ -0,0 +1,174 @@
+"""
+Extractive Summarizer
+Local TextRank sentence extraction used by "budget mode" to shrink chunks
+before they reach the text subagents
+"""
+
+import re
+from collections import Counter
+from typing import List, Dict, Any, Optional, Tuple
+
+from document_chunker import estimate_tokens
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+SENTENCE_BREAK = re.compile(r'(?<=[.!?])\s+(?=[A-Z0-9"\'(])|\n+')
+# A line break inside a sentence: previous line has no end punctuation and
+# the next one continues in lower case (hard-wrapped text)
+SOFT_WRAP = re.compile(r'(?<=[^\s.!?:])[ \t]*\n[ \t]*(?=[a-z])')
+WORD = re.compile(r'[a-z0-9]+')
+# Sentences ranked together; bounds the similarity matrix (and vocabulary)
+# to one block however long the input is
+MAX_BLOCK_SENTENCES = 500
+
+class ExtractiveSummarizer:
+    """
+    TextRank over a sentence similarity graph
+
+    Sentences are embedded as TF-IDF vectors, connected by cosine
+    similarity, and ranked with PageRank power iteration (in blocks of
+    consecutive sentences for long inputs). The top-ranked
+    sentences are kept, in their original order, until the target share of
+    the input's tokens is reached.
+    """
+
+    def __init__(self, ratio: float = 0.3, damping: float = 0.85,
+                 max_iterations: int = 100, tolerance: float = 1e-6):
+        """
+        Initialize summarizer
+
+        Args:
+            ratio: Target summary size as a fraction of input tokens
+            damping: PageRank damping factor
+            max_iterations: Power iteration limit
+            tolerance: Convergence threshold for power iteration
+        """
+        if np is None:
+            raise ImportError(
+                "numpy is required for extractive summarization. "
+                "Install it with: pip install numpy --break-system-packages"
+            )
+        if not 0 < ratio <= 1:
+            raise ValueError(f"ratio must be in (0, 1], got {ratio}")
+
+        self.ratio = ratio
+        self.damping = damping
+        self.max_iterations = max_iterations
+        self.tolerance = tolerance
+
+    @staticmethod
+    def split_sentences(text: str) -> List[str]:
+        """
+        Split text into sentences; hard-wrapped lines are rejoined, and any
+        other line break (headings, list items) also ends a sentence
+
+        Args:
+            text: Text to split
+
+        Returns:
+            Non-empty sentences
+        """
+        text = SOFT_WRAP.sub(' ', text)
+        return [sentence.strip() for sentence in SENTENCE_BREAK.split(text) if sentence.strip()]
+
+    def rank(self, sentences: List[str]) -> "np.ndarray":
+        """
+        Score sentences with TextRank
+
+        Long inputs are ranked in blocks of MAX_BLOCK_SENTENCES consecutive
+        sentences, so memory stays bounded however long the text is; IDF is
+        computed over all sentences, and block scores are scaled to the
+        block's share of the sentences so blocks compare evenly.
+
+        Args:
+            sentences: Sentences to rank
+
+        Returns:
+            Array of scores, one per sentence
+        """
+        count = len(sentences)
+        if count <= 2:
+            return np.ones(count)
+
+        tokens = [WORD.findall(sentence.lower()) for sentence in sentences]
+        document_frequency = Counter(word for ts in tokens for word in set(ts))
+        if not document_frequency:
+            return np.ones(count)
+        idf = {word: np.log((1 + count) / (1 + df)) + 1 for word, df in document_frequency.items()}
+
+        scores = np.empty(count)
+        for start in range(0, count, MAX_BLOCK_SENTENCES):
+            block = tokens[start:start + MAX_BLOCK_SENTENCES]
+            scores[start:start + len(block)] = self._rank_block(block, idf) * len(block) / count
+        return scores
+
+    def _rank_block(self, tokens: List[List[str]], idf: Dict[str, float]) -> "np.ndarray":
+        """PageRank scores (summing to 1) of one block of tokenized sentences"""
+        count = len(tokens)
+        vocabulary = {word: i for i, word in enumerate(dict.fromkeys(w for ts in tokens for w in ts))}
+        if count <= 2 or not vocabulary:
+            return np.full(count, 1.0 / count)
+
+        # TF-IDF over the block's own vocabulary, with L2-normalized rows
+        rows = np.repeat(np.arange(count), [len(ts) for ts in tokens])
+        cols = np.fromiter((vocabulary[w] for ts in tokens for w in ts), dtype=np.int64, count=len(rows))
+        vectors = np.zeros((count, len(vocabulary)))
+        np.add.at(vectors, (rows, cols), 1.0)
+        vectors *= np.fromiter((idf[word] for word in vocabulary), dtype=float, count=len(vocabulary))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+        similarity = vectors @ vectors.T
+        np.fill_diagonal(similarity, 0.0)
+        out_weight = similarity.sum(axis=1, keepdims=True)
+        # Sentences with no neighbours spread their rank uniformly
+        transition = np.divide(similarity, out_weight,
+                               out=np.full_like(similarity, 1.0 / count), where=out_weight > 0)
+
+        scores = np.full(count, 1.0 / count)
+        teleport = (1 - self.damping) / count
+        for _ in range(self.max_iterations):
+            updated = teleport + self.damping * (transition.T @ scores)
+            if np.abs(updated - scores).sum() < self.tolerance:
+                scores = updated
+                break
+            scores = updated
+        return scores
+
+    def summarize(self, text: str, ratio: Optional[float] = None) -> Tuple[str, Dict[str, Any]]:
+        """
+        Reduce text to roughly ratio of its tokens
+
+        Args:
+            text: Text to summarize
+            ratio: Override the summarizer's target ratio
+
+        Returns:
+            Tuple of (summary, report with original/summary token counts)
+        """
+        ratio = ratio or self.ratio
+        sentences = self.split_sentences(text)
+        original_tokens = estimate_tokens(text)
+        budget = max(1, int(original_tokens * ratio))
+
+        scores = self.rank(sentences)
+        keep = []
+        used = 0
+        for index in np.argsort(-scores, kind='stable'):
+            if used >= budget:
+                break
+            keep.append(index)
+            used += estimate_tokens(sentences[index])
+
+        summary = "\n".join(sentences[i] for i in sorted(keep))
+        summary_tokens = estimate_tokens(summary)
+        return summary, {
+            "original_tokens": original_tokens,
+            "summary_tokens": summary_tokens,
+            "tokens_saved": original_tokens - summary_tokens,
+            "sentences_kept": len(keep),
+            "sentences_total": len(sentences)
+        }
@@ -5,17 +5,44 @@ A multi-agent system for breaking down large documents with specialized agents
 OPTIMIZED FOR CLAUDE HAIKU 4.5 with 1-hour prompt caching
 """
 
-import os
+import contextvars
+import hashlib
 import json
-from typing import List, Dict, Any, Optional
-from dataclasses import dataclass
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Union
+from dataclasses import dataclass, field
 from enum import Enum
-from anthropic import Anthropic
 
-# Initialize Anthropic client
-client = Anthropic(api_key=os.environ.get("ANTHROPIC_API_KEY"))
+from checkpoint import CheckpointLog
+from chunk_index import BM25Index, document_key
+from llm_backend import (
+    LLMBackend, AnthropicBackend, DeadlineExceeded, call_deadline, call_tag, get_client, set_client
+)
+from document_chunker import DocumentChunker
+from plan_cache import PlanCache
+from table_renderer import TableRenderer
+
 MODEL = "claude-haiku-4-5-20251001"
 
+# Requests that look like table work go straight to SubAgent 3 on the fast path
+TABLE_REQUEST = re.compile(
+    r'\b(tables?|tabular|spreadsheet|csv|columns?|rows?|matrix|grid|tabulate)\b', re.IGNORECASE
+)
+CONTINUATION_NOTICE = "Due to length constraints, please reply 'continue' to see the rest."
+# Share of a best-effort deadline kept for compiling the tasks that finished
+BEST_EFFORT_COMPILE_SHARE = 0.25
+DIGEST_DESCRIPTION = ("Digest this section: summarize its key points, findings, names and "
+                      "figures concisely. Preserve all numbers exactly.")
+
+def __getattr__(name: str):
+    """Keep `librarian_agents_team.client` working; the client now lives in llm_backend"""
+    if name == "client":
+        return get_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 class AgentRole(Enum):
     LEAD_ORCHESTRATOR = "lead_orchestrator"
     SUBAGENT_1 = "subagent_1"  # Text specialist
@@ -33,6 +60,57 @@ class Task:
     result: Optional[str] = None
     requires_clarification: bool = False
     clarification_question: Optional[str] = None
+    chunk_ids: List[int] = field(default_factory=list)
+    
+    def to_dict(self, include_content: bool = True) -> Dict[str, Any]:
+        """JSON-serializable form; content is None when include_content is False"""
+        return {"task_id": self.task_id, "description": self.description,
+                "content": str(self.content) if include_content else None,
+                "assigned_to": self.assigned_to.value, "chunk_ids": self.chunk_ids,
+                "result": self.result, "status": self.status,
+                "requires_clarification": self.requires_clarification}
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Task":
+        return cls(task_id=data["task_id"], description=data["description"], content=data["content"],
+                   assigned_to=AgentRole(data["assigned_to"]), chunk_ids=data.get("chunk_ids", []),
+                   result=data.get("result"), status=data.get("status", "pending"),
+                   requires_clarification=data.get("requires_clarification", False))
+
+@dataclass
+class RunContext:
+    """
+    State of one process_document run
+    
+    Everything a run changes lives here rather than on the team, so one
+    warm team can process many documents concurrently. Follow-ups
+    (continue_processing, answer_clarification) take the run they continue.
+    """
+    user_request: str = ""
+    tasks: List[Task] = field(default_factory=list)
+    stats: Dict[str, Any] = field(default_factory=dict)
+    pending_clarifications: List[Task] = field(default_factory=list)
+    # The single task is the answer (fast path; no compile)
+    direct: bool = False
+    # Compiled output of finished tasks: {"task_ids": [...], "output": str}
+    merge: Optional[Dict[str, Any]] = None
+    checkpoint: Optional[CheckpointLog] = None
+    # Compile request and output so far, when the output hit max_tokens
+    truncated: Optional[Dict[str, Any]] = None
+    # Scheduling tag of the run's model calls (see llm_backend.ScheduledBackend)
+    priority: str = "normal"
+    tenant: str = "default"
+    # time.monotonic() deadline of the run's model calls; with best_effort,
+    # subagent tasks stop at task_deadline so the finished ones can be compiled
+    deadline: Optional[float] = None
+    task_deadline: Optional[float] = None
+    best_effort: bool = False
+    # Task ids (and "compile") cut short by a best-effort deadline
+    missed_deadline: List[str] = field(default_factory=list)
+    
+    @property
+    def awaiting_continuation(self) -> bool:
+        return self.truncated is not None
 
 @dataclass
 class Message:
@@ -44,11 +122,13 @@ class Message:
 class Agent:
     """Base class for all agents"""
     
-    def __init__(self, role: AgentRole, name: str, specialization: str):
+    def __init__(self, role: AgentRole, name: str, specialization: str, client=None,
+                 backend: Optional[LLMBackend] = None):
         self.role = role
         self.name = name
         self.specialization = specialization
         self.conversation_history: List[Message] = []
+        self.backend = backend if backend is not None else AnthropicBackend(client)
         
     def get_system_prompt(self) -> str:
         """Return the system prompt for this agent"""
@@ -57,17 +137,36 @@ class Agent:
     def process(self, task: Task, context: Dict[str, Any]) -> Dict[str, Any]:
         """Process a task and return results"""
         raise NotImplementedError
+    
+    def parse_result(self, result_text: str) -> Dict[str, Any]:
+        """Turn a subagent reply into a result, flagging clarification questions"""
+        
+        # Check if agent needs clarification
+        needs_clarification = any(phrase in result_text.lower() for phrase in [
+            "need clarification",
+            "could you clarify",
+            "unclear about",
+            "could you specify"
+        ])
+        
+        return {
+            "result": result_text,
+            "needs_clarification": needs_clarification,
+            "status": "completed" if not needs_clarification else "awaiting_clarification"
+        }
 
 class LeadOrchestratorAgent(Agent):
     """
     Lead Orchestrator Agent - Coordinates all subagents and compiles results
     """
     
-    def __init__(self):
+    def __init__(self, client=None, backend: Optional[LLMBackend] = None):
         super().__init__(
             AgentRole.LEAD_ORCHESTRATOR,
             "Lead Orchestrator",
-            "Task coordination, delegation, and result compilation"
+            "Task coordination, delegation, and result compilation",
+            client=client,
+            backend=backend
         )
         
     def get_system_prompt(self) -> str:
@@ -93,14 +192,73 @@ Key behaviors:
 
 You can delegate tasks, review subagent outputs, and compile comprehensive final results."""
 
-    def analyze_request(self, user_request: str, document_content: str) -> List[Task]:
-        """Analyze user request and create task breakdown"""
+    def analyze_request(self, user_request: str, document_content: str,
+                        plan_cache: Optional[PlanCache] = None) -> List[Task]:
+        """
+        Analyze user request and create task breakdown
         
-        response = client.messages.create(
-            model=MODEL,
-            max_tokens=32000,
-            system=self.get_system_prompt(),
-            messages=[
+        Args:
+            user_request: User's instruction
+            document_content: The document content to process
+            plan_cache: Optional cache; a hit reuses an earlier plan for a
+                structurally similar document and skips the planning call
+            
+        Returns:
+            Planned tasks; a single whole-document task if the plan is unusable
+        """
+        key = plan_cache.key(user_request, document_content) if plan_cache is not None else None
+        if key is not None:
+            cached = plan_cache.get(key)
+            if cached is not None:
+                print(f"[SYSTEM] Reusing cached plan")
+                return self._parse_plan(cached)
+        
+        task_data = self.request_plan(user_request, document_content)
+        try:
+            tasks = self._parse_plan(task_data)
+        except (KeyError, TypeError, AttributeError):
+            tasks = None
+        
+        if tasks is None:
+            # Fallback: create simple task (never cached)
+            return [Task(
+                task_id="task_1",
+                description=user_request,
+                content=document_content,
+                assigned_to=AgentRole.SUBAGENT_1
+            )]
+        
+        if key is not None and tasks:
+            plan_cache.put(key, task_data)
+        return tasks
+    
+    @staticmethod
+    def _parse_plan(task_data: Dict[str, Any]) -> List[Task]:
+        """Build Task objects from a planner JSON breakdown"""
+        agent_map = {
+            "subagent_1": AgentRole.SUBAGENT_1,
+            "subagent_2": AgentRole.SUBAGENT_2,
+            "subagent_3": AgentRole.SUBAGENT_3
+        }
+        return [
+            Task(
+                task_id=task_info["task_id"],
+                description=task_info["description"],
+                content=task_info.get("content_section", ""),
+                assigned_to=agent_map[task_info["assigned_to"]]
+            )
+            for task_info in task_data.get("tasks", [])
+        ]
+    
+    def build_plan_request(self, user_request: str, document_content: str) -> Dict[str, Any]:
+        """Messages API parameters for the planning call"""
+        # A MappedDocument's len() is its file size; counting characters would decode it all
+        unit = "characters" if isinstance(document_content, str) else "bytes"
+        return {
+            "model": MODEL,
+            "max_tokens": 32000,
+            "system": self.get_system_prompt(),
+            "messages": [
                 {
                     "role": "user",
                     "content": [
@@ -113,7 +271,7 @@ You can delegate tasks, review subagent outputs, and compile comprehensive final
                             "type": "text",
                             "text": f"""User Request: {user_request}
 
-Total document length: {len(document_content)} characters
+Total document length: {len(document_content)} {unit}
 
 Create a JSON task breakdown with this structure:
 {{
@@ -132,60 +290,89 @@ Guidelines:
 - Assign text processing to subagent_1 or subagent_2
 - Assign table generation to subagent_3
 - Break large documents into manageable chunks
-- Consider document structure (pages, chapters, sections)"""
+- Consider document structure (pages, chapters, sections)
+- When a section only needs its key points, names and figures (no quotes or exact
+  wording), use exactly this description: "{DIGEST_DESCRIPTION}\""""
                         }
                     ]
                 }
             ]
-        )
-        
-        # Parse response and create Task objects
-        response_text = response.content[0].text
-        
-        # Extract JSON from response
+        }
+    
+    @staticmethod
+    def parse_plan_text(response_text: str) -> Optional[Dict[str, Any]]:
+        """Extract the JSON task breakdown from a planner reply; None if invalid"""
         try:
             json_start = response_text.find('{')
             json_end = response_text.rfind('}') + 1
-            task_data = json.loads(response_text[json_start:json_end])
-            
-            tasks = []
-            for task_info in task_data.get("tasks", []):
-                agent_map = {
-                    "subagent_1": AgentRole.SUBAGENT_1,
-                    "subagent_2": AgentRole.SUBAGENT_2,
-                    "subagent_3": AgentRole.SUBAGENT_3
-                }
-                
-                tasks.append(Task(
-                    task_id=task_info["task_id"],
-                    description=task_info["description"],
-                    content=task_info.get("content_section", ""),
-                    assigned_to=agent_map[task_info["assigned_to"]]
-                ))
+            return json.loads(response_text[json_start:json_end])
+        except json.JSONDecodeError:
+            return None
+    
+    def request_plan(self, user_request: str, document_content: str) -> Optional[Dict[str, Any]]:
+        """Ask the model for a task breakdown; None if the reply is not valid JSON"""
+        
+        response = self.backend.create(**self.build_plan_request(user_request, document_content))
+        return self.parse_plan_text(response.text)
+    
+    def attach_chunks(self, tasks: List[Task], index: BM25Index, top_k: int,
+                      document_content: Any = None) -> List[Task]:
+        """
+        Replace each task's section description with the most relevant chunks
+        
+        The planner only names the part of the document a task needs
+        ("Chapter 6", "case studies"); the index turns that into the actual
+        text, so subagents receive top_k chunks rather than the whole document.
+        
+        Args:
+            tasks: Planned tasks
+            index: BM25 index over the document's chunks
+            top_k: Chunks to attach per task
+            document_content: The full document; tasks already carrying it
+                (the fallback plan) are left alone
             
-            return tasks
-        except (json.JSONDecodeError, KeyError) as e:
-            # Fallback: create simple task
-            return [Task(
-                task_id="task_1",
-                description=user_request,
-                content=document_content,
-                assigned_to=AgentRole.SUBAGENT_1
-            )]
+        Returns:
+            The same tasks, updated in place
+        """
+        for task in tasks:
+            if task.content is document_content:
+                continue
+            hits = index.top_chunks(f"{task.description} {task.content}", top_k)
+            if not hits:
+                continue
+            task.chunk_ids = [hit["chunk_index"] for hit in hits]
+            sections = "\n\n".join(hit.get("content", "") for hit in hits)
+            task.content = f"Requested section: {task.content}\n\n{sections}" if task.content else sections
+        return tasks
     
-    def compile_results(self, tasks: List[Task], user_request: str) -> str:
-        """Compile all subagent results into final output"""
+    def build_compile_request(self, tasks: List[Task], user_request: str,
+                              prior_merge: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Messages API parameters for the compilation call
         
-        results_summary = "\n\n".join([
+        Args:
+            tasks: Completed tasks to compile
+            user_request: The user's original request
+            prior_merge: Output already compiled from other tasks of the
+                same request; the new results are merged into it
+            
+        Returns:
+            Parameters for backend.create()
+        """
+        sections = []
+        if prior_merge:
+            sections.append(f"=== Compiled so far ===\n{prior_merge}")
+        sections.extend(
             f"=== {task.task_id}: {task.description} ===\n{task.result}"
             for task in tasks if task.result
-        ])
+        )
+        results_summary = "\n\n".join(sections)
         
-        response = client.messages.create(
-            model=MODEL,
-            max_tokens=32000,
-            system=self.get_system_prompt(),
-            messages=[
+        return {
+            "model": MODEL,
+            "max_tokens": 32000,
+            "system": self.get_system_prompt(),
+            "messages": [
                 {
                     "role": "user",
                     "content": [
@@ -201,6 +388,7 @@ Guidelines:
 Instructions:
 - Present a unified, well-structured output
 - Maintain logical flow between sections
+- "Compiled so far", if present, already covers other results: keep its content and fold the new results into it
 - DO NOT explain the process or mention subagents
 - Present only the final compiled content
 - If the output is very long, prepare to stop and ask user to continue
@@ -209,18 +397,79 @@ Instructions:
                     ]
                 }
             ]
-        )
+        }
+    
+    def compile_results(self, tasks: List[Task], user_request: str,
+                        prior_merge: Optional[str] = None,
+                        run: Optional[RunContext] = None) -> str:
+        """
+        Compile all subagent results into final output
+        
+        If the reply stops at max_tokens, the request and partial output are
+        kept in run.truncated so continue_compilation() can resume it.
+        """
+        params = self.build_compile_request(tasks, user_request, prior_merge)
+        response = self.backend.create(**params)
+        if run is not None:
+            run.truncated = ({"params": params, "output": response.text}
+                             if response.stop_reason == "max_tokens" else None)
+        return response.text
+    
+    @staticmethod
+    def build_continuation_request(params: Dict[str, Any], partial_output: str) -> Dict[str, Any]:
+        """
+        Resume a truncated request by prefilling the assistant turn with its output
         
-        return response.content[0].text
+        Args:
+            params: The original request parameters
+            partial_output: Everything generated so far
+            
+        Returns:
+            Request parameters whose reply continues exactly where the output stopped
+        """
+        # The API rejects a final assistant turn that ends in whitespace
+        prefill = partial_output.rstrip()
+        return {**params, "messages": params["messages"] + [{"role": "assistant", "content": prefill}]}
+    
+    def continue_compilation(self, run: RunContext) -> str:
+        """
+        Generate the next part of a truncated compilation
+        
+        Args:
+            run: Run whose compilation stopped at max_tokens
+            
+        Returns:
+            Only the newly generated text; run.truncated stays set if this
+            part was cut off at max_tokens too
+        """
+        if run.truncated is None:
+            raise ValueError("No truncated compilation to continue")
+        partial = run.truncated["output"]
+        params = self.build_continuation_request(run.truncated["params"], partial)
+        response = self.backend.create(**params)
+        
+        # The prefill had its trailing whitespace removed and the reply
+        # usually starts by regenerating it; that part was already returned
+        shown_whitespace = partial[len(partial.rstrip()):]
+        text = response.text
+        if shown_whitespace and text.startswith(shown_whitespace):
+            text = text[len(shown_whitespace):]
+        if response.stop_reason == "max_tokens":
+            run.truncated = {"params": run.truncated["params"], "output": partial + text}
+        else:
+            run.truncated = None
+        return text
 
 class SubAgent1(Agent):
     """SubAgent 1 - Text Processing Specialist"""
     
-    def __init__(self):
+    def __init__(self, client=None, backend: Optional[LLMBackend] = None):
         super().__init__(
             AgentRole.SUBAGENT_1,
             "SubAgent 1",
-            "Text processing, summarization, and analysis"
+            "Text processing, summarization, and analysis",
+            client=client,
+            backend=backend
         )
         
     def get_system_prompt(self) -> str:
@@ -242,14 +491,13 @@ Guidelines:
 
 You work under the Lead Orchestrator's direction."""
 
-    def process(self, task: Task, context: Dict[str, Any]) -> Dict[str, Any]:
-        """Process assigned text task"""
-        
-        response = client.messages.create(
-            model=MODEL,
-            max_tokens=32000,
-            system=self.get_system_prompt(),
-            messages=[
+    def build_request(self, task: Task, context: Dict[str, Any]) -> Dict[str, Any]:
+        """Messages API parameters for a task (also used for batch submission)"""
+        return {
+            "model": MODEL,
+            "max_tokens": 32000,
+            "system": self.get_system_prompt(),
+            "messages": [
                 {
                     "role": "user",
                     "content": [
@@ -265,32 +513,24 @@ You work under the Lead Orchestrator's direction."""
                     ]
                 }
             ]
-        )
-        
-        result_text = response.content[0].text
-        
-        # Check if agent needs clarification
-        needs_clarification = any(phrase in result_text.lower() for phrase in [
-            "need clarification",
-            "could you clarify",
-            "unclear about",
-            "could you specify"
-        ])
-        
-        return {
-            "result": result_text,
-            "needs_clarification": needs_clarification,
-            "status": "completed" if not needs_clarification else "awaiting_clarification"
         }
+    
+    def process(self, task: Task, context: Dict[str, Any]) -> Dict[str, Any]:
+        """Process assigned text task"""
+        
+        response = self.backend.create(**self.build_request(task, context))
+        return self.parse_result(response.text)
 
 class SubAgent2(Agent):
     """SubAgent 2 - Text Processing Specialist"""
     
-    def __init__(self):
+    def __init__(self, client=None, backend: Optional[LLMBackend] = None):
         super().__init__(
             AgentRole.SUBAGENT_2,
             "SubAgent 2",
-            "Text processing, transformation, and formatting"
+            "Text processing, transformation, and formatting",
+            client=client,
+            backend=backend
         )
         
     def get_system_prompt(self) -> str:
@@ -312,14 +552,13 @@ Guidelines:
 
 You work under the Lead Orchestrator's direction."""
 
-    def process(self, task: Task, context: Dict[str, Any]) -> Dict[str, Any]:
-        """Process assigned text task"""
-        
-        response = client.messages.create(
-            model=MODEL,
-            max_tokens=32000,
-            system=self.get_system_prompt(),
-            messages=[
+    def build_request(self, task: Task, context: Dict[str, Any]) -> Dict[str, Any]:
+        """Messages API parameters for a task (also used for batch submission)"""
+        return {
+            "model": MODEL,
+            "max_tokens": 32000,
+            "system": self.get_system_prompt(),
+            "messages": [
                 {
                     "role": "user",
                     "content": [
@@ -335,31 +574,24 @@ You work under the Lead Orchestrator's direction."""
                     ]
                 }
             ]
-        )
-        
-        result_text = response.content[0].text
-        
-        needs_clarification = any(phrase in result_text.lower() for phrase in [
-            "need clarification",
-            "could you clarify",
-            "unclear about",
-            "could you specify"
-        ])
-        
-        return {
-            "result": result_text,
-            "needs_clarification": needs_clarification,
-            "status": "completed" if not needs_clarification else "awaiting_clarification"
         }
+    
+    def process(self, task: Task, context: Dict[str, Any]) -> Dict[str, Any]:
+        """Process assigned text task"""
+        
+        response = self.backend.create(**self.build_request(task, context))
+        return self.parse_result(response.text)
 
 class SubAgent3(Agent):
     """SubAgent 3 - Table Generation Specialist"""
     
-    def __init__(self):
+    def __init__(self, client=None, backend: Optional[LLMBackend] = None):
         super().__init__(
             AgentRole.SUBAGENT_3,
             "SubAgent 3",
-            "Table generation and complex data formatting"
+            "Table generation and complex data formatting",
+            client=client,
+            backend=backend
         )
         
     def get_system_prompt(self) -> str:
@@ -387,14 +619,13 @@ When creating tables:
 - Clearly label columns and rows
 - Maintain data integrity"""
 
-    def process(self, task: Task, context: Dict[str, Any]) -> Dict[str, Any]:
-        """Process assigned table generation task"""
-        
-        response = client.messages.create(
-            model=MODEL,
-            max_tokens=32000,
-            system=self.get_system_prompt(),
-            messages=[
+    def build_request(self, task: Task, context: Dict[str, Any]) -> Dict[str, Any]:
+        """Messages API parameters for a task (also used for batch submission)"""
+        return {
+            "model": MODEL,
+            "max_tokens": 32000,
+            "system": self.get_system_prompt(),
+            "messages": [
                 {
                     "role": "user",
                     "content": [
@@ -410,45 +641,335 @@ When creating tables:
                     ]
                 }
             ]
-        )
-        
-        result_text = response.content[0].text
-        
-        needs_clarification = any(phrase in result_text.lower() for phrase in [
-            "need clarification",
-            "could you clarify",
-            "unclear about",
-            "could you specify"
-        ])
-        
-        return {
-            "result": result_text,
-            "needs_clarification": needs_clarification,
-            "status": "completed" if not needs_clarification else "awaiting_clarification"
         }
+    
+    def process(self, task: Task, context: Dict[str, Any]) -> Dict[str, Any]:
+        """Process assigned table generation task"""
+        
+        response = self.backend.create(**self.build_request(task, context))
+        return self.parse_result(response.text)
 
 class LibrarianAgentsTeam:
-    """Main orchestration class for the librarian agents team"""
+    """
+    Main orchestration class for the librarian agents team
+    
+    A team is safe to share between threads: per-request state lives in a
+    RunContext, and the shared caches (chunk indexes, plan cache) are locked.
+    """
     
-    def __init__(self):
-        self.lead = LeadOrchestratorAgent()
-        self.subagent1 = SubAgent1()
-        self.subagent2 = SubAgent2()
-        self.subagent3 = SubAgent3()
+    def __init__(self, client=None, backend: Optional[LLMBackend] = None,
+                 base_url: Optional[str] = None,
+                 chunker: Optional[DocumentChunker] = None,
+                 retrieval_top_k: Optional[int] = 3, dedupe_chunks: bool = False,
+                 library=None, library_limit: int = 20,
+                 plan_cache: Optional[PlanCache] = None, fast_path: bool = True,
+                 speculative_chunks: int = 0, speculative_workers: int = 4,
+                 partial_compile: bool = True):
+        """
+        Args:
+            client: Optional Anthropic client shared by all agents; defaults
+                to the module-level client, created lazily on the first call
+            backend: LLM backend shared by all agents (e.g. a
+                RecordReplayBackend); defaults to AnthropicBackend(client)
+            base_url: API endpoint for a dedicated client, e.g. a local
+                mock_server.py for load and failure testing
+            chunker: Chunker used to build the retrieval index
+            retrieval_top_k: Chunks attached to each task from the BM25
+                index; None sends tasks without document text, as before
+            dedupe_chunks: Collapse near-duplicate chunks before indexing
+                (requires numpy)
+            library: Optional DocumentLibrary for requests that span a
+                collection (see process_document's library_query)
+            library_limit: Maximum library chunks gathered per query
+            plan_cache: Optional PlanCache shared across documents; repeated
+                request templates on similar documents skip the planning call
+            fast_path: Send documents that fit in one chunk straight to a
+                single specialist, skipping planning and compilation
+            speculative_chunks: Digest up to this many likely-relevant chunks
+                concurrently with planning; summary tasks whose chunks were
+                all digested reuse them instead of another call. 0 disables.
+                Requires retrieval_top_k.
+            speculative_workers: Threads used for speculative digests
+            partial_compile: While tasks wait for clarification, compile the
+                finished ones and show that draft with the questions; the
+                draft is reused when the clarified tasks are merged in
+        """
+        self.backend = backend if backend is not None else AnthropicBackend(client, base_url=base_url)
+        self.lead = LeadOrchestratorAgent(backend=self.backend)
+        self.subagent1 = SubAgent1(backend=self.backend)
+        self.subagent2 = SubAgent2(backend=self.backend)
+        self.subagent3 = SubAgent3(backend=self.backend)
         self.agents = {
             AgentRole.LEAD_ORCHESTRATOR: self.lead,
             AgentRole.SUBAGENT_1: self.subagent1,
             AgentRole.SUBAGENT_2: self.subagent2,
             AgentRole.SUBAGENT_3: self.subagent3
         }
-        self.current_tasks: List[Task] = []
-        self.conversation_state = {
-            "awaiting_continuation": False,
-            "pending_clarifications": []
+        self.chunker = chunker or DocumentChunker()
+        self.retrieval_top_k = retrieval_top_k
+        self.dedupe_chunks = dedupe_chunks
+        self._indexes: "OrderedDict[str, BM25Index]" = OrderedDict()
+        self._index_lock = threading.Lock()
+        self.library = library
+        self.library_limit = library_limit
+        self.plan_cache = plan_cache
+        self.fast_path = fast_path
+        self.speculative_chunks = speculative_chunks
+        self.speculative_workers = speculative_workers
+        self.partial_compile = partial_compile
+        self._local = threading.local()
+    
+    @property
+    def last_run(self) -> Optional[RunContext]:
+        """The latest run started by the calling thread"""
+        return getattr(self._local, "run", None)
+    
+    @property
+    def current_tasks(self) -> List[Task]:
+        """Tasks of the calling thread's latest run"""
+        return self.last_run.tasks if self.last_run else []
+    
+    @property
+    def run_stats(self) -> Dict[str, Any]:
+        """Statistics of the calling thread's latest run"""
+        return self.last_run.stats if self.last_run else {}
+    
+    @property
+    def conversation_state(self) -> Dict[str, Any]:
+        """Follow-up state of the calling thread's latest run"""
+        run = self.last_run
+        return {"awaiting_continuation": bool(run and run.awaiting_continuation),
+                "pending_clarifications": list(run.pending_clarifications) if run else []}
+        
+    def get_index(self, document_content: Any) -> BM25Index:
+        """
+        Return the chunk index for a document, building it once per document
+        
+        Args:
+            document_content: Document text or MappedDocument
+            
+        Returns:
+            BM25Index over the document's chunks
+        """
+        key = document_key(document_content)
+        with self._index_lock:
+            if key in self._indexes:
+                self._indexes.move_to_end(key)
+                return self._indexes[key]
+        
+        # Built outside the lock; a concurrent build of the same document wins or loses harmlessly
+        chunks = self.chunker.smart_chunk(document_content)
+        if self.dedupe_chunks:
+            from document_dedup import NearDuplicateDetector
+            chunks = NearDuplicateDetector().collapse_chunks(chunks)
+        index = BM25Index.build(chunks, document_key=key)
+        
+        with self._index_lock:
+            index = self._indexes.setdefault(key, index)
+            self._indexes.move_to_end(key)
+            while len(self._indexes) > 8:
+                self._indexes.popitem(last=False)
+        return index
+    
+    def gather_from_library(self, library_query: str) -> Optional[tuple]:
+        """
+        Collect the library chunks matching a query
+        
+        Args:
+            library_query: Free-text query over the library
+            
+        Returns:
+            Tuple of (combined content with per-chunk source headers, BM25
+            index over just those chunks), or None when nothing matches
+        """
+        if self.library is None:
+            raise ValueError("library_query requires a team created with a DocumentLibrary")
+        
+        hits = self.library.search(library_query, limit=self.library_limit)
+        if not hits:
+            return None
+        
+        for hit in hits:
+            hit["content"] = f"=== {hit['title']} (part {hit['position'] + 1}) ===\n{hit['content']}"
+        content = "\n\n".join(hit["content"] for hit in hits)
+        return content, BM25Index.build(hits, document_key=document_key(content))
+    
+    def apply_budget_mode(self, tasks: List[Task], ratio: float) -> Dict[str, Any]:
+        """
+        Replace text-task content with a local extractive summary
+        
+        Only tasks for SubAgent 1 and 2 are reduced; table tasks keep their
+        full content since dropping rows would change the data.
+        
+        Args:
+            tasks: Tasks with content attached
+            ratio: Target fraction of tokens to keep
+            
+        Returns:
+            Token savings across all reduced tasks
+        """
+        from extractive_summarizer import ExtractiveSummarizer
+        summarizer = ExtractiveSummarizer(ratio=ratio)
+        
+        original = reduced = 0
+        for task in tasks:
+            if task.assigned_to not in (AgentRole.SUBAGENT_1, AgentRole.SUBAGENT_2):
+                continue
+            content = str(task.content)
+            header = ""
+            if content.startswith("Requested section:"):
+                header, _, content = content.partition("\n\n")
+                header += "\n\n"
+            summary, report = summarizer.summarize(content)
+            task.content = header + summary
+            original += report["original_tokens"]
+            reduced += report["summary_tokens"]
+        
+        savings = {
+            "original_tokens": original,
+            "reduced_tokens": reduced,
+            "tokens_saved": original - reduced,
+            "reduction_pct": round(100.0 * (original - reduced) / original, 1) if original else 0.0
         }
+        print(f"[SYSTEM] Budget mode: ~{original} -> ~{reduced} input tokens "
+              f"({savings['reduction_pct']}% saved)")
+        return savings
+    
+    def start_speculation(self, index: BM25Index, user_request: str, executor) -> Dict[int, Any]:
+        """
+        Start digesting the chunks most likely to be planned, before the plan exists
+        
+        Args:
+            index: BM25 index over the document's chunks
+            user_request: User's instruction, used to pick the chunks
+            executor: Executor the digests run on
+            
+        Returns:
+            Futures of SubAgent 2 results, keyed by chunk index
+        """
+        hits = index.top_chunks(user_request, self.speculative_chunks)
+        if len(hits) < self.speculative_chunks:
+            seen = {hit["chunk_index"] for hit in hits}
+            hits += [{**chunk, "chunk_index": i} for i, chunk in enumerate(index.chunks)
+                     if i not in seen][:self.speculative_chunks - len(hits)]
+        
+        futures = {}
+        for hit in hits:
+            task = Task(
+                task_id=f"digest_{hit['chunk_index']}",
+                description=DIGEST_DESCRIPTION,
+                content=hit.get("content", ""),
+                assigned_to=AgentRole.SUBAGENT_2
+            )
+            # Digests carry the run's scheduling tag into the executor's threads
+            futures[hit["chunk_index"]] = executor.submit(contextvars.copy_context().run,
+                                                          self.subagent2.process, task, {})
+        print(f"[SYSTEM] Speculatively digesting {len(futures)} chunks while planning")
+        return futures
+    
+    def apply_speculation(self, tasks: List[Task], futures: Dict[int, Any]) -> Dict[str, int]:
+        """
+        Complete planned tasks from speculative digests and cancel the rest
+        
+        A task is compatible when the planner gave it the digest instruction
+        (offered in the planning prompt) and every chunk attached to it was
+        digested; its result is the digests in document order. Other tasks
+        keep their own instructions and content.
+        
+        Args:
+            tasks: Planned tasks with chunks attached
+            futures: Result of start_speculation
+            
+        Returns:
+            Counts of digests started, used and cancelled
+        """
+        used = set()
+        for task in tasks:
+            if (task.assigned_to not in (AgentRole.SUBAGENT_1, AgentRole.SUBAGENT_2)
+                    or not task.chunk_ids
+                    or not set(task.chunk_ids) <= futures.keys()
+                    or " ".join(task.description.split()) != DIGEST_DESCRIPTION):
+                continue
+            try:
+                results = [futures[chunk_id].result() for chunk_id in sorted(task.chunk_ids)]
+            except Exception:
+                continue
+            if any(result["needs_clarification"] for result in results):
+                continue
+            task.result = "\n\n".join(result["result"] for result in results)
+            task.status = "completed"
+            used.update(task.chunk_ids)
+        
+        cancelled = sum(1 for chunk_id, future in futures.items()
+                        if chunk_id not in used and future.cancel())
+        print(f"[SYSTEM] Speculation: {len(used)} digests used, {cancelled} cancelled")
+        return {"started": len(futures), "used": len(used), "cancelled": cancelled}
+    
+    @staticmethod
+    def task_cache_key(task: Task) -> str:
+        """Identity of a task's work: its agent, description and content"""
+        digest = hashlib.sha1()
+        for part in (task.assigned_to.value, task.description, str(task.content)):
+            digest.update(part.encode('utf-8', errors='replace'))
+            digest.update(b"\0")
+        return digest.hexdigest()
+    
+    @staticmethod
+    def render_tables_locally(request: str, tables: List[Dict[str, Any]]) -> Optional[str]:
+        """
+        Render structured tables without a model call when that is all the request asks
+        
+        Args:
+            request: User request or task description
+            tables: Tables as extracted by DocumentLoader.load_docx
+            
+        Returns:
+            Rendered tables (only those named, as in "convert table 2"), or
+            None if the request needs the model
+        """
+        fmt = TableRenderer.detect_conversion(request)
+        if fmt is None:
+            return None
+        selected = TableRenderer.select_tables(request, tables)
+        if selected is None:
+            return None
+        return TableRenderer.render_tables(selected, fmt)
+    
+    def direct_dispatch_task(self, user_request: str, document_content: Any) -> Optional[Task]:
+        """
+        Build the single task for a small document, skipping orchestration
         
-    def process_document(self, user_request: str, document_content: str, 
-                        context: Optional[Dict[str, Any]] = None) -> str:
+        Args:
+            user_request: User's instruction
+            document_content: The document content to process
+            
+        Returns:
+            Task for SubAgent 3 (table-like requests) or SubAgent 1, or None
+            if the document needs more than one chunk
+        """
+        if not isinstance(document_content, str) or len(document_content) > self.chunker.max_chunk_size:
+            return None
+        role = AgentRole.SUBAGENT_3 if TABLE_REQUEST.search(user_request) else AgentRole.SUBAGENT_1
+        return Task(
+            task_id="task_1",
+            description=user_request,
+            content=document_content,
+            assigned_to=role
+        )
+    
+    def process_document(self, user_request: str, document_content: Optional[str] = None, 
+                        context: Optional[Dict[str, Any]] = None,
+                        chunk_index: Optional[BM25Index] = None,
+                        library_query: Optional[str] = None,
+                        budget_ratio: Optional[float] = None,
+                        tables: Optional[List[Dict[str, Any]]] = None,
+                        result_cache: Optional[Dict[str, Dict[str, Any]]] = None,
+                        checkpoint: Optional[Union[str, CheckpointLog]] = None,
+                        run: Optional[RunContext] = None,
+                        priority: Optional[str] = None,
+                        tenant: Optional[str] = None,
+                        deadline: Optional[float] = None,
+                        best_effort: bool = False) -> str:
         """
         Main entry point for document processing
         
@@ -456,78 +977,419 @@ class LibrarianAgentsTeam:
             user_request: User's instruction for document processing
             document_content: The document content to process
             context: Optional additional context
+            chunk_index: Prebuilt (e.g. persisted) index for this document;
+                built and cached automatically when omitted
+            library_query: Instead of a single document, process the chunks
+                of the team's library that match this query
+            budget_ratio: Budget mode; shrink text-task content to about this
+                fraction of its tokens with a local extractive summary before
+                SubAgent 1/2 see it (e.g. 0.3). Trades some quality for cost.
+            tables: Structured tables already extracted from the document
+                (DocumentLoader.load_docx "tables"); pure format conversions
+                of these are rendered locally instead of by SubAgent 3
+            result_cache: Subagent results from earlier runs, keyed by
+                task_cache_key(); identical tasks reuse them and new results
+                are added (e.g. DocumentSession's per-session cache)
+            checkpoint: Path of (or an open) CheckpointLog. The plan and each
+                finished task result are appended as they complete; if the
+                log already holds a run of this request on this document,
+                that run is resumed, skipping planning and finished tasks
+            run: RunContext to keep this run's state in, for follow-ups from
+                other threads; a new one (also available as last_run in
+                this thread) when omitted
+            priority: Scheduling class of the run's model calls:
+                "interactive", "normal" (default) or "batch"; matters when
+                the backend is a shared ScheduledBackend
+            tenant: Who the run is for; tenants of one priority share a
+                ScheduledBackend's capacity by weight
+            deadline: Seconds the whole request may take. Planning, every
+                subagent call and compilation get the time left as their
+                timeout; DeadlineExceeded is raised when it runs out
+            best_effort: With a deadline, stop delegating early enough to
+                compile the tasks that finished and return that instead of
+                raising; the output notes what is missing
             
         Returns:
             Processed output from the agents team
+            
+        Raises:
+            DeadlineExceeded: The deadline passed (with best_effort: before
+                any task finished)
         """
         if context is None:
             context = {}
+        # Each request gets its own run; follow-ups of earlier runs stay with them
+        if run is None:
+            run = RunContext()
+        run.user_request = user_request
+        if priority is not None:
+            run.priority = priority
+        if tenant is not None:
+            run.tenant = tenant
+        if deadline is not None:
+            now = time.monotonic()
+            run.deadline = now + deadline
+            run.best_effort = best_effort
+            run.task_deadline = now + deadline * (1 - BEST_EFFORT_COMPILE_SHARE) if best_effort else run.deadline
+        self._local.run = run
+        
+        # Every model call of the run carries its scheduling tag and deadline
+        with call_tag(run.priority, run.tenant), call_deadline(run.deadline):
+            return self._process_run(run, user_request, document_content, context, chunk_index,
+                                     library_query, budget_ratio, tables, result_cache, checkpoint)
+    
+    def _process_run(self, run: RunContext, user_request: str, document_content: Any,
+                     context: Dict[str, Any], chunk_index: Optional[BM25Index],
+                     library_query: Optional[str], budget_ratio: Optional[float],
+                     tables: Optional[List[Dict[str, Any]]],
+                     result_cache: Optional[Dict[str, Dict[str, Any]]],
+                     checkpoint: Optional[Union[str, CheckpointLog]]) -> str:
+        """Plan, delegate and compile one request (the steps of process_document)"""
+        if library_query is not None:
+            gathered = self.gather_from_library(library_query)
+            if gathered is None:
+                return f"No documents in the library match: {library_query}"
+            document_content, chunk_index = gathered
+            print(f"[SYSTEM] Gathered {len(chunk_index.chunks)} matching chunks from the library")
+        elif document_content is None:
+            raise ValueError("Either document_content or library_query is required")
+        
+        # Fast path: "convert these tables to HTML" needs no model at all
+        if tables:
+            rendered = self.render_tables_locally(user_request, tables)
+            if rendered is not None:
+                print(f"[SYSTEM] Rendered the requested tables locally")
+                return rendered
             
-        print(f"[SYSTEM] Lead Orchestrator analyzing request...")
+        log = None
+        if checkpoint is not None:
+            log = checkpoint if isinstance(checkpoint, CheckpointLog) else CheckpointLog(checkpoint)
+            run.checkpoint = log
+        resumed = log is not None and log.matches(user_request, document_content)
+        if resumed and log.output is not None:
+            print(f"[SYSTEM] Checkpoint already holds the final output")
+            return log.output
         
-        # Step 1: Lead orchestrator analyzes and creates tasks
-        self.current_tasks = self.lead.analyze_request(user_request, document_content)
+        direct_task = None
+        if self.fast_path and library_query is None and not resumed:
+            direct_task = self.direct_dispatch_task(user_request, document_content)
         
-        print(f"[SYSTEM] Created {len(self.current_tasks)} tasks")
+        if resumed:
+            run.tasks = self.restore_checkpoint(log, document_content)
+            run.direct = log.plan.get("direct", False)
+            if run.direct:
+                direct_task = run.tasks[0]
+            print(f"[SYSTEM] Resuming from checkpoint: {len(log.results)} of "
+                  f"{len(run.tasks)} tasks already completed")
+        elif direct_task is not None:
+            print(f"[SYSTEM] Small document: dispatching directly to {self.agents[direct_task.assigned_to].name}")
+            run.tasks = [direct_task]
+            run.direct = True
+        else:
+            index = None
+            if self.retrieval_top_k:
+                index = chunk_index or self.get_index(document_content)
+            
+            executor = None
+            speculation = {}
+            if self.speculative_chunks and index is not None:
+                from concurrent.futures import ThreadPoolExecutor
+                executor = ThreadPoolExecutor(max_workers=self.speculative_workers)
+                speculation = self.start_speculation(index, user_request, executor)
+            
+            try:
+                print(f"[SYSTEM] Lead Orchestrator analyzing request...")
+                
+                # Step 1: Lead orchestrator analyzes and creates tasks
+                run.tasks = self.lead.analyze_request(user_request, document_content, self.plan_cache)
+                
+                if index is not None:
+                    self.lead.attach_chunks(run.tasks, index, self.retrieval_top_k, document_content)
+                
+                if speculation:
+                    run.stats["speculation"] = self.apply_speculation(run.tasks, speculation)
+            finally:
+                if executor is not None:
+                    # Digests already running finish in the background and are discarded
+                    for future in speculation.values():
+                        future.cancel()
+                    executor.shutdown(wait=False)
+            
+            if budget_ratio:
+                run.stats["budget_mode"] = self.apply_budget_mode(run.tasks, budget_ratio)
+        
+        if log is not None and not resumed:
+            log.record_plan(user_request, document_content,
+                            [task.to_dict(include_content=task.content is not document_content)
+                             for task in run.tasks],
+                            direct=direct_task is not None)
+            for task in run.tasks:
+                if task.status == "completed":
+                    log.record_result(task.task_id, task.result)
+        
+        print(f"[SYSTEM] Created {len(run.tasks)} tasks")
         print(f"[SYSTEM] Delegating to subagents...")
         
+        # A direct answer needs no compile, so it may use the whole deadline
+        task_deadline = run.deadline if direct_task is not None else run.task_deadline
+        
         # Step 2: Process each task with appropriate subagent
-        for task in self.current_tasks:
+        for position, task in enumerate(run.tasks):
             agent = self.agents[task.assigned_to]
+            if task.status == "completed":
+                source = "checkpointed result" if resumed else "speculative digests"
+                print(f"[SYSTEM] {agent.name} reused {source} for: {task.description}")
+                continue
             print(f"[SYSTEM] {agent.name} processing: {task.description}")
             
-            result = agent.process(task, context)
+            cache_key = self.task_cache_key(task) if result_cache is not None else None
+            rendered = None
+            if tables and task.assigned_to == AgentRole.SUBAGENT_3:
+                rendered = self.render_tables_locally(task.description, tables)
+            if rendered is not None:
+                result = {"result": rendered, "status": "completed", "needs_clarification": False}
+            elif cache_key is not None and cache_key in result_cache:
+                print(f"[SYSTEM] Reusing earlier result for: {task.description}")
+                result = result_cache[cache_key]
+            else:
+                try:
+                    with call_deadline(task_deadline):
+                        result = agent.process(task, context)
+                except DeadlineExceeded:
+                    if not run.best_effort:
+                        raise
+                    # The running call was cut off; tasks not yet started are skipped
+                    for missed in run.tasks[position:]:
+                        if missed.status != "completed":
+                            missed.status = "missed_deadline"
+                            run.missed_deadline.append(missed.task_id)
+                    print(f"[SYSTEM] Deadline reached: {len(run.missed_deadline)} of "
+                          f"{len(run.tasks)} tasks did not finish")
+                    break
+                if cache_key is not None and not result["needs_clarification"]:
+                    result_cache[cache_key] = result
             task.result = result["result"]
             task.status = result["status"]
             task.requires_clarification = result["needs_clarification"]
             
             if task.requires_clarification:
-                self.conversation_state["pending_clarifications"].append(task)
+                run.pending_clarifications.append(task)
+            elif log is not None:
+                log.record_result(task.task_id, task.result, task.status)
         
         # Step 3: Check for clarifications needed
-        if self.conversation_state["pending_clarifications"]:
-            clarification_messages = []
-            for task in self.conversation_state["pending_clarifications"]:
-                clarification_messages.append(
-                    f"**{self.agents[task.assigned_to].name}** needs clarification for:\n"
-                    f"Task: {task.description}\n"
-                    f"Question: {task.result}"
-                )
-            return "\n\n".join(clarification_messages)
-        
-        # Step 4: Lead orchestrator compiles results
-        print(f"[SYSTEM] Lead Orchestrator compiling final output...")
-        final_output = self.lead.compile_results(self.current_tasks, user_request)
-        
-        return final_output
-    
-    def continue_processing(self) -> str:
-        """Continue processing when user requests continuation"""
-        if not self.conversation_state["awaiting_continuation"]:
+        if run.pending_clarifications:
+            return self._clarification_response(run)
+        
+        finished = [task for task in run.tasks if task.task_id not in run.missed_deadline]
+        if run.deadline is not None and run.missed_deadline and not finished:
+            raise DeadlineExceeded("Deadline passed before any task finished")
+        
+        # A single specialist's answer needs no compilation
+        if direct_task is not None:
+            final_output = direct_task.result
+        else:
+            # Step 4: Lead orchestrator compiles results
+            print(f"[SYSTEM] Lead Orchestrator compiling final output...")
+            try:
+                final_output = self.lead.compile_results(finished, user_request, run=run)
+            except DeadlineExceeded:
+                if not run.best_effort:
+                    raise
+                print(f"[SYSTEM] Deadline reached while compiling; returning the task results as they are")
+                run.missed_deadline.append("compile")
+                final_output = "\n\n".join(task.result for task in finished)
+        
+        output = self._track_continuation(run, self._checkpoint_output(run, final_output))
+        return self._deadline_notice(run, output)
+    
+    @staticmethod
+    def _checkpoint_output(run: RunContext, output: str) -> str:
+        """Record a complete (not truncated or deadline-cut) final output in the run's checkpoint"""
+        if run.checkpoint is not None and run.truncated is None and not run.missed_deadline:
+            run.checkpoint.record_output(output)
+        return output
+    
+    @staticmethod
+    def _deadline_notice(run: RunContext, output: str) -> str:
+        """Say what a best-effort output is missing"""
+        missed = [task for task in run.tasks if task.task_id in run.missed_deadline]
+        notes = []
+        if missed:
+            notes.append(f"{len(missed)} of {len(run.tasks)} parts did not finish before the deadline "
+                         f"and are not included: " + "; ".join(task.description for task in missed))
+        if "compile" in run.missed_deadline:
+            notes.append("the finished parts could not be compiled in time and are shown as they are")
+        if not notes:
+            return output
+        return f"{output}\n\n---\n\nNote: " + "\n\nNote: ".join(notes)
+    
+    @staticmethod
+    def restore_checkpoint(log: CheckpointLog, document_content: Any) -> List[Task]:
+        """
+        Rebuild a checkpointed plan with its finished results applied
+        
+        Args:
+            log: CheckpointLog holding a plan
+            document_content: The document the plan was made for
+            
+        Returns:
+            Tasks; finished ones have status "completed" and their result
+        """
+        tasks = []
+        for data in log.plan["tasks"]:
+            task = Task.from_dict(data)
+            if data["content"] is None:
+                task.content = document_content
+            finished = log.results.get(task.task_id)
+            if finished is not None:
+                task.result = finished["result"]
+                task.status = "completed"
+            tasks.append(task)
+        return tasks
+    
+    def resume_document(self, checkpoint: Union[str, CheckpointLog], document_content: Any,
+                        **options) -> str:
+        """
+        Resume an interrupted process_document run from its checkpoint
+        
+        Args:
+            checkpoint: Path of (or an open) CheckpointLog written by process_document
+            document_content: The same document content as the original run
+            **options: Further process_document arguments (e.g. tables)
+            
+        Returns:
+            Processed output, as from process_document
+        """
+        log = checkpoint if isinstance(checkpoint, CheckpointLog) else CheckpointLog(checkpoint)
+        if log.plan is None:
+            raise ValueError(f"No checkpointed run in {log.path}")
+        if not log.matches(log.plan["request"], document_content):
+            raise ValueError(f"Checkpoint {log.path} was written for a different document")
+        return self.process_document(log.plan["request"], document_content, checkpoint=log, **options)
+    
+    def _merge_finished(self, run: RunContext) -> Optional[str]:
+        """
+        Compile the finished tasks of the current request incrementally
+        
+        Only tasks finished since the last merge are sent, together with
+        that merge; with nothing new the cached merge is returned as is.
+        
+        Returns:
+            Compiled output of every finished task, or None if none finished
+        """
+        merge = run.merge
+        merged_ids = set(merge["task_ids"]) if merge else set()
+        finished = [task for task in run.tasks
+                     if not task.requires_clarification and task.task_id not in run.missed_deadline]
+        new_tasks = [task for task in finished if task.task_id not in merged_ids]
+        if not new_tasks:
+            if merge:
+                print(f"[SYSTEM] Reusing the compiled output of {len(merged_ids)} finished tasks")
+            return merge["output"] if merge else None
+        
+        print(f"[SYSTEM] Lead Orchestrator compiling {len(new_tasks)} finished tasks"
+              + (f" into the earlier merge of {len(merged_ids)}" if merge else "") + "...")
+        output = self.lead.compile_results(new_tasks, run.user_request,
+                                           merge["output"] if merge else None, run=run)
+        if run.truncated is None:
+            run.merge = {"task_ids": sorted(merged_ids | {task.task_id for task in new_tasks}),
+                         "output": output}
+        return output
+    
+    def _clarification_response(self, run: RunContext) -> str:
+        """Questions for the pending tasks, after a draft of the finished ones"""
+        clarification_messages = []
+        for task in run.pending_clarifications:
+            clarification_messages.append(
+                f"**{self.agents[task.assigned_to].name}** needs clarification for:\n"
+                f"Task: {task.description}\n"
+                f"Question: {task.result}"
+            )
+        questions = "\n\n".join(clarification_messages)
+        
+        if not self.partial_compile or run.direct:
+            return questions
+        draft = self._merge_finished(run)
+        # A draft cut off at max_tokens is shown but not continued
+        run.truncated = None
+        if draft is None:
+            return questions
+        return f"{draft}\n\n---\n\nStill waiting on clarification:\n\n{questions}"
+    
+    @staticmethod
+    def _track_continuation(run: RunContext, output: str) -> str:
+        """Add the 'continue' notice to a compilation cut off at max_tokens"""
+        if run.truncated is None:
+            return output
+        print(f"[SYSTEM] Output reached the token limit; kept for continuation")
+        return f"{output}\n\n{CONTINUATION_NOTICE}"
+    
+    def continue_processing(self, run: Optional[RunContext] = None) -> str:
+        """
+        Continue processing when user requests continuation
+        
+        Args:
+            run: Run to continue (default: this thread's last run)
+        """
+        run = run or self.last_run
+        if run is None or not run.awaiting_continuation:
             return "No pending continuation. Please provide a new document processing request."
         
-        # Resume from where we left off
-        return "Continuing processing..."
+        # Resume from exactly where the output stopped; only new tokens are generated
+        with call_tag(run.priority, run.tenant):
+            return self._track_continuation(run, self.lead.continue_compilation(run))
     
-    def answer_clarification(self, answer: str) -> str:
-        """Process user's answer to clarification questions"""
-        if not self.conversation_state["pending_clarifications"]:
-            return "No pending clarifications. Ready for new tasks."
+    def answer_clarification(self, answer: str, task_ids: Optional[List[str]] = None,
+                             run: Optional[RunContext] = None) -> str:
+        """
+        Process user's answer to clarification questions
         
-        # Re-process tasks with clarification
-        for task in self.conversation_state["pending_clarifications"]:
-            context = {"clarification": answer}
-            agent = self.agents[task.assigned_to]
-            result = agent.process(task, context)
-            task.result = result["result"]
-            task.status = result["status"]
-            task.requires_clarification = result["needs_clarification"]
+        Only the tasks that asked are re-run; finished results are kept, and
+        the final compile merges the clarified results into the output
+        already compiled from the others, under the original request.
         
-        self.conversation_state["pending_clarifications"] = []
+        Args:
+            answer: The user's answer
+            task_ids: Pending tasks the answer applies to (default: all)
+            run: Run that asked (default: this thread's last run)
+            
+        Returns:
+            Final output, or a draft plus the questions still open
+        """
+        run = run or self.last_run
+        if run is None or not run.pending_clarifications:
+            return "No pending clarifications. Ready for new tasks."
         
-        # Compile final results
-        final_output = self.lead.compile_results(self.current_tasks, "Clarified task")
-        return final_output
+        # Re-process only the tasks the answer applies to
+        targets = [task for task in run.pending_clarifications
+                   if task_ids is None or task.task_id in task_ids]
+        if not targets:
+            return f"No pending clarification for: {', '.join(task_ids)}"
+        with call_tag(run.priority, run.tenant):
+            for task in targets:
+                context = {"clarification": answer}
+                agent = self.agents[task.assigned_to]
+                print(f"[SYSTEM] {agent.name} re-processing with clarification: {task.description}")
+                result = agent.process(task, context)
+                task.result = result["result"]
+                task.status = result["status"]
+                task.requires_clarification = result["needs_clarification"]
+                if run.checkpoint is not None and not task.requires_clarification:
+                    run.checkpoint.record_result(task.task_id, task.result, task.status)
+            
+            run.pending_clarifications = [task for task in run.pending_clarifications
+                                          if task.requires_clarification]
+            if run.pending_clarifications:
+                return self._clarification_response(run)
+            
+            if run.direct:
+                return self._checkpoint_output(run, run.tasks[0].result)
+            
+            # Compile final results, reusing the merge of the tasks that finished first
+            final_output = self._merge_finished(run)
+            run.merge = None
+            return self._track_continuation(run, self._checkpoint_output(run, final_output))
 
 def main():
     """Example usage of the librarian agents team"""
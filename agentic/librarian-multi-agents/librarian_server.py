@@ -0,0 +1,393 @@
+"""
+Librarian Server
+Long-running asyncio HTTP service that queues document jobs and runs them on
+a pool of workers sharing one backend, plan cache and rate limiter
+
+Endpoints:
+    POST   /jobs               {"request", "document" | "path", "options"} -> 202 {"job_id", ...}
+                               429 with Retry-After when the queue is full; queued
+                               jobs start in order of options.priority, and
+                               options.deadline counts from submission
+    GET    /jobs/{id}          Job status (and output once done)
+    GET    /jobs/{id}/events   Server-Sent Events: status changes, then the output in parts
+    GET    /jobs/{id}/result   Output as text; ?wait=1 blocks until the job finishes
+    DELETE /jobs/{id}          Cancel a queued job
+    GET    /health             Queue depth, busy workers and counters
+"""
+
+import asyncio
+import itertools
+import json
+import os
+import time
+import uuid
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, Tuple
+from urllib.parse import urlsplit, parse_qs
+
+from document_loader import DocumentLoader
+from document_preprocessor import DocumentPreprocessor
+from llm_backend import PRIORITIES, DeadlineExceeded
+
+MAX_BODY_BYTES = 64 * 1024 * 1024
+# process_document options a client may set per job
+JOB_OPTIONS = ("budget_ratio", "priority", "tenant", "deadline", "best_effort")
+STREAM_CHUNK_CHARS = 2000
+REASONS = {200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           409: "Conflict", 413: "Payload Too Large", 429: "Too Many Requests",
+           500: "Internal Server Error"}
+
+class Job:
+    """One queued document job"""
+
+    def __init__(self, request: str, document: Optional[str], path: Optional[str],
+                 options: Dict[str, Any]):
+        self.job_id = uuid.uuid4().hex[:16]
+        self.request = request
+        self.document = document
+        self.path = path
+        self.options = options
+        self.status = "queued"
+        self.output: Optional[str] = None
+        self.error: Optional[str] = None
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.changed = asyncio.Condition()
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("done", "failed", "cancelled")
+
+    def view(self, include_output: bool = True) -> Dict[str, Any]:
+        """JSON-serializable status"""
+        data = {"job_id": self.job_id, "status": self.status, "request": self.request,
+                "created": self.created, "started": self.started, "finished": self.finished,
+                "error": self.error}
+        if self.started and self.finished:
+            data["seconds"] = round(self.finished - self.started, 3)
+        if include_output and self.status == "done":
+            data["output"] = self.output
+        return data
+
+class LibrarianServer:
+    """
+    HTTP front end for a warm team
+
+    Jobs wait in a bounded queue; when it is full, new jobs are refused with
+    429 and a Retry-After hint instead of piling up. A fixed set of workers
+    takes jobs from the queue and runs process_document in a thread pool.
+    All workers share one team, and with it one backend (client, connection
+    pool, and the rate limiter if the backend is wrapped in one), plan cache
+    and chunk indexes, so the process stays warm across jobs.
+    """
+
+    def __init__(self, team: Any, host: str = "127.0.0.1", port: int = 8080,
+                 workers: int = 4, queue_size: int = 100, document_root: Optional[str] = None,
+                 max_finished_jobs: int = 1000, preprocess: bool = True):
+        """
+        Initialize server
+
+        Args:
+            team: LibrarianAgentsTeam shared by every worker
+            host: Interface to bind
+            port: Port to bind (0 picks a free one)
+            workers: Jobs processed concurrently
+            queue_size: Jobs that may wait; further submissions get 429
+            document_root: Directory jobs may name files in with "path";
+                None accepts only inline "document" text
+            max_finished_jobs: Finished jobs kept for status queries
+            preprocess: Clean up documents loaded from "path" like the CLI does
+        """
+        self.team = team
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.queue_size = queue_size
+        self.document_root = os.path.realpath(document_root) if document_root else None
+        self.max_finished_jobs = max_finished_jobs
+        self.preprocess = preprocess
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self.stats: Counter = Counter()
+        self.busy = 0
+        self.queued = 0
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._order = itertools.count()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._worker_tasks = []
+
+    # -- Jobs ---------------------------------------------------------------
+
+    def submit(self, payload: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        """
+        Validate and queue a job
+
+        Args:
+            payload: Decoded POST /jobs body
+
+        Returns:
+            Tuple of (HTTP status, response body)
+        """
+        request = payload.get("request")
+        if not isinstance(request, str) or not request.strip():
+            return 400, {"error": "'request' (string) is required"}
+        document, path = payload.get("document"), payload.get("path")
+        options = payload.get("options") or {}
+        if not isinstance(options, dict):
+            return 400, {"error": "'options' must be an object"}
+        unknown = sorted(set(options) - set(JOB_OPTIONS))
+        if unknown:
+            return 400, {"error": f"Unsupported options: {', '.join(unknown)}"}
+        priority = options.get("priority", "normal")
+        if priority not in PRIORITIES:
+            return 400, {"error": f"'priority' must be one of: {', '.join(PRIORITIES)}"}
+        if not isinstance(options.get("tenant", ""), str):
+            return 400, {"error": "'tenant' must be a string"}
+        deadline = options.get("deadline")
+        if deadline is not None and (isinstance(deadline, bool) or not isinstance(deadline, (int, float))
+                                     or deadline <= 0):
+            return 400, {"error": "'deadline' must be a positive number of seconds"}
+        budget_ratio = options.get("budget_ratio")
+        if budget_ratio is not None and (isinstance(budget_ratio, bool)
+                                         or not isinstance(budget_ratio, (int, float))
+                                         or not 0 < budget_ratio <= 1):
+            return 400, {"error": "'budget_ratio' must be a number in (0, 1]"}
+        if not isinstance(options.get("best_effort", False), bool):
+            return 400, {"error": "'best_effort' must be a boolean"}
+        if path is not None:
+            if self.document_root is None:
+                return 400, {"error": "This server does not accept 'path'; send 'document' text"}
+            path = os.path.realpath(os.path.join(self.document_root, path))
+            if os.path.commonpath([path, self.document_root]) != self.document_root:
+                return 400, {"error": "'path' must be inside the document root"}
+            if not os.path.isfile(path):
+                return 404, {"error": "Document not found"}
+        elif not isinstance(document, str):
+            return 400, {"error": "'document' (string) or 'path' is required"}
+
+        # Counted here rather than by the queue's maxsize, so that cancelled
+        # jobs still waiting to be skipped by a worker don't hold a slot
+        if self.queued >= self.queue_size:
+            self.stats["rejected"] += 1
+            return 429, {"error": "Job queue is full; retry later"}
+        job = Job(request, document, path, options)
+        # More urgent jobs start first; equal ones in submission order
+        self._queue.put_nowait((PRIORITIES.index(priority), next(self._order), job))
+        self.queued += 1
+        self.jobs[job.job_id] = job
+        self.stats["submitted"] += 1
+        self._forget_finished()
+        return 202, {"job_id": job.job_id, "status": job.status, "queued": self.queued}
+
+    def _forget_finished(self):
+        """Drop the oldest finished jobs beyond max_finished_jobs"""
+        finished = [job_id for job_id, job in self.jobs.items() if job.done]
+        for job_id in finished[:max(0, len(finished) - self.max_finished_jobs)]:
+            del self.jobs[job_id]
+
+    def _run_job(self, job: Job) -> str:
+        """Process a job (in a worker thread)"""
+        options = dict(job.options)
+        if "deadline" in options:
+            # Time spent queued counts against the job's deadline
+            options["deadline"] -= time.time() - job.created
+            if options["deadline"] <= 0:
+                raise DeadlineExceeded("Deadline passed while the job was queued")
+        document = job.document
+        if job.path is not None:
+            doc_data = DocumentLoader.load_document(job.path)
+            if self.preprocess and isinstance(doc_data.get('content'), str):
+                doc_data = DocumentPreprocessor().process(doc_data)
+            document = doc_data.get('content', '')
+        return self.team.process_document(job.request, document, **options)
+
+    async def _set_status(self, job: Job, status: str):
+        async with job.changed:
+            job.status = status
+            job.changed.notify_all()
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            _, _, job = await self._queue.get()
+            try:
+                if job.status == "cancelled":
+                    continue
+                self.queued -= 1
+                job.started = time.time()
+                self.busy += 1
+                await self._set_status(job, "running")
+                try:
+                    job.output = await loop.run_in_executor(self._executor, self._run_job, job)
+                    status = "done"
+                except Exception as e:
+                    job.error = f"{type(e).__name__}: {e}"
+                    status = "failed"
+                finally:
+                    self.busy -= 1
+                job.finished = time.time()
+                self.stats[status] += 1
+                await self._set_status(job, status)
+            finally:
+                self._queue.task_done()
+
+    async def cancel(self, job: Job) -> Tuple[int, Dict[str, Any]]:
+        """Cancel a job that has not started; its queue slot is freed at once"""
+        if job.status != "queued":
+            return 409, {"error": f"Job is {job.status}; only queued jobs can be cancelled"}
+        self.queued -= 1
+        job.finished = time.time()
+        self.stats["cancelled"] += 1
+        await self._set_status(job, "cancelled")
+        return 200, job.view()
+
+    def health(self) -> Dict[str, Any]:
+        health = {"queued": self.queued, "queue_size": self.queue_size,
+                  "workers": self.workers, "busy": self.busy, "jobs": len(self.jobs),
+                  "stats": dict(self.stats)}
+        # Counters of each backend layer that keeps them (coalescing, scheduling)
+        backend, layers = self.team.backend, {}
+        while backend is not None:
+            if getattr(backend, "stats", None) is not None:
+                layers[type(backend).__name__] = dict(backend.stats)
+            backend = getattr(backend, "inner", None)
+        if layers:
+            health["backend"] = layers
+        return health
+
+    # -- HTTP ---------------------------------------------------------------
+
+    async def _send(self, writer: asyncio.StreamWriter, status: int, body: Any,
+                    content_type: str = "application/json", headers: Optional[Dict[str, str]] = None):
+        data = (json.dumps(body) if content_type == "application/json" else body).encode('utf-8')
+        head = [f"HTTP/1.1 {status} {REASONS.get(status, '')}",
+                f"Content-Type: {content_type}; charset=utf-8",
+                f"Content-Length: {len(data)}", "Connection: close"]
+        head.extend(f"{name}: {value}" for name, value in (headers or {}).items())
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode('latin-1') + data)
+        await writer.drain()
+
+    async def _stream_events(self, writer: asyncio.StreamWriter, job: Job):
+        """Send status changes as Server-Sent Events, then the output in parts"""
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+                     b"Cache-Control: no-cache\r\nConnection: close\r\n\r\n")
+
+        def event(name: str, data: Dict[str, Any]) -> bytes:
+            return f"event: {name}\ndata: {json.dumps(data)}\n\n".encode('utf-8')
+
+        last = None
+        while True:
+            async with job.changed:
+                await job.changed.wait_for(lambda: job.status != last)
+                last = job.status
+            writer.write(event("status", job.view(include_output=False)))
+            await writer.drain()
+            if job.done:
+                break
+        if job.status == "done":
+            for offset in range(0, len(job.output), STREAM_CHUNK_CHARS):
+                writer.write(event("output", {"text": job.output[offset:offset + STREAM_CHUNK_CHARS]}))
+                await writer.drain()
+        writer.write(event("end", {"status": job.status}))
+        await writer.drain()
+
+    async def _route(self, method: str, target: str, body: bytes, writer: asyncio.StreamWriter):
+        url = urlsplit(target)
+        parts = [part for part in url.path.split("/") if part]
+        query = parse_qs(url.query)
+
+        if parts == ["health"] and method == "GET":
+            return await self._send(writer, 200, self.health())
+        if parts == ["jobs"]:
+            if method != "POST":
+                return await self._send(writer, 405, {"error": "Use POST to submit a job"})
+            try:
+                payload = json.loads(body or b"{}")
+            except json.JSONDecodeError as e:
+                return await self._send(writer, 400, {"error": f"Invalid JSON: {e}"})
+            if not isinstance(payload, dict):
+                return await self._send(writer, 400, {"error": "Body must be a JSON object"})
+            status, response = self.submit(payload)
+            headers = {"Retry-After": "5"} if status == 429 else None
+            return await self._send(writer, status, response, headers=headers)
+
+        if len(parts) in (2, 3) and parts[0] == "jobs":
+            job = self.jobs.get(parts[1])
+            if job is None:
+                return await self._send(writer, 404, {"error": "Job not found"})
+            action = parts[2] if len(parts) == 3 else None
+            if action is None and method == "GET":
+                return await self._send(writer, 200, job.view())
+            if action is None and method == "DELETE":
+                return await self._send(writer, *(await self.cancel(job)))
+            if action == "events" and method == "GET":
+                return await self._stream_events(writer, job)
+            if action == "result" and method == "GET":
+                if query.get("wait", ["0"])[0] not in ("0", "false", ""):
+                    async with job.changed:
+                        await job.changed.wait_for(lambda: job.done)
+                if job.status == "done":
+                    return await self._send(writer, 200, job.output, content_type="text/plain")
+                if job.done:
+                    return await self._send(writer, 409, job.view())
+                return await self._send(writer, 202, job.view(), headers={"Retry-After": "2"})
+        return await self._send(writer, 404, {"error": f"No route for {method} {url.path}"})
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await reader.readline()
+            if not request_line:
+                return
+            method, target, _ = request_line.decode('latin-1').split(" ", 2)
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode('latin-1').partition(":")
+                headers[name.strip().lower()] = value.strip()
+            length = int(headers.get("content-length", 0))
+            if length > MAX_BODY_BYTES:
+                return await self._send(writer, 413, {"error": "Request body too large"})
+            body = await reader.readexactly(length) if length else b""
+            await self._route(method.upper(), target, body, writer)
+        except (ValueError, asyncio.IncompleteReadError) as e:
+            await self._send(writer, 400, {"error": f"Malformed request: {e}"})
+        except ConnectionError:
+            pass
+        except Exception as e:
+            await self._send(writer, 500, {"error": f"{type(e).__name__}: {e}"})
+        finally:
+            writer.close()
+
+    # -- Lifecycle ----------------------------------------------------------
+
+    async def start(self):
+        """Bind the socket and start the workers"""
+        self._queue = asyncio.PriorityQueue()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="librarian")
+        self._worker_tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        print(f"[SYSTEM] Serving on http://{self.host}:{self.port} with {self.workers} workers "
+              f"(queue size {self.queue_size})")
+
+    async def stop(self):
+        """Stop accepting connections and workers; running jobs finish in their threads"""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def serve_forever(self):
+        await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.stop()
@@ -0,0 +1,568 @@
+"""
+LLM Backends
+The interface agents use to call the model, with the Anthropic SDK as the
+default, wrappers that rate-limit, schedule and coalesce calls, and an on-disk
+record/replay backend for offline, deterministic runs
+"""
+
+import hashlib
+import heapq
+import itertools
+import json
+import os
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, Any, Optional, Union, Tuple
+
+# The Anthropic SDK (and httpx underneath it) is imported and the client is
+# constructed on first use, so importing this module stays cheap
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """Return the shared Anthropic client, creating it on first use"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from anthropic import Anthropic
+                _client = Anthropic(api_key=os.environ.get("ANTHROPIC_API_KEY"))
+    return _client
+
+def set_client(client) -> None:
+    """Replace the shared client (e.g. with a pre-configured or fake one)"""
+    global _client
+    with _client_lock:
+        _client = client
+
+# Scheduling classes, most urgent first
+PRIORITIES = ("interactive", "normal", "batch")
+_call_tag: ContextVar = ContextVar("call_tag", default=("normal", "default"))
+
+@contextmanager
+def call_tag(priority: str = "normal", tenant: str = "default"):
+    """
+    Tag the model calls made in this context for ScheduledBackend
+
+    Threads do not inherit the tag; submit work with
+    contextvars.copy_context().run to carry it over.
+
+    Args:
+        priority: One of PRIORITIES
+        tenant: Who the calls are made for; tenants share capacity by weight
+    """
+    if priority not in PRIORITIES:
+        raise ValueError(f"Unsupported priority: {priority}. Supported priorities: {', '.join(PRIORITIES)}")
+    token = _call_tag.set((priority, tenant))
+    try:
+        yield
+    finally:
+        _call_tag.reset(token)
+
+def current_call_tag() -> Tuple[str, str]:
+    """(priority, tenant) of the calling context"""
+    return _call_tag.get()
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a request's deadline passes before a model call could finish"""
+
+_deadline: ContextVar = ContextVar("deadline", default=None)
+
+@contextmanager
+def call_deadline(at: Optional[float]):
+    """
+    Make the model calls in this context finish by a deadline
+
+    Backends give each call the time left as its timeout and raise
+    DeadlineExceeded once it has run out. A nested deadline never extends
+    an enclosing one. Like call_tag, it reaches other threads only through
+    contextvars.copy_context().run.
+
+    Args:
+        at: time.monotonic() value to finish by; None for no (further) limit
+    """
+    outer = _deadline.get()
+    if at is None or (outer is not None and outer < at):
+        at = outer
+    token = _deadline.set(at)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+def remaining_time() -> Optional[float]:
+    """Seconds left before the calling context's deadline, or None without one"""
+    at = _deadline.get()
+    return None if at is None else at - time.monotonic()
+
+def check_deadline() -> Optional[float]:
+    """
+    Seconds left before the calling context's deadline
+
+    Returns:
+        Remaining seconds, or None without a deadline
+
+    Raises:
+        DeadlineExceeded: The deadline has passed
+    """
+    remaining = remaining_time()
+    if remaining is not None and remaining <= 0:
+        raise DeadlineExceeded("Deadline passed before the model call could start")
+    return remaining
+
+@dataclass
+class LLMResponse:
+    """Backend-independent result of a Messages API call"""
+    text: str
+    stop_reason: Optional[str] = None
+    usage: Dict[str, int] = field(default_factory=dict)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"text": self.text, "stop_reason": self.stop_reason, "usage": self.usage}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "LLMResponse":
+        return cls(text=data["text"], stop_reason=data.get("stop_reason"), usage=data.get("usage", {}))
+
+class LLMBackend:
+    """Base class for model backends"""
+
+    def create(self, **params) -> LLMResponse:
+        """
+        Run one Messages API request
+
+        Args:
+            **params: messages.create parameters (model, max_tokens, system, messages, ...)
+
+        Returns:
+            LLMResponse
+        """
+        raise NotImplementedError
+
+class AnthropicBackend(LLMBackend):
+    """Calls the Anthropic Messages API through the SDK"""
+
+    USAGE_FIELDS = ("input_tokens", "output_tokens",
+                    "cache_creation_input_tokens", "cache_read_input_tokens")
+    # Above this the SDK refuses non-streaming requests unless a timeout is set
+    NONSTREAMING_MAX_TOKENS = 21333
+    # Errors retried under a deadline, while time is left
+    RETRY_STATUS_CODES = (408, 409, 429, 500, 502, 503, 504, 529)
+
+    def __init__(self, client=None, base_url: Optional[str] = None, api_key: Optional[str] = None,
+                 max_retries: Optional[int] = None, stream: Optional[bool] = None):
+        """
+        Args:
+            client: Anthropic client; defaults to the shared lazily-created one
+            base_url: API endpoint (e.g. a mock_server.py URL); creates a
+                dedicated client instead of the shared one
+            api_key: API key for the dedicated client (default: ANTHROPIC_API_KEY)
+            max_retries: SDK retries on 429/5xx for the dedicated client
+            stream: Stream responses; None streams only when max_tokens is
+                too large for a non-streaming request
+        """
+        self._client = client
+        self.base_url = base_url
+        self.api_key = api_key
+        self.max_retries = max_retries
+        self.stream = stream
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        """Injected or dedicated client, or the shared lazily-created one"""
+        if self._client is not None:
+            return self._client
+        if self.base_url is None and self.api_key is None and self.max_retries is None:
+            return get_client()
+        with self._lock:
+            if self._client is None:
+                from anthropic import Anthropic
+                options = {"api_key": self.api_key or os.environ.get("ANTHROPIC_API_KEY")}
+                if self.base_url is not None:
+                    options["base_url"] = self.base_url
+                if self.max_retries is not None:
+                    options["max_retries"] = self.max_retries
+                self._client = Anthropic(**options)
+        return self._client
+
+    def create(self, **params) -> LLMResponse:
+        # Building the client can take seconds the first time; the deadline is
+        # checked after it, so the timeout is the time left at the request
+        client = self.client
+        if remaining_time() is None:
+            return self._create(client, params)
+
+        # Under a deadline each attempt's timeout is the time left. The SDK's
+        # own retries would each start a fresh timeout, so retry here instead,
+        # and only while time remains
+        client = client.with_options(max_retries=0)
+        remaining = check_deadline()
+        attempt = 0
+        while True:
+            try:
+                return self._create(client, {**params, "timeout": remaining})
+            except Exception as e:
+                remaining = remaining_time()
+                if remaining <= 0:
+                    raise DeadlineExceeded("Deadline passed during the model call") from e
+                from anthropic import APIConnectionError
+                retryable = (getattr(e, "status_code", None) in self.RETRY_STATUS_CODES
+                             or isinstance(e, APIConnectionError))
+                if not retryable or attempt >= 2:
+                    raise
+                response = getattr(e, "response", None)
+                retry_after = response.headers.get("retry-after") if response is not None else None
+                try:
+                    delay = float(retry_after) if retry_after else 0.5 * 2 ** attempt
+                except ValueError:
+                    delay = 0.5 * 2 ** attempt
+                if delay >= remaining:
+                    raise DeadlineExceeded("Deadline would pass before the model call could be retried") from e
+                time.sleep(delay)
+                remaining = check_deadline()
+                attempt += 1
+
+    def _create(self, client, params: Dict[str, Any]) -> LLMResponse:
+        stream = self.stream
+        if stream is None:
+            stream = params.get("max_tokens", 0) > self.NONSTREAMING_MAX_TOKENS
+        if stream:
+            with client.messages.stream(**params) as response_stream:
+                response = response_stream.get_final_message()
+        else:
+            response = client.messages.create(**params)
+
+        usage = getattr(response, "usage", None)
+        return LLMResponse(
+            text="".join(block.text for block in response.content if getattr(block, "type", "text") == "text"),
+            stop_reason=getattr(response, "stop_reason", None),
+            usage={name: getattr(usage, name) or 0 for name in self.USAGE_FIELDS
+                   if usage is not None and hasattr(usage, name)}
+        )
+
+class RateLimitedBackend(LLMBackend):
+    """
+    Wraps a backend with a request-rate limit and a concurrency cap
+
+    The rate limit is a token bucket refilled at requests_per_minute, so
+    short bursts up to one minute's allowance go straight through and
+    sustained load is spread out instead of drawing 429s. Safe to share
+    between threads.
+    """
+
+    def __init__(self, inner: LLMBackend, requests_per_minute: Optional[float] = None,
+                 max_concurrent: Optional[int] = None):
+        """
+        Initialize backend
+
+        Args:
+            inner: Backend that makes the calls
+            requests_per_minute: Sustained request rate; None for no limit
+            max_concurrent: Calls in flight at once; None for no limit
+        """
+        self.inner = inner
+        self.requests_per_minute = requests_per_minute
+        self.max_concurrent = max_concurrent
+        self.waited_seconds = 0.0
+        self._allowance = float(requests_per_minute or 0)
+        self._last_refill = time.monotonic()
+        self._slots = threading.BoundedSemaphore(max_concurrent) if max_concurrent else None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        """The inner backend's client, for callers that need the SDK directly"""
+        return getattr(self.inner, "client", None)
+
+    def _take_token(self):
+        """Block until the rate limit allows another request (or the deadline would pass)"""
+        rate = self.requests_per_minute
+        if not rate:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._allowance = min(rate, self._allowance + (now - self._last_refill) * rate / 60)
+                self._last_refill = now
+                if self._allowance >= 1:
+                    self._allowance -= 1
+                    return
+                wait = (1 - self._allowance) * 60 / rate
+                remaining = remaining_time()
+                if remaining is not None and wait >= remaining:
+                    raise DeadlineExceeded("Deadline would pass while waiting for the rate limit")
+                self.waited_seconds += wait
+            time.sleep(wait)
+
+    def create(self, **params) -> LLMResponse:
+        if self._slots is not None:
+            remaining = check_deadline()
+            if not self._slots.acquire(timeout=remaining):
+                raise DeadlineExceeded("Deadline passed while waiting for a call slot")
+        try:
+            self._take_token()
+            return self.inner.create(**params)
+        finally:
+            if self._slots is not None:
+                self._slots.release()
+
+class ScheduledBackend(LLMBackend):
+    """
+    Caps concurrent calls and decides who goes next when they are all in use
+
+    Calls are tagged with call_tag(). A freed slot goes to the most urgent
+    priority class with calls waiting; within a class, tenants are served by
+    weighted fair queuing, so a tenant with thousands of queued calls gets
+    its weighted share of the slots rather than all of them. Calls are
+    admitted immediately while slots are free and nobody is waiting.
+
+    Put it outside RateLimitedBackend: only max_concurrent calls then wait
+    on the rate limit, and the queue (with its ordering) forms here.
+    """
+
+    def __init__(self, inner: LLMBackend, max_concurrent: int,
+                 tenant_weights: Optional[Dict[str, float]] = None):
+        """
+        Initialize backend
+
+        Args:
+            inner: Backend that makes the calls
+            max_concurrent: Calls in flight at once
+            tenant_weights: Relative share of each tenant within a priority
+                class; tenants not listed weigh 1
+        """
+        self.inner = inner
+        self.max_concurrent = max(1, max_concurrent)
+        self.tenant_weights = dict(tenant_weights or {})
+        self.stats: Counter = Counter()
+        self._running = 0
+        self._waiting = {priority: [] for priority in PRIORITIES}
+        # Weighted fair queuing state per priority class: virtual time and
+        # each tenant's last finish tag
+        self._virtual_time = {priority: 0.0 for priority in PRIORITIES}
+        self._finish: Dict[Tuple[str, str], float] = {}
+        self._order = itertools.count()
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        """The inner backend's client, for callers that need the SDK directly"""
+        return getattr(self.inner, "client", None)
+
+    def _admit(self, priority: str, tenant: str):
+        """Block until the call may start"""
+        with self._lock:
+            self.stats[f"{priority}_calls"] += 1
+            if self._running < self.max_concurrent and not any(self._waiting.values()):
+                self._running += 1
+                return
+            weight = self.tenant_weights.get(tenant, 1.0)
+            finish = max(self._virtual_time[priority], self._finish.get((priority, tenant), 0.0)) + 1.0 / weight
+            self._finish[(priority, tenant)] = finish
+            ready = threading.Event()
+            entry = (finish, next(self._order), ready)
+            heapq.heappush(self._waiting[priority], entry)
+            self.stats["queued"] += 1
+        start = time.monotonic()
+        admitted = ready.wait(timeout=remaining_time())
+        with self._lock:
+            self.stats[f"{priority}_wait_seconds"] += time.monotonic() - start
+            # A slot handed over just as the deadline passed is still ours
+            if not admitted and not ready.is_set():
+                self._waiting[priority].remove(entry)
+                heapq.heapify(self._waiting[priority])
+                self.stats["expired"] += 1
+                raise DeadlineExceeded("Deadline passed while queued for a call slot")
+
+    def _release(self):
+        """Hand the finished call's slot to the next waiting call, if any"""
+        with self._lock:
+            for priority in PRIORITIES:
+                if self._waiting[priority]:
+                    finish, _, ready = heapq.heappop(self._waiting[priority])
+                    self._virtual_time[priority] = max(self._virtual_time[priority], finish)
+                    ready.set()
+                    return
+            self._running -= 1
+
+    def create(self, **params) -> LLMResponse:
+        check_deadline()
+        self._admit(*current_call_tag())
+        try:
+            return self.inner.create(**params)
+        finally:
+            self._release()
+
+class ReplayMiss(LookupError):
+    """Raised in replay mode when no recording matches a request"""
+
+class RecordReplayBackend(LLMBackend):
+    """
+    Records request/response pairs to a directory and replays them
+
+    Each pair is one JSON file named by a hash of the canonical request, so
+    recordings can be diffed, pruned and shared. Replays can simulate the
+    latency of the original calls (or a fixed latency) to make offline
+    performance runs realistic yet deterministic.
+    """
+
+    MODES = ("record", "replay", "auto")
+
+    def __init__(self, directory: str, mode: str = "replay", inner: Optional[LLMBackend] = None,
+                 latency: Union[None, float, str] = None, jitter: float = 0.0, seed: int = 0):
+        """
+        Initialize backend
+
+        Args:
+            directory: Where recordings are stored
+            mode: "record" (always call inner and save), "replay" (recordings
+                only; ReplayMiss otherwise) or "auto" (replay, record misses)
+            inner: Backend used for recording (default: AnthropicBackend())
+            latency: Simulated latency on replay: None for none, seconds, or
+                "recorded" to sleep as long as the original call took
+            jitter: Random +/- fraction applied to the simulated latency
+            seed: Seed for the jitter, so runs are repeatable
+        """
+        if mode not in self.MODES:
+            raise ValueError(f"Unsupported mode: {mode}. Supported modes: {', '.join(self.MODES)}")
+        self.directory = directory
+        self.mode = mode
+        self.inner = inner
+        self.latency = latency
+        self.jitter = jitter
+        self.hits = 0
+        self.recorded = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def request_key(params: Dict[str, Any]) -> str:
+        """Stable hash of a request's parameters"""
+        canonical = json.dumps(params, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _delay(self, recorded_seconds: float) -> float:
+        """Seconds to sleep before returning a replayed response"""
+        if self.latency is None:
+            return 0.0
+        base = recorded_seconds if self.latency == "recorded" else float(self.latency)
+        if self.jitter:
+            with self._lock:
+                base *= 1 + self._random.uniform(-self.jitter, self.jitter)
+        return max(0.0, base)
+
+    def create(self, **params) -> LLMResponse:
+        key = self.request_key(params)
+        path = self._path(key)
+
+        if self.mode != "record" and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                recording = json.load(f)
+            delay = self._delay(recording.get("latency", 0.0))
+            remaining = check_deadline()
+            if remaining is not None and delay > remaining:
+                # Simulated like a live call that outlasts the deadline
+                time.sleep(remaining)
+                raise DeadlineExceeded("Deadline passed during the model call")
+            if delay:
+                time.sleep(delay)
+            with self._lock:
+                self.hits += 1
+            return LLMResponse.from_dict(recording["response"])
+
+        if self.mode == "replay":
+            raise ReplayMiss(f"No recording for request {key[:12]} in {self.directory}")
+
+        inner = self.inner if self.inner is not None else AnthropicBackend()
+        start = time.perf_counter()
+        response = inner.create(**params)
+        recording = {
+            "request": params,
+            "response": response.to_dict(),
+            "latency": round(time.perf_counter() - start, 4)
+        }
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(recording, f, indent=2, default=str)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self.recorded += 1
+        return response
+
+class SingleFlightBackend(LLMBackend):
+    """
+    Coalesces identical concurrent requests into one call
+
+    When a request is issued while an identical one (same model, prompts
+    and content, compared by request hash) is still in flight, the later
+    caller waits for the first call's response instead of paying for its
+    own. Nothing is cached: once a call finishes, the next identical
+    request is sent again.
+    """
+
+    def __init__(self, inner: LLMBackend):
+        """
+        Initialize backend
+
+        Args:
+            inner: Backend that makes the calls
+        """
+        self.inner = inner
+        self.stats: Counter = Counter()
+        self._in_flight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        """The inner backend's client, for callers that need the SDK directly"""
+        return getattr(self.inner, "client", None)
+
+    def create(self, **params) -> LLMResponse:
+        check_deadline()
+        key = RecordReplayBackend.request_key(params)
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self._in_flight[key] = Future()
+                self.stats["calls"] += 1
+            else:
+                self.stats["coalesced"] += 1
+        if not leader:
+            try:
+                return future.result(timeout=remaining_time())
+            except DeadlineExceeded:
+                # The first caller's deadline passed; ours may not have
+                if remaining_time() is None or remaining_time() > 0:
+                    return self.create(**params)
+                raise
+            except FutureTimeout:
+                # On Python 3.11+ this is the builtin TimeoutError, which the
+                # first caller's own call may have raised; pass that on as is
+                if future.done():
+                    raise
+                raise DeadlineExceeded("Deadline passed while waiting for an identical call") from None
+
+        try:
+            response = self.inner.create(**params)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(response)
+            return response
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
@@ -0,0 +1,486 @@
+#!/usr/bin/env python3
+"""
+Mock Anthropic Server
+Local stand-in for the Messages (including streaming) and Message Batches
+endpoints, with scripted fault profiles for load and failure testing
+
+Usage:
+    python mock_server.py --port 8765
+    python mock_server.py --port 8765 --profile flaky --seed 7
+    python cli.py -i doc.txt -r "Summarize" --base-url http://127.0.0.1:8765
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from dataclasses import dataclass
+from datetime import datetime, timezone, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Dict, Any, Callable, Optional, Tuple, Union
+
+TABLE_WORDS = re.compile(r'\b(tables?|tabular|csv|columns?|rows?)\b', re.IGNORECASE)
+
+def _request_text(params: Dict[str, Any]) -> str:
+    """All user-turn text of a Messages API request"""
+    parts = []
+    for message in params.get("messages", []):
+        if message.get("role") != "user":
+            continue
+        content = message.get("content", "")
+        if isinstance(content, str):
+            parts.append(content)
+        else:
+            parts.extend(block.get("text", "") for block in content if block.get("type") == "text")
+    return "\n".join(parts)
+
+def default_responder(params: Dict[str, Any]) -> str:
+    """
+    Deterministic reply for a request, shaped like the real agents' output
+
+    Planning prompts get a JSON task breakdown, compilation prompts a
+    compiled document, and subagent prompts a short processed result.
+    """
+    text = _request_text(params)
+    if "Create a JSON task breakdown" in text:
+        match = re.search(r'User Request: (.*)', text)
+        request = match.group(1).strip() if match else "Process the document"
+        tasks = [
+            {"task_id": "task_1", "description": f"{request} (first half)",
+             "assigned_to": "subagent_1", "content_section": "opening chapters"},
+            {"task_id": "task_2", "description": f"{request} (second half)",
+             "assigned_to": "subagent_2", "content_section": "closing chapters"},
+        ]
+        if TABLE_WORDS.search(request):
+            tasks.append({"task_id": "task_3", "description": "Build the requested tables",
+                          "assigned_to": "subagent_3", "content_section": "figures and data"})
+        return json.dumps({"tasks": tasks, "coordination_notes": "mock plan"})
+    if text.startswith("Subagent Results:"):
+        sections = re.findall(r'^=== (.*?) ===$', text, re.MULTILINE)
+        return "# Compiled Output\n\n" + "\n".join(f"- {section}" for section in sections)
+    match = re.search(r'Task: (.*)', text)
+    task = match.group(1).strip() if match else "task"
+    return f"Processed ({task}): {len(text)} characters of input reviewed."
+
+@dataclass
+class FaultProfile:
+    """
+    Latency and failure behaviour of the mock Messages endpoint
+
+    Latency is log-normal around latency_median (sigma 0 makes it fixed);
+    for streams it is the time to first token, followed by one delay per
+    text delta. Errors are drawn at the given rates, or taken in turn from
+    script ("ok", "429", "529", "slow") when a script is set.
+    """
+    latency_median: float = 0.0
+    latency_sigma: float = 0.0
+    stream_chunk_chars: int = 40
+    stream_chunk_delay: float = 0.0
+    error_429_rate: float = 0.0
+    error_529_rate: float = 0.0
+    retry_after: float = 1.0
+    requests_per_minute: Optional[int] = None
+    script: Tuple[str, ...] = ()
+    slow_factor: float = 10.0
+
+PROFILES: Dict[str, FaultProfile] = {
+    "instant": FaultProfile(),
+    "realistic": FaultProfile(latency_median=0.8, latency_sigma=0.5, stream_chunk_delay=0.02),
+    "rate-limited": FaultProfile(latency_median=0.3, latency_sigma=0.3,
+                                 requests_per_minute=30, retry_after=2.0),
+    "overloaded": FaultProfile(latency_median=0.5, latency_sigma=0.5, error_529_rate=0.3),
+    "flaky": FaultProfile(latency_median=0.5, latency_sigma=0.8, error_429_rate=0.1,
+                          error_529_rate=0.1, retry_after=1.0),
+    "slow-stream": FaultProfile(latency_median=2.0, latency_sigma=0.3, stream_chunk_chars=10,
+                                stream_chunk_delay=0.25),
+    "scripted": FaultProfile(script=("429", "ok", "529", "ok", "slow", "ok"), retry_after=1.0,
+                             latency_median=0.1),
+    "stalled": FaultProfile(script=("ok", "ok", "slow"), latency_median=0.1, slow_factor=600.0),
+}
+
+def _cache_segments(params: Dict[str, Any]) -> List[Tuple[str, bool]]:
+    """Prompt blocks in cache order (system, then messages) with their cache_control flag"""
+    segments = []
+    system = params.get("system")
+    if isinstance(system, str):
+        segments.append((system, False))
+    elif isinstance(system, list):
+        segments.extend((block.get("text", ""), "cache_control" in block) for block in system)
+    for message in params.get("messages", []):
+        content = message.get("content", "")
+        if isinstance(content, str):
+            segments.append((f"{message.get('role')}:{content}", False))
+        else:
+            segments.extend((f"{message.get('role')}:{block.get('text', '')}", "cache_control" in block)
+                            for block in content)
+    return segments
+
+class MockAnthropicServer:
+    """
+    Threaded HTTP server implementing the endpoints the team uses
+
+    POST /v1/messages               (JSON, or SSE with "stream": true)
+    POST /v1/messages/batches
+    GET  /v1/messages/batches/{id}
+    GET  /v1/messages/batches/{id}/results
+    POST /v1/messages/batches/{id}/cancel
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, batch_delay: float = 1.0,
+                 responder: Optional[Callable[[Dict[str, Any]], str]] = None,
+                 profile: Union[str, FaultProfile] = "instant", seed: int = 0):
+        """
+        Initialize server
+
+        Args:
+            host: Interface to bind
+            port: Port to bind (0 picks a free port)
+            batch_delay: Seconds before a submitted batch reports "ended"
+            responder: Function mapping request params to reply text
+            profile: FaultProfile or the name of one in PROFILES
+            seed: Seed for latency and error draws, so load tests are repeatable
+        """
+        if isinstance(profile, str):
+            if profile not in PROFILES:
+                raise ValueError(f"Unknown profile: {profile}. Available profiles: {', '.join(PROFILES)}")
+            profile = PROFILES[profile]
+        self.batch_delay = batch_delay
+        self.responder = responder or default_responder
+        self.profile = profile
+        self.batches: Dict[str, Dict[str, Any]] = {}
+        self.request_count = 0
+        self.stats: Counter = Counter()
+        self._random = random.Random(seed)
+        self._script_position = 0
+        self._recent_requests: deque = deque()
+        self._cached_prefixes: set = set()
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """Base URL to pass to Anthropic(base_url=...)"""
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockAnthropicServer":
+        """Serve in a background thread"""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        """Serve in the current thread until interrupted"""
+        try:
+            self._httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._httpd.server_close()
+
+    def stop(self):
+        """Shut the server down"""
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def usage(self, params: Dict[str, Any], text: str) -> Dict[str, int]:
+        """
+        Token usage with prompt caching simulated
+
+        Every cache_control breakpoint caches the prompt up to and including
+        its block. The longest previously cached prefix is read from cache,
+        later breakpoints are written to it, and the rest is uncached input.
+        """
+        segments = _cache_segments(params)
+        digest = hashlib.sha256()
+        read_upto = written_upto = 0
+        chars = 0
+        with self._lock:
+            for text_block, breakpoint in segments:
+                digest.update(text_block.encode('utf-8'))
+                chars += len(text_block)
+                if not breakpoint:
+                    continue
+                prefix = digest.hexdigest()
+                if prefix in self._cached_prefixes:
+                    read_upto = chars
+                else:
+                    self._cached_prefixes.add(prefix)
+                    written_upto = chars
+        written_upto = max(written_upto, read_upto)
+        return {
+            "input_tokens": (chars - written_upto) // 4,
+            "cache_creation_input_tokens": (written_upto - read_upto) // 4,
+            "cache_read_input_tokens": read_upto // 4,
+            "output_tokens": max(1, len(text) // 4)
+        }
+
+    def decide(self) -> Tuple[str, float]:
+        """
+        Pick the outcome and latency of the next Messages request
+
+        Returns:
+            Tuple of (outcome: "ok", "429", "529" or "slow", latency seconds)
+        """
+        profile = self.profile
+        with self._lock:
+            if profile.script:
+                outcome = profile.script[self._script_position % len(profile.script)]
+                self._script_position += 1
+            else:
+                draw = self._random.random()
+                if draw < profile.error_429_rate:
+                    outcome = "429"
+                elif draw < profile.error_429_rate + profile.error_529_rate:
+                    outcome = "529"
+                else:
+                    outcome = "ok"
+
+            if outcome == "ok" and profile.requests_per_minute:
+                now = time.time()
+                while self._recent_requests and now - self._recent_requests[0] > 60:
+                    self._recent_requests.popleft()
+                if len(self._recent_requests) >= profile.requests_per_minute:
+                    outcome = "429"
+                else:
+                    self._recent_requests.append(now)
+
+            latency = profile.latency_median
+            if profile.latency_sigma:
+                latency *= self._random.lognormvariate(0, profile.latency_sigma)
+            if outcome == "slow":
+                latency *= profile.slow_factor
+            self.stats[outcome] += 1
+        return outcome, latency
+
+    def message(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Build a Messages API response for request params"""
+        with self._lock:
+            self.request_count += 1
+        text = self.responder(params)
+        stop_reason = "end_turn"
+
+        # An assistant prefill is continued, not repeated
+        messages = params.get("messages", [])
+        if messages and messages[-1].get("role") == "assistant":
+            prefill = messages[-1].get("content", "")
+            if isinstance(prefill, list):
+                prefill = "".join(block.get("text", "") for block in prefill)
+            if text.startswith(prefill):
+                text = text[len(prefill):]
+
+        # Roughly 4 characters per token, as in the usage figures
+        limit = params.get("max_tokens", 0) * 4
+        if limit and len(text) > limit:
+            text = text[:limit]
+            stop_reason = "max_tokens"
+        return {
+            "id": f"msg_mock_{uuid.uuid4().hex[:24]}",
+            "type": "message",
+            "role": "assistant",
+            "model": params.get("model", "mock"),
+            "content": [{"type": "text", "text": text}],
+            "stop_reason": stop_reason,
+            "stop_sequence": None,
+            "usage": self.usage(params, text)
+        }
+
+    def _batch_view(self, batch: Dict[str, Any]) -> Dict[str, Any]:
+        """Batch object as returned by the API, ending once batch_delay has passed"""
+        now = time.time()
+        ended = batch["canceled"] or now - batch["created"] >= self.batch_delay
+        total = len(batch["requests"])
+
+        def stamp(seconds: float) -> str:
+            return datetime.fromtimestamp(seconds, timezone.utc).isoformat()
+
+        return {
+            "id": batch["id"],
+            "type": "message_batch",
+            "processing_status": "ended" if ended else "in_progress",
+            "request_counts": {
+                "processing": 0 if ended else total,
+                "succeeded": 0 if (not ended or batch["canceled"]) else total,
+                "errored": 0,
+                "canceled": total if batch["canceled"] else 0,
+                "expired": 0
+            },
+            "created_at": stamp(batch["created"]),
+            "expires_at": stamp(batch["created"] + timedelta(days=1).total_seconds()),
+            "ended_at": stamp(batch["created"] + self.batch_delay) if ended else None,
+            "cancel_initiated_at": None,
+            "archived_at": None,
+            "results_url": f"{self.url}/v1/messages/batches/{batch['id']}/results" if ended else None
+        }
+
+    def _results(self, batch: Dict[str, Any]) -> str:
+        """JSONL results of an ended batch"""
+        lines = []
+        for request in batch["requests"]:
+            if batch["canceled"]:
+                result = {"type": "canceled"}
+            else:
+                result = {"type": "succeeded", "message": self.message(request["params"])}
+            lines.append(json.dumps({"custom_id": request["custom_id"], "result": result}))
+        return "\n".join(lines) + "\n"
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status: int, body: Any, content_type: str = "application/json"):
+                data = body if isinstance(body, str) else json.dumps(body)
+                payload = data.encode('utf-8')
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _error(self, status: int, error_type: str, message: str,
+                       headers: Optional[Dict[str, str]] = None):
+                payload = json.dumps({"type": "error", "error": {"type": error_type, "message": message}})
+                payload = payload.encode('utf-8')
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _event(self, name: str, data: Dict[str, Any]):
+                self.wfile.write(f"event: {name}\ndata: {json.dumps(data)}\n\n".encode('utf-8'))
+                self.wfile.flush()
+
+            def _stream(self, message: Dict[str, Any], latency: float):
+                """Send a message as Server-Sent Events, pacing the text deltas"""
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Cache-Control", "no-cache")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+
+                time.sleep(latency)
+                usage = message["usage"]
+                start = {**message, "content": [], "stop_reason": None,
+                         "usage": {**usage, "output_tokens": 1}}
+                self._event("message_start", {"type": "message_start", "message": start})
+                self._event("content_block_start", {"type": "content_block_start", "index": 0,
+                                                    "content_block": {"type": "text", "text": ""}})
+                self._event("ping", {"type": "ping"})
+                text = message["content"][0]["text"]
+                size = max(1, server.profile.stream_chunk_chars)
+                for offset in range(0, len(text), size):
+                    if offset and server.profile.stream_chunk_delay:
+                        time.sleep(server.profile.stream_chunk_delay)
+                    self._event("content_block_delta", {
+                        "type": "content_block_delta", "index": 0,
+                        "delta": {"type": "text_delta", "text": text[offset:offset + size]}
+                    })
+                self._event("content_block_stop", {"type": "content_block_stop", "index": 0})
+                self._event("message_delta", {
+                    "type": "message_delta",
+                    "delta": {"stop_reason": message["stop_reason"], "stop_sequence": None},
+                    "usage": {"output_tokens": usage["output_tokens"]}
+                })
+                self._event("message_stop", {"type": "message_stop"})
+
+            def _messages(self):
+                params = self._body()
+                outcome, latency = server.decide()
+                if outcome == "429":
+                    time.sleep(min(latency, 0.05))
+                    return self._error(429, "rate_limit_error", "Mock rate limit exceeded",
+                                       {"retry-after": f"{server.profile.retry_after:g}"})
+                if outcome == "529":
+                    time.sleep(latency)
+                    return self._error(529, "overloaded_error", "Mock server overloaded")
+                message = server.message(params)
+                if params.get("stream"):
+                    return self._stream(message, latency)
+                time.sleep(latency)
+                self._send(200, message)
+
+            def _body(self) -> Dict[str, Any]:
+                length = int(self.headers.get("Content-Length", 0))
+                return json.loads(self.rfile.read(length) or b"{}")
+
+            def _batch(self, batch_id: str) -> Optional[Dict[str, Any]]:
+                batch = server.batches.get(batch_id)
+                if batch is None:
+                    self._error(404, "not_found_error", f"Batch {batch_id} not found")
+                return batch
+
+            def do_POST(self):
+                path = self.path.split("?")[0]
+                if path == "/v1/messages":
+                    return self._messages()
+                if path == "/v1/messages/batches":
+                    batch_id = f"msgbatch_mock_{uuid.uuid4().hex[:20]}"
+                    batch = {"id": batch_id, "requests": self._body().get("requests", []),
+                             "created": time.time(), "canceled": False}
+                    with server._lock:
+                        server.batches[batch_id] = batch
+                    return self._send(200, server._batch_view(batch))
+                match = re.fullmatch(r'/v1/messages/batches/([\w-]+)/cancel', path)
+                if match:
+                    batch = self._batch(match.group(1))
+                    if batch is not None:
+                        batch["canceled"] = True
+                        self._send(200, server._batch_view(batch))
+                    return
+                self._error(404, "not_found_error", f"Unknown endpoint: POST {path}")
+
+            def do_GET(self):
+                path = self.path.split("?")[0]
+                match = re.fullmatch(r'/v1/messages/batches/([\w-]+)(/results)?', path)
+                if not match:
+                    return self._error(404, "not_found_error", f"Unknown endpoint: GET {path}")
+                batch = self._batch(match.group(1))
+                if batch is None:
+                    return
+                view = server._batch_view(batch)
+                if not match.group(2):
+                    return self._send(200, view)
+                if view["processing_status"] != "ended":
+                    return self._error(400, "invalid_request_error", "Batch is still processing")
+                self._send(200, server._results(batch), "application/binary")
+
+        return Handler
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local stand-in for the Anthropic API")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to bind (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8765, help="Port to bind (default: 8765)")
+    parser.add_argument("--batch-delay", type=float, default=1.0,
+                        help="Seconds before a batch ends (default: 1.0)")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="instant",
+                        help="Latency/fault profile (default: instant)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for latency and error draws")
+    args = parser.parse_args()
+
+    server = MockAnthropicServer(args.host, args.port, args.batch_delay,
+                                 profile=args.profile, seed=args.seed)
+    print(f"Mock Anthropic API listening on {server.url} (profile: {args.profile})")
+    server.serve_forever()
+
+if __name__ == "__main__":
+    main()
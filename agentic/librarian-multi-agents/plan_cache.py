@@ -0,0 +1,173 @@
+"""
+Plan Cache
+Reuses the Lead Orchestrator's task breakdown across structurally similar
+documents, so repeated request templates skip the planning call
+"""
+
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Union
+
+from document_source import MappedDocument
+
+CACHE_VERSION = 1
+PAGE_MARKER = re.compile(r'-{3,}\s*Page\s+\d+\s*-{3,}')
+CHAPTER_HEADING = re.compile(r'(?m)^\s*(?:CHAPTER|Chapter)\s+(?:\d+|[IVXLCDM]+)\b')
+PAGE_MARKER_BYTES = re.compile(rb'-{3,}\s*Page\s+\d+\s*-{3,}')
+CHAPTER_HEADING_BYTES = re.compile(rb'(?m)^\s*(?:CHAPTER|Chapter)\s+(?:\d+|[IVXLCDM]+)\b')
+# Upper bounds (characters) of each size class; anything larger is "xlarge"
+SIZE_CLASSES = ((20_000, "small"), (200_000, "medium"), (2_000_000, "large"))
+
+class PlanCache:
+    """
+    LRU cache of task breakdowns
+
+    Keys combine the normalized request with a structure signature of the
+    document (chapter count, page count, size class). Only the plan is
+    cached, not document text: on a hit the tasks are rebuilt and re-bound
+    to the new document's chunks.
+    """
+
+    def __init__(self, max_entries: int = 256, path: Optional[str] = None):
+        """
+        Initialize cache
+
+        Args:
+            max_entries: Maximum number of plans kept
+            path: Optional JSON file; loaded if it exists and rewritten on
+                every new plan
+        """
+        self.max_entries = max_entries
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._plans: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Serializes writers, so the last write holds the newest plans
+        self._save_lock = threading.Lock()
+        if path and os.path.exists(path):
+            self.load(path)
+
+    @staticmethod
+    def normalize_request(request: str) -> str:
+        """Lowercase the request and strip punctuation and extra whitespace"""
+        return " ".join(re.findall(r'\w+', request.lower()))
+
+    @staticmethod
+    def structure_signature(document_content: Union[str, MappedDocument]) -> str:
+        """
+        Coarse description of a document's shape
+
+        Args:
+            document_content: Document text or MappedDocument
+
+        Returns:
+            Signature such as "chapters=12|pages=0|size=medium"
+        """
+        if isinstance(document_content, MappedDocument):
+            buffer = document_content.buffer
+            chapters = sum(1 for _ in CHAPTER_HEADING_BYTES.finditer(buffer))
+            pages = sum(1 for _ in PAGE_MARKER_BYTES.finditer(buffer))
+        else:
+            chapters = sum(1 for _ in CHAPTER_HEADING.finditer(document_content))
+            pages = sum(1 for _ in PAGE_MARKER.finditer(document_content))
+
+        length = len(document_content)
+        size = next((name for limit, name in SIZE_CLASSES if length < limit), "xlarge")
+        return f"chapters={chapters}|pages={pages}|size={size}"
+
+    def key(self, user_request: str, document_content: Union[str, MappedDocument]) -> str:
+        """
+        Cache key for a request against a document
+
+        Args:
+            user_request: User's instruction
+            document_content: Document text or MappedDocument
+
+        Returns:
+            Cache key
+        """
+        return f"{self.normalize_request(user_request)}||{self.structure_signature(document_content)}"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a plan
+
+        Args:
+            key: Key from key()
+
+        Returns:
+            Plan ({"tasks": [...]}) or None
+        """
+        with self._lock:
+            plan = self._plans.get(key)
+            if plan is None:
+                self.misses += 1
+                return None
+            self._plans.move_to_end(key)
+            self.hits += 1
+            return plan
+
+    def put(self, key: str, plan: Dict[str, Any]):
+        """
+        Store a plan, evicting the least recently used one if full
+
+        Args:
+            key: Key from key()
+            plan: Parsed planner output ({"tasks": [...]})
+        """
+        with self._lock:
+            self._plans[key] = plan
+            self._plans.move_to_end(key)
+            while len(self._plans) > self.max_entries:
+                self._plans.popitem(last=False)
+        if self.path:
+            # The cache is an optimization; failing to persist it must not fail the run
+            try:
+                self.save(self.path)
+            except (OSError, TypeError, ValueError) as e:
+                print(f"[SYSTEM] Could not save plan cache to {self.path}: {e}")
+
+    def __len__(self) -> int:
+        return len(self._plans)
+
+    def save(self, path: str):
+        """
+        Persist the cache as JSON, atomically and safely from any thread
+
+        Args:
+            path: Output file path
+        """
+        with self._save_lock:
+            with self._lock:
+                data = {"version": CACHE_VERSION, "plans": list(self._plans.items())}
+            # Unique per process and thread, so other writers never touch it
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(data, f)
+                os.replace(tmp_path, path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+    def load(self, path: str):
+        """
+        Load plans saved with save(); an unreadable or outdated file is ignored
+
+        Args:
+            path: Cache file path
+        """
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return
+        if data.get("version") != CACHE_VERSION:
+            return
+        with self._lock:
+            for key, plan in data.get("plans", [])[-self.max_entries:]:
+                self._plans[key] = plan
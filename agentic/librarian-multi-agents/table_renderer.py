@@ -0,0 +1,271 @@
+"""
+Table Rendering Utilities
+Deterministic Markdown, HTML and CSV rendering of tables that are already
+structured (e.g. the row lists extracted by DocumentLoader.load_docx)
+"""
+
+import csv
+import html
+import io
+import re
+from typing import List, Dict, Any, Optional
+
+Table = List[List[str]]
+# Per grid position: [rowspan, colspan] for a cell to emit, None where a merged cell covers it
+Spans = List[List[Optional[List[int]]]]
+
+FORMAT_KEYWORDS = {
+    "markdown": re.compile(r'\bmarkdown\b|\bmd\b', re.IGNORECASE),
+    "html": re.compile(r'\bhtml\b', re.IGNORECASE),
+    "csv": re.compile(r'\bcsv\b|comma[- ]separated', re.IGNORECASE),
+}
+CONVERSION_VERBS = re.compile(
+    r'\b(convert|render|format|export|output|turn|put|present|show|display|reproduce|transform)\b',
+    re.IGNORECASE
+)
+# Anything that needs judgement rather than reformatting goes to SubAgent 3
+REASONING_WORDS = re.compile(
+    r'summar|analy|compar|explain|insight|trend|calculat|comput|total|average|why|recommend|'
+    r'interpret|highlight|evaluat|assess|rank|predict|estimat|color|colour|translat|rewrite|'
+    r'clean|fix|correct|merge the|group|sort|filter|add a column|new column',
+    re.IGNORECASE
+)
+TABLE_WORD = re.compile(r'\btables?\b', re.IGNORECASE)
+# Requests about more than the tables (the rest of the document must be
+# converted too), or that pick parts we cannot resolve by number, go to the model
+WHOLE_DOCUMENT_WORDS = re.compile(
+    r'\b(document|report|file|text|paper|article|pages?|sections?|chapters?|contents?|body|'
+    r'whole|entire|everything|rest|including|along with|together with|as well as|plus)\b',
+    re.IGNORECASE
+)
+PARTIAL_SELECTION = re.compile(
+    r'\b(first|second|third|fourth|fifth|last|final|previous|next|above|below|largest|smallest|'
+    r'\d+(st|nd|rd|th)|columns?|rows?|cells?|headers?)\b',
+    re.IGNORECASE
+)
+# "table 2", "tables 1 and 3", "tables 2-4", "table no. 5"
+TABLE_NUMBERS = re.compile(
+    r'\btables?\s+(?:no\.?\s*|number\s+|#\s*)?(\d+(?:\s*(?:-|–|to|,|and|&|,\s*and)\s*\d+)*)',
+    re.IGNORECASE
+)
+NUMBER_RANGE = re.compile(r'(\d+)(?:\s*(?:-|–|to)\s*(\d+))?')
+
+class TableRenderer:
+    """Renders row-list tables without calling the model"""
+
+    @staticmethod
+    def detect_conversion(request: str) -> Optional[str]:
+        """
+        Decide whether a request is a pure format conversion of tables
+
+        Args:
+            request: User request or task description
+
+        Returns:
+            "markdown", "html" or "csv" if the request only asks to render
+            tables in that format; None if it needs reasoning, also concerns
+            the rest of the document, or picks tables other than by number
+        """
+        if not TABLE_WORD.search(request) or not CONVERSION_VERBS.search(request):
+            return None
+        if (REASONING_WORDS.search(request) or WHOLE_DOCUMENT_WORDS.search(request)
+                or PARTIAL_SELECTION.search(request)):
+            return None
+        formats = [name for name, pattern in FORMAT_KEYWORDS.items() if pattern.search(request)]
+        return formats[0] if len(formats) == 1 else None
+
+    @staticmethod
+    def requested_table_numbers(request: str) -> Optional[List[int]]:
+        """
+        Table numbers a request names ("table 2", "tables 1 and 3", "tables 2-4")
+
+        Args:
+            request: User request or task description
+
+        Returns:
+            Sorted table numbers, or None if the request names none (all tables)
+        """
+        numbers = set()
+        for match in TABLE_NUMBERS.finditer(request):
+            for start, end in NUMBER_RANGE.findall(match.group(1)):
+                numbers.update(range(int(start), int(end or start) + 1))
+        return sorted(numbers) or None
+
+    @staticmethod
+    def select_tables(request: str, tables: List[Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+        """
+        The tables a conversion request is about
+
+        Args:
+            request: User request or task description
+            tables: [{"table_number": n, "data": rows, "spans": ...}, ...] as
+                from load_docx ("spans" only when cells are merged)
+
+        Returns:
+            The numbered tables, or all of them when none are named; None if
+            a named table does not exist
+        """
+        numbers = TableRenderer.requested_table_numbers(request)
+        if numbers is None:
+            return list(tables)
+        by_number = {table.get("table_number", i + 1): table for i, table in enumerate(tables)}
+        if not set(numbers) <= by_number.keys():
+            return None
+        return [by_number[number] for number in numbers]
+
+    @staticmethod
+    def _normalize(table: Table) -> Table:
+        """Pad ragged rows to a common width and stringify cells"""
+        width = max((len(row) for row in table), default=0)
+        return [[("" if cell is None else str(cell)) for cell in row] + [""] * (width - len(row))
+                for row in table]
+
+    @staticmethod
+    def to_markdown(table: Table) -> str:
+        """
+        Render a table as GitHub-flavoured Markdown; the first row is the header
+
+        Args:
+            table: Rows of cell strings
+
+        Returns:
+            Markdown table
+        """
+        table = TableRenderer._normalize(table)
+        if not table:
+            return ""
+
+        def cell(text: str) -> str:
+            return text.replace("|", "\\|").replace("\r", "").replace("\n", "<br>").strip()
+
+        lines = ["| " + " | ".join(cell(c) for c in table[0]) + " |",
+                 "| " + " | ".join("---" for _ in table[0]) + " |"]
+        lines.extend("| " + " | ".join(cell(c) for c in row) + " |" for row in table[1:])
+        return "\n".join(lines)
+
+    @staticmethod
+    def to_csv(table: Table) -> str:
+        """
+        Render a table as CSV
+
+        Args:
+            table: Rows of cell strings
+
+        Returns:
+            CSV text
+        """
+        buffer = io.StringIO()
+        csv.writer(buffer, lineterminator="\n").writerows(TableRenderer._normalize(table))
+        return buffer.getvalue()
+
+    @staticmethod
+    def spans_from_cells(cells: List[List[Any]]) -> Optional[Spans]:
+        """
+        Work out merged cells from cell identity
+
+        Word reports a merged cell once per grid position it covers, as the
+        same cell object; equal text alone does not make a merge.
+
+        Args:
+            cells: Grid of cell objects, one per position (e.g. python-docx
+                cell._tc elements, row by row)
+
+        Returns:
+            Grid of [rowspan, colspan] for cells to emit and None for covered
+            positions, or None if nothing is merged
+        """
+        extents: Dict[int, List[int]] = {}
+        for r, row in enumerate(cells):
+            for c, cell in enumerate(row):
+                extent = extents.setdefault(id(cell), [r, c, r, c])
+                extent[2], extent[3] = max(extent[2], r), max(extent[3], c)
+        if len(extents) == sum(len(row) for row in cells):
+            return None
+
+        spans: Spans = [[None] * len(row) for row in cells]
+        for r0, c0, r1, c1 in extents.values():
+            spans[r0][c0] = [r1 - r0 + 1, c1 - c0 + 1]
+        return spans
+
+    @staticmethod
+    def to_html(table: Table, spans: Optional[Spans] = None) -> str:
+        """
+        Render a table as HTML; the first row is the header
+
+        Args:
+            table: Rows of cell strings
+            spans: Merged cells from spans_from_cells; without them every
+                position is its own cell
+
+        Returns:
+            HTML table
+        """
+        table = TableRenderer._normalize(table)
+        if not table:
+            return ""
+
+        lines = ["<table>"]
+        for r, row in enumerate(table):
+            tag = "th" if r == 0 else "td"
+            cells = []
+            for c, text in enumerate(row):
+                span = [1, 1]
+                if spans is not None and r < len(spans) and c < len(spans[r]):
+                    span = spans[r][c]
+                    if span is None:
+                        continue
+                rowspan, colspan = span
+                attrs = (f' rowspan="{rowspan}"' if rowspan > 1 else "") + \
+                        (f' colspan="{colspan}"' if colspan > 1 else "")
+                body = html.escape(text.strip()).replace("\n", "<br>")
+                cells.append(f"<{tag}{attrs}>{body}</{tag}>")
+            lines.append(f"  <tr>{''.join(cells)}</tr>")
+        lines.append("</table>")
+        return "\n".join(lines)
+
+    @staticmethod
+    def render(table: Table, fmt: str, spans: Optional[Spans] = None) -> str:
+        """
+        Render a table in the given format
+
+        Args:
+            table: Rows of cell strings
+            fmt: "markdown", "html" or "csv"
+            spans: Merged cells, used by HTML (Markdown and CSV repeat the text)
+
+        Returns:
+            Rendered table
+        """
+        renderers = {
+            "markdown": TableRenderer.to_markdown,
+            "html": lambda rows: TableRenderer.to_html(rows, spans),
+            "csv": TableRenderer.to_csv,
+        }
+        if fmt not in renderers:
+            raise ValueError(f"Unsupported table format: {fmt}. Supported formats: {', '.join(renderers)}")
+        return renderers[fmt](table)
+
+    @staticmethod
+    def render_tables(tables: List[Dict[str, Any]], fmt: str) -> str:
+        """
+        Render every table extracted from a document
+
+        Args:
+            tables: [{"table_number": n, "data": rows, "spans": ...}, ...] as
+                from load_docx ("spans" only when cells are merged)
+            fmt: "markdown", "html" or "csv"
+
+        Returns:
+            All tables, each under a "Table N" heading
+        """
+        parts = []
+        for table in tables:
+            number = table.get("table_number", len(parts) + 1)
+            rendered = TableRenderer.render(table.get("data", []), fmt, table.get("spans"))
+            if fmt == "html":
+                parts.append(f"<h3>Table {number}</h3>\n{rendered}")
+            elif fmt == "markdown":
+                parts.append(f"### Table {number}\n\n{rendered}")
+            else:
+                parts.append(f"# Table {number}\n{rendered}")
+        return "\n\n".join(parts)
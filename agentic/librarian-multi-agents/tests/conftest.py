@@ -0,0 +1,53 @@
+"""
+Shared fixtures: the modules live flat in the project directory, and model
+calls go to an in-process fake backend instead of the API
+"""
+
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_backend import LLMBackend, LLMResponse
+from mock_server import default_responder, _request_text
+
+class FakeBackend(LLMBackend):
+    """
+    Records every request and answers it like mock_server's default responder
+
+    A responder may return text or a full LLMResponse (e.g. to simulate
+    max_tokens truncation).
+    """
+
+    def __init__(self, responder=default_responder):
+        self.responder = responder
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def create(self, **params) -> LLMResponse:
+        with self._lock:
+            self.calls.append(params)
+        reply = self.responder(params)
+        if isinstance(reply, LLMResponse):
+            return reply
+        return LLMResponse(text=reply, stop_reason="end_turn")
+
+    def texts(self):
+        """User-turn text of each recorded request"""
+        return [_request_text(params) for params in self.calls]
+
+@pytest.fixture
+def backend():
+    return FakeBackend()
+
+@pytest.fixture
+def long_document():
+    """A document well over one chunk, so the full pipeline runs"""
+    return "\n\n".join(
+        f"Section {number}. " + " ".join(f"Finding {number}.{item} concerns topic {number % 7}."
+                                          for item in range(40))
+        for number in range(1, 13)
+    )
@@ -0,0 +1,43 @@
+"""Concurrent, resumable processing of many documents"""
+
+import json
+
+from batch_processor import BatchProcessor
+from librarian_agents_team import LibrarianAgentsTeam
+
+def make_processor(tmp_path, backend, **options):
+    return BatchProcessor(LibrarianAgentsTeam(backend=backend), str(tmp_path / "manifest.json"),
+                          output_dir=str(tmp_path / "out"), workers=3, **options)
+
+def test_expand_inputs_merges_globs_and_list_files(tmp_path):
+    for name in ("a.txt", "b.txt", "c.md"):
+        (tmp_path / name).write_text("text")
+    listing = tmp_path / "list.json"
+    listing.write_text(json.dumps([str(tmp_path / "a.txt"),
+                                   {"input": str(tmp_path / "c.md"), "request": "Tabulate"}]))
+    entries = BatchProcessor.expand_inputs([str(tmp_path / "*.txt")], str(listing))
+    assert [(entry["input"].rsplit("/", 1)[-1], entry["request"]) for entry in entries] == \
+        [("a.txt", None), ("b.txt", None), ("c.md", "Tabulate")]
+
+def test_same_stem_outputs_are_numbered(tmp_path, backend):
+    processor = make_processor(tmp_path, backend)
+    processor.add("one/report.txt", "Summarize")
+    processor.add("two/report.md", "Summarize")
+    outputs = [document["output"] for document in processor.manifest["documents"].values()]
+    assert [output.rsplit("/", 1)[-1] for output in outputs] == ["report.md", "report-2.md"]
+
+def test_run_resumes_and_retries_failures(tmp_path, backend, long_document):
+    good = tmp_path / "good.txt"
+    good.write_text(long_document)
+    processor = make_processor(tmp_path, backend)
+    processor.add(str(good), "Summarize")
+    processor.add(str(tmp_path / "missing.txt"), "Summarize")
+    assert processor.run() == {"pending": 0, "done": 1, "failed": 1}
+    assert (tmp_path / "out" / "good.md").read_text().startswith("# Compiled Output")
+
+    calls = len(backend.calls)
+    resumed = make_processor(tmp_path, backend)
+    assert resumed.remaining() == [str(tmp_path / "missing.txt")]
+    (tmp_path / "missing.txt").write_text("Now it exists.")
+    assert resumed.run() == {"pending": 0, "done": 2, "failed": 0}
+    assert len(backend.calls) == calls + 1
@@ -0,0 +1,99 @@
+"""Batch runs driven through a fake Message Batches client"""
+
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from batch_runner import BatchRunner
+from librarian_agents_team import LibrarianAgentsTeam
+from mock_server import default_responder
+
+class FakeBatches:
+    """Answers every request at once; create fails on the calls listed in fail_on"""
+
+    def __init__(self, fail_on=(), empty=()):
+        self.fail_on = set(fail_on)
+        self.empty = set(empty)
+        self.created = {}
+        self.calls = 0
+
+    def create(self, requests):
+        self.calls += 1
+        if self.calls in self.fail_on:
+            raise ConnectionError("batch endpoint unavailable")
+        batch_id = f"batch_{len(self.created) + 1}"
+        self.created[batch_id] = requests
+        return SimpleNamespace(id=batch_id)
+
+    def retrieve(self, batch_id):
+        return SimpleNamespace(id=batch_id, processing_status="ended")
+
+    def results(self, batch_id):
+        for request in self.created[batch_id]:
+            if request["custom_id"] in self.empty:
+                message = SimpleNamespace(content=[], stop_reason="max_tokens")
+            else:
+                text = default_responder(request["params"])
+                message = SimpleNamespace(content=[SimpleNamespace(type="text", text=text)],
+                                          stop_reason="end_turn")
+            yield SimpleNamespace(custom_id=request["custom_id"],
+                                  result=SimpleNamespace(type="succeeded", message=message))
+
+def fake_client(batches):
+    return SimpleNamespace(messages=SimpleNamespace(batches=batches))
+
+@pytest.fixture
+def documents(tmp_path, long_document):
+    paths = []
+    for number in range(3):
+        path = tmp_path / f"report{number}.txt"
+        path.write_text(long_document, encoding="utf-8")
+        paths.append(str(path))
+    return paths
+
+def make_runner(backend, state_path, batches):
+    return BatchRunner(team=LibrarianAgentsTeam(backend=backend), state_path=str(state_path),
+                       poll_interval=0, max_batch_requests=1, client=fake_client(batches))
+
+def test_run_completes_every_job(tmp_path, backend, documents):
+    runner = make_runner(backend, tmp_path / "run.json", FakeBatches())
+    for path in documents:
+        runner.add_job(path, "Summarize the findings")
+    results = runner.run()
+    assert runner.stage == "done"
+    assert all(result["error"] is None and result["output"].startswith("# Compiled Output")
+               for result in results.values())
+    assert backend.calls == []
+
+def test_each_batch_is_saved_as_soon_as_it_is_created(tmp_path, backend, documents):
+    state_path = tmp_path / "run.json"
+    batches = FakeBatches(fail_on={2})
+    runner = make_runner(backend, state_path, batches)
+    for path in documents:
+        runner.add_job(path, "Summarize the findings")
+    with pytest.raises(ConnectionError):
+        runner.submit()
+
+    state = json.loads(state_path.read_text())
+    assert state["batch_ids"] == ["batch_1"]
+    assert state["submitted"] == ["job-00001_plan"]
+
+    resumed = make_runner(backend, state_path, batches)
+    assert resumed.poll() is False
+    assert resumed.submit() == ["batch_1", "batch_2", "batch_3"]
+    sent = [request["custom_id"] for requests in batches.created.values() for request in requests]
+    assert sent == ["job-00001_plan", "job-00002_plan", "job-00003_plan"]
+    assert "submitted" not in json.loads(state_path.read_text())
+
+    results = resumed.run()
+    assert all(result["error"] is None for result in results.values())
+
+def test_empty_reply_fails_only_its_job(tmp_path, backend, documents):
+    runner = make_runner(backend, tmp_path / "run.json", FakeBatches(empty={"job-00002_compile"}))
+    for path in documents:
+        runner.add_job(path, "Summarize the findings")
+    results = runner.run()
+    assert runner.stage == "done"
+    assert results["job-00002"]["error"] == "compile: empty reply (stop_reason max_tokens)"
+    assert results["job-00001"]["error"] is None and results["job-00003"]["error"] is None
@@ -0,0 +1,45 @@
+"""Checkpointed runs resume after a crash"""
+
+import pytest
+
+from checkpoint import CheckpointLog
+from conftest import FakeBackend
+from librarian_agents_team import LibrarianAgentsTeam
+from mock_server import default_responder
+
+def test_torn_last_line_is_ignored(tmp_path):
+    path = str(tmp_path / "run.jsonl")
+    log = CheckpointLog(path)
+    log.record_plan("Summarize", "document", [{"task_id": "task_1"}])
+    log.record_result("task_1", "done")
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"type": "output", "outp')
+    reloaded = CheckpointLog(path)
+    assert reloaded.matches("Summarize", "document")
+    assert not reloaded.matches("Summarize", "other document")
+    assert list(reloaded.results) == ["task_1"] and reloaded.output is None
+
+def test_interrupted_run_resumes_without_repeating_work(tmp_path, long_document):
+    path = str(tmp_path / "run.jsonl")
+
+    def crashing(params):
+        if "(second half)" in str(params["messages"]):
+            raise ConnectionError("network down")
+        return default_responder(params)
+
+    with pytest.raises(ConnectionError):
+        LibrarianAgentsTeam(backend=FakeBackend(crashing)).process_document(
+            "Summarize", long_document, checkpoint=path)
+
+    backend = FakeBackend()
+    output = LibrarianAgentsTeam(backend=backend).process_document("Summarize", long_document, checkpoint=path)
+    texts = backend.texts()
+    assert not any("JSON task breakdown" in text for text in texts)
+    assert len(backend.calls) == 2
+    assert CheckpointLog(path).output == output
+
+    # A finished run is answered from the log
+    again = FakeBackend()
+    assert LibrarianAgentsTeam(backend=again).process_document(
+        "Summarize", long_document, checkpoint=path) == output
+    assert again.calls == []
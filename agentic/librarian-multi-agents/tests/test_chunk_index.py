@@ -0,0 +1,80 @@
+"""BM25 chunk retrieval and index persistence"""
+
+import os
+import threading
+
+from chunk_index import BM25Index, document_key
+from document_chunker import DocumentChunker
+
+CHUNKS = [
+    {"content": "Solar panels convert sunlight into electricity.", "chunk_id": 0},
+    {"content": "Wind turbines generate power from moving air.", "chunk_id": 1},
+    {"content": "The quarterly budget covers salaries and rent.", "chunk_id": 2},
+]
+
+def test_top_chunks_ranks_by_relevance():
+    index = BM25Index.build(CHUNKS)
+    hits = index.top_chunks("how do solar panels make electricity", 2)
+    assert hits[0]["chunk_index"] == 0
+    assert all(hit["chunk_index"] != 2 for hit in hits)
+
+def test_no_match_returns_nothing():
+    assert BM25Index.build(CHUNKS).top_chunks("zebra", 3) == []
+
+def test_save_and_load(tmp_path):
+    path = str(tmp_path / "index.json")
+    index = BM25Index.build(CHUNKS, document_key="abc")
+    index.save(path)
+    loaded = BM25Index.load(path)
+    assert loaded.document_key == "abc"
+    assert loaded.top_chunks("wind power", 1)[0]["chunk_index"] == 1
+
+def test_load_or_build_reuses_a_current_index(tmp_path):
+    document = tmp_path / "doc.txt"
+    content = "\n\n".join(chunk["content"] for chunk in CHUNKS)
+    document.write_text(content)
+    first = BM25Index.load_or_build(str(document), content, DocumentChunker())
+    assert os.path.exists(BM25Index.index_path(str(document)))
+    assert BM25Index.load_or_build(str(document), content).document_key == first.document_key == document_key(content)
+
+def test_concurrent_saves(tmp_path):
+    path = str(tmp_path / "index.json")
+    index = BM25Index.build(CHUNKS)
+    errors = []
+
+    def save_many():
+        try:
+            for _ in range(20):
+                index.save(path)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=save_many) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert os.listdir(tmp_path) == ["index.json"]
+
+def test_attach_chunks_replaces_section_names_with_text(backend):
+    from librarian_agents_team import AgentRole, LibrarianAgentsTeam, Task
+
+    team = LibrarianAgentsTeam(backend=backend)
+    document = "full document"
+    planned = Task(task_id="task_1", description="Explain the wind findings",
+                   content="turbines section", assigned_to=AgentRole.SUBAGENT_1)
+    fallback = Task(task_id="task_2", description="Explain the wind findings",
+                    content=document, assigned_to=AgentRole.SUBAGENT_1)
+    team.lead.attach_chunks([planned, fallback], BM25Index.build(CHUNKS), 1, document)
+    assert planned.chunk_ids == [1]
+    assert planned.content == f"Requested section: turbines section\n\n{CHUNKS[1]['content']}"
+    assert fallback.content is document and fallback.chunk_ids == []
+
+def test_pipeline_sends_retrieved_chunks_not_the_document(backend, long_document):
+    from librarian_agents_team import LibrarianAgentsTeam
+
+    team = LibrarianAgentsTeam(backend=backend, retrieval_top_k=1)
+    team.process_document("Summarize the findings", long_document)
+    task_prompts = [text for text in backend.texts() if text.startswith("Content to process:")]
+    assert task_prompts and all(len(text) < len(long_document) for text in task_prompts)
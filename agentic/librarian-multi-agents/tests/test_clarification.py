@@ -0,0 +1,30 @@
+"""Incremental clarification answers"""
+
+from conftest import FakeBackend
+from librarian_agents_team import LibrarianAgentsTeam
+from mock_server import default_responder
+
+def is_compile(params):
+    return "Subagent Results:" in str(params["messages"][0]["content"])
+
+def test_clarification_reruns_only_the_task_that_asked(long_document):
+    def responder(params):
+        text = str(params["messages"])
+        if "(second half)" in text and "The board" not in text and not is_compile(params):
+            return "I need clarification: which audience is this for?"
+        return default_responder(params)
+
+    backend = FakeBackend(responder)
+    team = LibrarianAgentsTeam(backend=backend)
+    output = team.process_document("Summarize", long_document)
+    assert "which audience" in output
+    assert [task.task_id for task in team.conversation_state["pending_clarifications"]] == ["task_2"]
+
+    calls = len(backend.calls)
+    final = team.answer_clarification("The board")
+    task_calls = [params for params in backend.calls[calls:] if not is_compile(params)]
+    assert len(task_calls) == 1 and "(second half)" in str(task_calls[0]["messages"])
+    assert '"clarification": "The board"' in str(task_calls[0]["messages"])
+    assert final.startswith("# Compiled Output")
+    assert team.conversation_state["pending_clarifications"] == []
+    assert team.answer_clarification("again").startswith("No pending clarifications")
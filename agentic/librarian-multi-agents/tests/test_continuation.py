@@ -0,0 +1,28 @@
+"""Continuation of compilations cut off at max_tokens"""
+
+from conftest import FakeBackend
+from librarian_agents_team import CONTINUATION_NOTICE, LibrarianAgentsTeam
+from llm_backend import LLMResponse
+from mock_server import default_responder
+
+def is_compile(params):
+    return "Subagent Results:" in str(params["messages"][0]["content"])
+
+def test_truncated_compilation_is_continued_from_a_prefill(long_document):
+    def responder(params):
+        if is_compile(params):
+            if params["messages"][-1]["role"] == "assistant":
+                return LLMResponse(text=" second part.", stop_reason="end_turn")
+            return LLMResponse(text="First part ", stop_reason="max_tokens")
+        return default_responder(params)
+
+    backend = FakeBackend(responder)
+    team = LibrarianAgentsTeam(backend=backend)
+    output = team.process_document("Summarize", long_document)
+    assert output == f"First part \n\n{CONTINUATION_NOTICE}"
+    assert team.conversation_state["awaiting_continuation"]
+
+    assert team.continue_processing() == "second part."
+    assert backend.calls[-1]["messages"][-1] == {"role": "assistant", "content": "First part"}
+    assert not team.conversation_state["awaiting_continuation"]
+    assert team.continue_processing().startswith("No pending continuation")
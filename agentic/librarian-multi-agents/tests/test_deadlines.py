@@ -0,0 +1,78 @@
+"""End-to-end deadlines and best-effort compilation"""
+
+import json
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from conftest import FakeBackend
+from librarian_agents_team import LibrarianAgentsTeam
+from llm_backend import (
+    AnthropicBackend, DeadlineExceeded, call_deadline, check_deadline, remaining_time
+)
+from mock_server import default_responder
+
+class SlowBackend(FakeBackend):
+    """Subagent calls take task_delay seconds and are cut off at the deadline"""
+
+    def __init__(self, task_delay: float):
+        super().__init__()
+        self.task_delay = task_delay
+
+    def create(self, **params):
+        check_deadline()
+        text = str(params["messages"])
+        if "JSON task breakdown" not in text and "Subagent Results:" not in text:
+            remaining = remaining_time()
+            if remaining is not None and remaining < self.task_delay:
+                time.sleep(remaining)
+                raise DeadlineExceeded("Deadline passed during the model call")
+            time.sleep(self.task_delay)
+        return super().create(**params)
+
+def test_empty_plan_without_deadline_compiles(long_document):
+    def responder(params):
+        if "JSON task breakdown" in str(params["messages"]):
+            return json.dumps({"tasks": []})
+        return default_responder(params)
+
+    team = LibrarianAgentsTeam(backend=FakeBackend(responder))
+    assert team.process_document("Summarize", long_document).startswith("# Compiled Output")
+
+def test_deadline_raises_when_tasks_cannot_finish(long_document):
+    team = LibrarianAgentsTeam(backend=SlowBackend(task_delay=0.4))
+    with pytest.raises(DeadlineExceeded):
+        team.process_document("Summarize", long_document, deadline=0.6)
+
+def test_best_effort_compiles_the_finished_tasks(long_document):
+    team = LibrarianAgentsTeam(backend=SlowBackend(task_delay=0.35))
+    output = team.process_document("Summarize", long_document, deadline=0.8, best_effort=True)
+    assert team.last_run.missed_deadline == ["task_2"]
+    assert "task_1" not in team.last_run.missed_deadline
+    assert output.startswith("# Compiled Output")
+
+def test_timeout_is_measured_after_the_client_is_built():
+    requests = []
+
+    class Messages:
+        def create(self, **params):
+            requests.append(params)
+            return SimpleNamespace(content=[SimpleNamespace(type="text", text="ok")],
+                                   stop_reason="end_turn", usage=None)
+
+    client = SimpleNamespace(messages=Messages())
+    client.with_options = lambda **options: client
+
+    class SlowClientBackend(AnthropicBackend):
+        @property
+        def client(self):
+            time.sleep(0.3)
+            return client
+
+    backend = SlowClientBackend()
+    with call_deadline(time.monotonic() + 0.5):
+        assert backend.create(model="m", max_tokens=10, messages=[]).text == "ok"
+    assert requests[0]["timeout"] < 0.25
+    backend.create(model="m", max_tokens=10, messages=[])
+    assert "timeout" not in requests[1]
@@ -0,0 +1,38 @@
+"""MinHash/LSH near-duplicate detection"""
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from document_chunker import ChunkMerger
+from document_dedup import NearDuplicateDetector
+
+BOILERPLATE = ("This report is confidential and intended solely for the named recipient. "
+               "Do not copy, forward or distribute it without written permission from the company.")
+
+def unique_paragraph(number):
+    return " ".join(f"paragraph{number} word{i} topic{i * number}" for i in range(25))
+
+def test_near_duplicates_map_to_the_earliest():
+    texts = [unique_paragraph(1), BOILERPLATE, unique_paragraph(2),
+             BOILERPLATE.replace("company", "company."), unique_paragraph(3), BOILERPLATE]
+    assert NearDuplicateDetector().find_representatives(texts) == [0, 1, 2, 1, 4, 1]
+
+def test_empty_texts_are_never_grouped():
+    assert NearDuplicateDetector().find_representatives(["", "  ", "!!"]) == [0, 1, 2]
+
+def test_collapse_keeps_back_references():
+    texts = [BOILERPLATE, unique_paragraph(1), BOILERPLATE]
+    unique, back_refs = NearDuplicateDetector().collapse(texts)
+    assert unique == [BOILERPLATE, unique_paragraph(1)]
+    assert back_refs == {0: [0, 2], 1: [1]}
+
+def test_collapsed_chunks_expand_to_the_original_order():
+    chunks = [{"content": text, "chunk_id": i}
+              for i, text in enumerate([BOILERPLATE, unique_paragraph(1), BOILERPLATE])]
+    collapsed = NearDuplicateDetector().collapse_chunks(chunks)
+    assert [chunk["position"] for chunk in collapsed] == [0, 1]
+    assert collapsed[0]["duplicates"] == [2]
+    expanded = ChunkMerger.expand_duplicates(collapsed)
+    assert [chunk["position"] for chunk in expanded] == [0, 1, 2]
+    assert expanded[2]["duplicate_of"] == 0
@@ -0,0 +1,44 @@
+"""SQLite FTS5 document library"""
+
+import pytest
+
+from document_library import DocumentLibrary
+from librarian_agents_team import LibrarianAgentsTeam
+
+@pytest.fixture
+def library(tmp_path):
+    with DocumentLibrary(str(tmp_path / "library.db")) as library:
+        library.add_document("solar.txt", content="Solar panels convert sunlight into electricity.")
+        library.add_document("wind.txt", content="Wind turbines generate power from moving air.")
+        yield library
+
+def test_search_ranks_matching_chunks(library):
+    hits = library.search("how do panels use sunlight")
+    assert [hit["source"] for hit in hits] == ["solar.txt"]
+    assert hits[0]["score"] > 0
+
+def test_search_stems_terms_and_filters_documents(library):
+    assert library.search("generating")[0]["source"] == "wind.txt"
+    wind_id = library.get_document("wind.txt")["id"]
+    assert library.search("electricity power", document_ids=[wind_id])[0]["source"] == "wind.txt"
+    assert library.search("!!!") == []
+
+def test_unchanged_documents_are_not_rechunked_and_changed_ones_are_replaced(library):
+    document_id = library.get_document("solar.txt")["id"]
+    assert library.add_document("solar.txt", content="Solar panels convert sunlight into electricity.") == document_id
+    library.add_document("solar.txt", content="Geothermal plants tap heat from underground.")
+    assert library.get_document(document_id)["content"].strip() == "Geothermal plants tap heat from underground."
+    assert library.search("sunlight") == []
+
+def test_remove_document_drops_its_chunks(library):
+    assert library.remove_document("wind.txt")
+    assert not library.remove_document("wind.txt")
+    assert library.search("turbines") == []
+    assert [doc["source"] for doc in library.list_documents()] == ["solar.txt"]
+
+def test_library_query_processes_matching_chunks(library, backend):
+    team = LibrarianAgentsTeam(backend=backend, library=library)
+    assert team.process_document("Summarize", library_query="turbines")
+    assert any("Wind turbines" in text for text in backend.texts())
+    assert not any("Solar panels" in text for text in backend.texts())
+    assert team.process_document("Summarize", library_query="zebra").startswith("No documents")
@@ -0,0 +1,46 @@
+"""Bulk and memory-mapped document loading"""
+
+import pytest
+
+from document_loader import DocumentLoader
+from document_source import MappedDocument
+
+@pytest.fixture
+def library(tmp_path):
+    (tmp_path / "a.txt").write_text("Alpha text", encoding="utf-8")
+    (tmp_path / "b.md").write_text("# Beta", encoding="utf-8")
+    (tmp_path / "notes.log").write_text("not a document", encoding="utf-8")
+    (tmp_path / "drafts").mkdir()
+    (tmp_path / "drafts" / "c.txt").write_text("Gamma draft", encoding="utf-8")
+    return tmp_path
+
+def test_find_documents_filters_and_excludes(library):
+    found = DocumentLoader.find_documents(str(library))
+    assert [path.rsplit("/", 1)[-1] for path in found] == ["a.txt", "b.md", "c.txt"]
+    assert len(DocumentLoader.find_documents(str(library), recursive=False)) == 2
+    assert len(DocumentLoader.find_documents(str(library), exclude=["drafts/*"])) == 2
+    assert len(DocumentLoader.find_documents(str(library), patterns=["*.md"])) == 1
+
+def test_find_documents_rejects_a_file(library):
+    with pytest.raises(NotADirectoryError):
+        DocumentLoader.find_documents(str(library / "a.txt"))
+
+def test_load_directory_yields_every_document(library):
+    loaded = dict(DocumentLoader.load_directory(str(library), thread_workers=2))
+    assert sorted(document["content"] for document in loaded.values()) == \
+        ["# Beta", "Alpha text", "Gamma draft"]
+
+def test_load_many_reports_failures_and_keeps_going(library):
+    progress = []
+    paths = [str(library / "a.txt"), str(library / "missing.txt"), str(library / "b.md")]
+    loaded = list(DocumentLoader.load_many(paths, on_progress=lambda *event: progress.append(event)))
+    assert sorted(path for path, _ in loaded) == [paths[0], paths[2]]
+    assert sorted(event[1] for event in progress) == [3, 3, 3]
+    failures = [event for event in progress if event[3] is not None]
+    assert [(event[2], type(event[3])) for event in failures] == [(paths[1], FileNotFoundError)]
+
+def test_large_text_files_are_memory_mapped(library):
+    document = DocumentLoader.load_document(str(library / "a.txt"), mmap_threshold=4)
+    assert document["mapped"] is True
+    assert isinstance(document["content"], MappedDocument)
+    assert DocumentLoader.load_document(str(library / "a.txt"), mmap_threshold=10_000)["content"] == "Alpha text"
@@ -0,0 +1,47 @@
+"""Header/footer removal and whitespace clean-up"""
+
+from document_preprocessor import DocumentPreprocessor
+
+def paged(bodies):
+    return "\n\n".join(
+        f"--- Page {number} ---\nACME Corp Annual Report\n{body}\nPage {number} of {len(bodies)}"
+        for number, body in enumerate(bodies, 1)
+    )
+
+def test_running_headers_and_page_numbers_are_removed():
+    content = paged([f"Body text of page {n} with   extra   spaces.\nMore text." for n in range(1, 6)])
+    cleaned, report = DocumentPreprocessor().process_text(content)
+    assert "ACME Corp Annual Report" not in cleaned
+    assert "of 5" not in cleaned
+    assert "--- Page 3 ---" in cleaned
+    assert "Body text of page 3 with extra spaces." in cleaned
+    assert report["lines_removed"] == 10
+    assert report["tokens_saved"] > 0
+
+def test_body_lines_are_kept():
+    content = paged(["Unique line A", "Unique line B", "Unique line C"])
+    cleaned, _ = DocumentPreprocessor().process_text(content)
+    for line in ("Unique line A", "Unique line B", "Unique line C"):
+        assert line in cleaned
+
+def test_indentation_is_kept():
+    content = "# Notes\n\n- item\n  - nested   item\n    - deeper\n\n    indented code  \n"
+    assert DocumentPreprocessor.normalize_whitespace(content) == (
+        "# Notes\n\n- item\n  - nested item\n    - deeper\n\n    indented code"
+    )
+
+def test_fenced_code_is_left_alone():
+    content = "Text  with  runs\n\n```python\ndef f(x):\n    return  x   # aligned\n```\n"
+    cleaned = DocumentPreprocessor.normalize_whitespace(content)
+    assert "Text with runs" in cleaned
+    assert "    return  x   # aligned" in cleaned
+
+def test_blank_line_runs_and_trailing_spaces_are_collapsed():
+    assert DocumentPreprocessor.normalize_whitespace("a  \n\n\n\n b\t\tc \n") == "a\n\n b c"
+
+def test_process_keeps_other_document_fields():
+    doc = {"content": "Plain  text", "format": "txt"}
+    result = DocumentPreprocessor().process(doc)
+    assert result["content"] == "Plain text"
+    assert result["format"] == "txt"
+    assert "preprocessing" in result
@@ -0,0 +1,82 @@
+"""Routing, conversation window and continuation of interactive sessions"""
+
+from conftest import FakeBackend
+from document_session import DocumentSession
+from librarian_agents_team import CONTINUATION_NOTICE, LibrarianAgentsTeam
+from llm_backend import LLMResponse
+from mock_server import default_responder
+
+def plan_calls(backend):
+    return sum("JSON task breakdown" in text for text in backend.texts())
+
+def make_session(backend, document, **options):
+    return DocumentSession(LibrarianAgentsTeam(backend=backend), document, **options)
+
+def test_first_question_runs_the_pipeline(backend, long_document):
+    session = make_session(backend, long_document)
+    session.ask("What does finding 3.4 concern?")
+    assert plan_calls(backend) == 1
+    assert session.stats["pipeline_runs"] == 1
+    assert session.digests == {}
+
+def test_follow_up_is_answered_from_digests(backend, long_document):
+    session = make_session(backend, long_document, top_k=2)
+    session.ask("Summarize the document")
+    session.ask("What does finding 3.4 concern?")
+    assert plan_calls(backend) == 1
+    assert session.stats["digest_answers"] == 1
+    assert 0 < len(session.digests) <= 2
+
+def test_document_wide_follow_up_runs_the_pipeline(backend, long_document):
+    session = make_session(backend, long_document)
+    session.ask("What does finding 3.4 concern?")
+    session.ask("Now give me an executive summary")
+    session.ask("What are the main themes across all chapters?")
+    assert plan_calls(backend) == 3
+    assert session.stats["digest_answers"] == 0
+
+def test_refinement_reads_only_the_conversation(backend, long_document):
+    session = make_session(backend, long_document)
+    session.ask("Summarize the document")
+    calls = len(backend.calls)
+    session.ask("Make it shorter")
+    assert len(backend.calls) == calls + 1
+    assert len(backend.calls[-1]["messages"]) == 3
+
+def test_conversation_is_trimmed_in_blocks(backend, long_document):
+    session = make_session(backend, long_document, max_turns=4, top_k=1)
+    session.ask("Summarize the document")
+    session.ask("What does finding 3.4 concern?")
+    for _ in range(3):
+        session.ask("Make it shorter")
+    assert len(session.messages) == 4
+    assert session.messages[0]["role"] == "user"
+    assert session.stats["turns_dropped"] == 3
+
+    # The digest left the conversation with its turn, so it is sent again
+    calls = len(backend.calls)
+    session.ask("What does finding 3.4 concern?")
+    assert len(backend.calls) == calls + 1
+    assert "Section digests:" in backend.texts()[-1]
+
+def test_cut_off_answer_can_be_continued():
+    def responder(params):
+        last = params["messages"][-1]
+        if last["role"] == "assistant":
+            return LLMResponse(text=" and the rest.", stop_reason="end_turn")
+        if "Question:" in str(last["content"]):
+            return LLMResponse(text="The first part", stop_reason="max_tokens")
+        return default_responder(params)
+
+    backend = FakeBackend(responder)
+    session = make_session(backend, "\n\n".join(f"Paragraph {n}. " + "word " * 400 for n in range(12)))
+    session.ask("Summarize the document")
+    answer = session.ask("What does paragraph 3 say?")
+    assert answer == f"The first part\n\n{CONTINUATION_NOTICE}"
+    assert session.awaiting_continuation
+
+    assert session.continue_answer() == " and the rest."
+    assert backend.calls[-1]["messages"][-1] == {"role": "assistant", "content": "The first part"}
+    assert not session.awaiting_continuation
+    assert session.messages[-1] == {"role": "assistant", "content": "The first part and the rest."}
+    assert session.continue_answer().startswith("No pending continuation")
@@ -0,0 +1,62 @@
+"""MappedDocument and chunking of memory-mapped files"""
+
+from document_chunker import DocumentChunker
+from document_source import MappedDocument
+
+def write(tmp_path, text):
+    path = tmp_path / "doc.txt"
+    path.write_bytes(text.encode("utf-8"))
+    return str(path)
+
+def test_slices_never_split_a_character(tmp_path):
+    with MappedDocument(write(tmp_path, "aé" * 10)) as doc:
+        assert doc[0:2] == "a"
+        assert doc[0:3] == "aé"
+        assert str(doc) == "aé" * 10
+
+def test_paragraph_and_line_offsets(tmp_path):
+    with MappedDocument(write(tmp_path, "one\ntwo\n\n\nthree\n\nfour")) as doc:
+        assert list(doc.iter_paragraphs()) == ["one\ntwo", "three", "four"]
+        assert doc.line_count() == 7
+        assert doc.line(4) == "three"
+
+def test_mapped_chunks_match_the_file(tmp_path):
+    text = "\n\n".join(f"Paragraph {i} " + "word " * 30 for i in range(50))
+    with MappedDocument(write(tmp_path, text)) as doc:
+        chunks = DocumentChunker(max_chunk_size=1000).chunk_mapped(doc)
+        assert len(chunks) > 1
+        assert all(chunk["end_offset"] - chunk["start_offset"] <= 1000 for chunk in chunks)
+        assert [chunk["chunk_id"] for chunk in chunks] == list(range(len(chunks)))
+        assert chunks[0]["content"].startswith("Paragraph 0")
+
+def test_span_without_blank_lines_is_split_at_lines(tmp_path):
+    text = "".join(f"line {i} " + "x" * 40 + "\n" for i in range(500))
+    with MappedDocument(write(tmp_path, text)) as doc:
+        chunks = DocumentChunker(max_chunk_size=1000).chunk_mapped(doc)
+        assert len(chunks) > 20
+        assert all(len(chunk["content"].encode("utf-8")) <= 1000 for chunk in chunks)
+        assert all(chunk["content"].endswith("\n") for chunk in chunks[:-1])
+        assert "".join(chunk["content"] for chunk in chunks) == text
+
+def test_span_without_line_breaks_is_split_at_the_byte_limit(tmp_path):
+    text = "é" * 5000
+    with MappedDocument(write(tmp_path, text)) as doc:
+        chunks = DocumentChunker(max_chunk_size=999).chunk_mapped(doc)
+        assert all(chunk["end_offset"] - chunk["start_offset"] <= 999 for chunk in chunks)
+        assert "".join(chunk["content"] for chunk in chunks) == text
+
+def test_oversized_pages_keep_their_page_number(tmp_path):
+    text = "--- Page 1 ---\n" + "short\n" + "--- Page 2 ---\n" + "long line\n" * 300
+    with MappedDocument(write(tmp_path, text)) as doc:
+        chunks = DocumentChunker(max_chunk_size=500).chunk_mapped(doc)
+        assert chunks[0]["pages"][0] == 1
+        assert all(chunk["pages"] == [2] for chunk in chunks[1:])
+
+def test_plan_request_gives_a_mapped_length_in_bytes(tmp_path):
+    from librarian_agents_team import LeadOrchestratorAgent
+    lead = LeadOrchestratorAgent(backend=object())
+    with MappedDocument(write(tmp_path, "aé" * 10)) as doc:
+        text = lead.build_plan_request("Summarize", doc)["messages"][0]["content"][1]["text"]
+    assert "Total document length: 30 bytes" in text
+    text = lead.build_plan_request("Summarize", "aé" * 10)["messages"][0]["content"][1]["text"]
+    assert "Total document length: 20 characters" in text
@@ -0,0 +1,65 @@
+"""TextRank extractive summaries used by budget mode"""
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import extractive_summarizer
+from extractive_summarizer import ExtractiveSummarizer
+
+TEXT = ("Solar capacity grew by 40 percent in 2023. Solar panels are cheaper than ever. "
+        "The weather was mild. Solar capacity and panels dominate new installations. "
+        "Lunch was served at noon. Installations of solar panels doubled in two years.")
+
+def test_split_sentences_rejoins_hard_wrapped_lines():
+    text = "This sentence is\nwrapped across lines. Next one.\n# Heading\n- item"
+    assert ExtractiveSummarizer.split_sentences(text) == [
+        "This sentence is wrapped across lines.", "Next one.", "# Heading", "- item"
+    ]
+
+def test_central_sentences_rank_highest():
+    sentences = ExtractiveSummarizer.split_sentences(TEXT)
+    scores = ExtractiveSummarizer().rank(sentences)
+    ranked = [sentences[i] for i in np.argsort(-scores)]
+    assert all("olar" in sentence for sentence in ranked[:2])
+
+def test_summary_keeps_original_order_within_budget():
+    summary, report = ExtractiveSummarizer(ratio=0.5).summarize(TEXT)
+    kept = summary.split("\n")
+    sentences = ExtractiveSummarizer.split_sentences(TEXT)
+    assert kept == [sentence for sentence in sentences if sentence in kept]
+    assert report["summary_tokens"] < report["original_tokens"]
+    assert report["sentences_kept"] < report["sentences_total"]
+
+def test_long_inputs_are_ranked_in_bounded_blocks(monkeypatch):
+    monkeypatch.setattr(extractive_summarizer, "MAX_BLOCK_SENTENCES", 50)
+    shapes = []
+    original = ExtractiveSummarizer._rank_block
+    def spy(self, tokens, idf):
+        shapes.append(len(tokens))
+        return original(self, tokens, idf)
+    monkeypatch.setattr(ExtractiveSummarizer, "_rank_block", spy)
+
+    sentences = [f"Sentence {i} talks about topic {i % 9} and item {i % 13}." for i in range(230)]
+    scores = ExtractiveSummarizer().rank(sentences)
+    assert shapes == [50, 50, 50, 50, 30]
+    assert scores.shape == (230,)
+    assert scores.sum() == pytest.approx(1.0)
+
+def test_invalid_ratio():
+    with pytest.raises(ValueError):
+        ExtractiveSummarizer(ratio=0)
+
+def test_budget_mode_reduces_text_tasks_only(backend):
+    from librarian_agents_team import AgentRole, LibrarianAgentsTeam, Task
+
+    content = " ".join(f"Sentence {i} reports that output grew by {i} percent." for i in range(40))
+    text_task = Task(task_id="task_1", description="Summarize", content=f"Requested section: results\n\n{content}",
+                     assigned_to=AgentRole.SUBAGENT_1)
+    table_task = Task(task_id="task_2", description="Tabulate", content=content,
+                      assigned_to=AgentRole.SUBAGENT_3)
+    savings = LibrarianAgentsTeam(backend=backend).apply_budget_mode([text_task, table_task], 0.25)
+    assert text_task.content.startswith("Requested section: results\n\n")
+    assert len(text_task.content) < len(content) / 2
+    assert table_task.content == content
+    assert savings["tokens_saved"] > 0 and savings["reduction_pct"] > 50
@@ -0,0 +1,23 @@
+"""Single-chunk documents go straight to one specialist"""
+
+from librarian_agents_team import AgentRole, LibrarianAgentsTeam
+
+SHORT = "Quarterly revenue rose 4 percent while costs held steady."
+
+def test_small_document_is_one_call(backend):
+    team = LibrarianAgentsTeam(backend=backend)
+    output = team.process_document("Summarize this", SHORT)
+    assert len(backend.calls) == 1
+    assert output.startswith("Processed (Summarize this)")
+    assert team.last_run.direct
+
+def test_table_requests_go_to_subagent_3(backend):
+    team = LibrarianAgentsTeam(backend=backend)
+    assert team.direct_dispatch_task("Put the figures in a table", SHORT).assigned_to == AgentRole.SUBAGENT_3
+    assert team.direct_dispatch_task("Summarize this", SHORT).assigned_to == AgentRole.SUBAGENT_1
+
+def test_large_documents_and_disabled_fast_path_are_planned(backend, long_document):
+    team = LibrarianAgentsTeam(backend=backend)
+    assert team.direct_dispatch_task("Summarize", long_document) is None
+    LibrarianAgentsTeam(backend=backend, fast_path=False).process_document("Summarize this", SHORT)
+    assert any("JSON task breakdown" in text for text in backend.texts())
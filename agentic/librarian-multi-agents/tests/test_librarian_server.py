@@ -0,0 +1,89 @@
+"""HTTP job server: submission, validation, back-pressure and results"""
+
+import asyncio
+import json
+import threading
+
+from conftest import FakeBackend
+from librarian_agents_team import LibrarianAgentsTeam
+from librarian_server import LibrarianServer
+from mock_server import default_responder
+
+async def http(port, method, path, body=None):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    data = json.dumps(body).encode() if body is not None else b""
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: test\r\nContent-Length: {len(data)}\r\n\r\n".encode() + data)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, payload = response.partition(b"\r\n\r\n")
+    status = int(head.split()[1])
+    if b"application/json" in head:
+        return status, json.loads(payload)
+    return status, payload.decode()
+
+def serve(team, test, **options):
+    async def main():
+        server = LibrarianServer(team, port=0, **options)
+        await server.start()
+        try:
+            return await test(server)
+        finally:
+            await server.stop()
+    return asyncio.run(main())
+
+def test_job_runs_and_returns_its_output(backend, long_document):
+    async def test(server):
+        status, job = await http(server.port, "POST", "/jobs",
+                                 {"request": "Summarize", "document": long_document})
+        assert status == 202
+        status, output = await http(server.port, "GET", f"/jobs/{job['job_id']}/result?wait=1")
+        assert status == 200 and output.startswith("# Compiled Output")
+        status, view = await http(server.port, "GET", f"/jobs/{job['job_id']}")
+        assert view["status"] == "done"
+        status, health = await http(server.port, "GET", "/health")
+        assert health["stats"]["done"] == 1
+
+    serve(LibrarianAgentsTeam(backend=backend), test)
+
+def test_invalid_jobs_are_rejected(backend, tmp_path):
+    async def test(server):
+        for payload in ({"document": "x"}, {"request": "Summarize"},
+                        {"request": "Summarize", "document": "x", "options": {"model": "big"}},
+                        {"request": "Summarize", "document": "x", "options": {"deadline": -1}},
+                        {"request": "Summarize", "document": "x", "options": {"budget_ratio": 0}},
+                        {"request": "Summarize", "document": "x", "options": {"budget_ratio": "0.5"}},
+                        {"request": "Summarize", "document": "x", "options": {"priority": "urgent"}},
+                        {"request": "Summarize", "path": "../secret.txt"}):
+            status, _ = await http(server.port, "POST", "/jobs", payload)
+            assert status == 400, payload
+        assert (await http(server.port, "GET", "/jobs/nope"))[0] == 404
+
+    serve(LibrarianAgentsTeam(backend=backend), test, document_root=str(tmp_path))
+
+def test_full_queue_answers_429_and_queued_jobs_can_be_cancelled():
+    release = threading.Event()
+
+    def responder(params):
+        release.wait(timeout=10)
+        return default_responder(params)
+
+    async def test(server):
+        first = server.submit({"request": "Summarize", "document": "first"})[1]
+        while server.busy == 0:
+            await asyncio.sleep(0.01)
+        status, second = server.submit({"request": "Summarize", "document": "second"})
+        assert status == 202
+        assert server.submit({"request": "Summarize", "document": "third"})[0] == 429
+
+        status, view = await http(server.port, "DELETE", f"/jobs/{second['job_id']}")
+        assert status == 200 and view["status"] == "cancelled"
+        assert (await http(server.port, "DELETE", f"/jobs/{first['job_id']}"))[0] == 409
+        # The cancelled job no longer holds the only queue slot
+        assert server.submit({"request": "Summarize", "document": "fourth"})[0] == 202
+        assert server.submit({"request": "Summarize", "document": "fifth"})[0] == 429
+        release.set()
+        status, output = await http(server.port, "GET", f"/jobs/{first['job_id']}/result?wait=1")
+        assert status == 200
+
+    serve(LibrarianAgentsTeam(backend=FakeBackend(responder)), test, workers=1, queue_size=1)
@@ -0,0 +1,79 @@
+"""Backend wrappers around the Messages API"""
+
+import os
+import threading
+import time
+
+import pytest
+
+from conftest import FakeBackend
+from librarian_agents_team import LibrarianAgentsTeam
+from llm_backend import (
+    DeadlineExceeded, LLMResponse, RateLimitedBackend, RecordReplayBackend, ReplayMiss, call_deadline
+)
+
+PARAMS = {"model": "m", "max_tokens": 10, "messages": [{"role": "user", "content": "hello"}]}
+
+def test_request_key_ignores_key_order():
+    reordered = {"messages": PARAMS["messages"], "max_tokens": 10, "model": "m"}
+    assert RecordReplayBackend.request_key(PARAMS) == RecordReplayBackend.request_key(reordered)
+    assert RecordReplayBackend.request_key(PARAMS) != RecordReplayBackend.request_key({**PARAMS, "model": "n"})
+
+def test_record_then_replay(tmp_path):
+    inner = FakeBackend(lambda params: LLMResponse(text="hi", stop_reason="end_turn", usage={"input_tokens": 3}))
+    RecordReplayBackend(str(tmp_path), mode="record", inner=inner).create(**PARAMS)
+    replay = RecordReplayBackend(str(tmp_path))
+    assert replay.create(**PARAMS) == LLMResponse(text="hi", stop_reason="end_turn", usage={"input_tokens": 3})
+    assert replay.hits == 1 and len(inner.calls) == 1
+    assert [name for name in os.listdir(tmp_path) if name.endswith(".tmp")] == []
+
+def test_replay_miss_and_auto_mode(tmp_path, backend):
+    with pytest.raises(ReplayMiss):
+        RecordReplayBackend(str(tmp_path)).create(**PARAMS)
+    auto = RecordReplayBackend(str(tmp_path), mode="auto", inner=backend)
+    auto.create(**PARAMS)
+    auto.create(**PARAMS)
+    assert (auto.recorded, auto.hits, len(backend.calls)) == (1, 1, 1)
+
+def test_replayed_pipeline_makes_no_calls(tmp_path, backend, long_document):
+    recorder = RecordReplayBackend(str(tmp_path), mode="record", inner=backend)
+    expected = LibrarianAgentsTeam(backend=recorder).process_document("Summarize", long_document)
+    replayed = LibrarianAgentsTeam(backend=RecordReplayBackend(str(tmp_path)))
+    assert replayed.process_document("Summarize", long_document) == expected
+
+def test_replay_latency_respects_the_deadline(tmp_path, backend):
+    RecordReplayBackend(str(tmp_path), mode="record", inner=backend).create(**PARAMS)
+    slow = RecordReplayBackend(str(tmp_path), latency=5.0)
+    with call_deadline(time.monotonic() + 0.1):
+        with pytest.raises(DeadlineExceeded):
+            slow.create(**PARAMS)
+
+def test_rate_limit_spreads_calls(backend):
+    limited = RateLimitedBackend(backend, requests_per_minute=600)
+    start = time.monotonic()
+    for _ in range(605):
+        limited.create(**PARAMS)
+    assert time.monotonic() - start >= 0.4
+    assert limited.waited_seconds > 0
+
+def test_concurrency_cap():
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    def responder(params):
+        with lock:
+            active.append(1)
+            peak.append(len(active))
+        time.sleep(0.02)
+        with lock:
+            active.pop()
+        return "ok"
+
+    limited = RateLimitedBackend(FakeBackend(responder), max_concurrent=2)
+    threads = [threading.Thread(target=limited.create, kwargs=PARAMS) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert max(peak) == 2
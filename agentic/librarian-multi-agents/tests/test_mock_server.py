@@ -0,0 +1,59 @@
+"""Mock Messages API: responses, simulated caching and fault profiles"""
+
+import pytest
+
+from mock_server import FaultProfile, MockAnthropicServer
+
+def request(text, cached=True, **params):
+    block = {"type": "text", "text": text}
+    if cached:
+        block["cache_control"] = {"type": "ephemeral"}
+    return {"model": "mock", "max_tokens": 1000, "system": "S" * 400,
+            "messages": [{"role": "user", "content": [block, {"type": "text", "text": "Task: go"}]}],
+            **params}
+
+@pytest.fixture
+def server():
+    with MockAnthropicServer() as server:
+        yield server
+
+def test_second_identical_prefix_is_read_from_cache(server):
+    first = server.usage(request("D" * 4000), "answer")
+    second = server.usage(request("D" * 4000), "answer")
+    assert first["cache_creation_input_tokens"] > 1000 and first["cache_read_input_tokens"] == 0
+    assert second["cache_read_input_tokens"] == first["cache_creation_input_tokens"]
+    assert server.usage(request("D" * 4000, cached=False), "answer")["cache_read_input_tokens"] == 0
+
+def test_message_truncates_at_max_tokens_and_continues_prefills(server):
+    server.responder = lambda params: "x" * 100
+    message = server.message(request("doc", max_tokens=5))
+    assert message["stop_reason"] == "max_tokens"
+    assert message["content"][0]["text"] == "x" * 20
+
+    server.responder = lambda params: "Hello world"
+    params = request("doc")
+    params["messages"].append({"role": "assistant", "content": "Hello"})
+    assert server.message(params)["content"][0]["text"] == " world"
+
+def test_scripted_profile_cycles_outcomes():
+    profile = FaultProfile(script=("429", "ok", "slow"), latency_median=0.1, slow_factor=10.0)
+    with MockAnthropicServer(profile=profile) as server:
+        outcomes = [server.decide() for _ in range(4)]
+    assert [outcome for outcome, _ in outcomes] == ["429", "ok", "slow", "429"]
+    assert outcomes[2][1] == pytest.approx(1.0)
+
+def test_unknown_profile_is_rejected():
+    with pytest.raises(ValueError):
+        MockAnthropicServer(profile="nope")
+
+def test_sdk_round_trip_with_streaming(long_document):
+    pytest.importorskip("anthropic")
+    from librarian_agents_team import LibrarianAgentsTeam
+    from llm_backend import AnthropicBackend
+
+    with MockAnthropicServer() as server:
+        for stream in (None, True):
+            backend = AnthropicBackend(base_url=server.url, api_key="test", stream=stream)
+            output = LibrarianAgentsTeam(backend=backend).process_document("Summarize", long_document)
+            assert output.startswith("# Compiled Output")
+        assert server.request_count == 8
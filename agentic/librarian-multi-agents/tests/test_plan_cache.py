@@ -0,0 +1,67 @@
+"""Plan cache keys, LRU behaviour and persistence"""
+
+import json
+import os
+import threading
+
+from librarian_agents_team import LibrarianAgentsTeam
+from plan_cache import PlanCache
+
+PLAN = {"tasks": [{"task_id": "task_1", "description": "Summarize", "assigned_to": "subagent_1"}]}
+
+def test_key_ignores_case_punctuation_and_document_details():
+    cache = PlanCache()
+    first = "Chapter 1\nText " * 100
+    second = "Chapter 1\nOther words " * 100
+    assert cache.key("Summarize, please!", first) == cache.key("summarize please", second)
+    assert cache.key("Summarize", first) != cache.key("Summarize", "x" * 300_000)
+
+def test_lru_eviction():
+    cache = PlanCache(max_entries=2)
+    cache.put("a", PLAN)
+    cache.put("b", PLAN)
+    cache.get("a")
+    cache.put("c", PLAN)
+    assert cache.get("b") is None
+    assert cache.get("a") == PLAN
+    assert (cache.hits, cache.misses) == (2, 1)
+
+def test_persistence_round_trip(tmp_path):
+    path = str(tmp_path / "plans.json")
+    PlanCache(path=path).put("key", PLAN)
+    assert PlanCache(path=path).get("key") == PLAN
+
+def test_concurrent_puts_share_one_file(tmp_path):
+    path = str(tmp_path / "plans.json")
+    cache = PlanCache(path=path)
+    errors = []
+
+    def put_many(worker):
+        try:
+            for i in range(30):
+                cache.put(f"{worker}-{i}", PLAN)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=put_many, args=(worker,)) for worker in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    with open(path, encoding="utf-8") as f:
+        assert len(json.load(f)["plans"]) == 240
+    assert os.listdir(tmp_path) == ["plans.json"]
+
+def test_save_failure_does_not_fail_the_run(tmp_path, backend, long_document):
+    cache = PlanCache(path=str(tmp_path / "missing-dir" / "plans.json"))
+    team = LibrarianAgentsTeam(backend=backend, plan_cache=cache)
+    assert team.process_document("Summarize", long_document)
+    assert len(cache) == 1
+
+def test_cached_plan_skips_planning(backend, long_document):
+    team = LibrarianAgentsTeam(backend=backend, plan_cache=PlanCache())
+    team.process_document("Summarize", long_document)
+    planned = sum("JSON task breakdown" in text for text in backend.texts())
+    team.process_document("Summarize", long_document.replace("topic", "subject"))
+    assert sum("JSON task breakdown" in text for text in backend.texts()) == planned == 1
@@ -0,0 +1,45 @@
+"""One team serving concurrent runs"""
+
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from conftest import FakeBackend
+from librarian_agents_team import LibrarianAgentsTeam, RunContext
+from mock_server import default_responder
+
+def test_concurrent_runs_keep_their_own_state(long_document):
+    def responder(params):
+        time.sleep(0.005)
+        return default_responder(params)
+
+    team = LibrarianAgentsTeam(backend=FakeBackend(responder))
+    requests = [f"Summarize for reader {number}" for number in range(8)]
+
+    def run(request):
+        output = team.process_document(request, long_document)
+        return output, team.last_run.user_request, [task.description for task in team.current_tasks]
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(run, requests))
+    for request, (output, run_request, descriptions) in zip(requests, results):
+        assert run_request == request
+        assert all(description.startswith(request) for description in descriptions)
+        assert set(re.findall(r"reader \d+", output)) == {request.split("for ")[1]}
+
+def test_last_run_is_per_thread(backend, long_document):
+    team = LibrarianAgentsTeam(backend=backend)
+    team.process_document("Summarize", long_document)
+    seen = []
+    thread = threading.Thread(target=lambda: seen.append(team.last_run))
+    thread.start()
+    thread.join()
+    assert seen == [None] and team.last_run is not None
+
+def test_explicit_run_is_filled_in(backend, long_document):
+    team = LibrarianAgentsTeam(backend=backend)
+    run = RunContext()
+    team.process_document("Summarize", long_document, run=run)
+    assert run.user_request == "Summarize" and len(run.tasks) == 2
+    assert team.continue_processing(run).startswith("No pending continuation")
@@ -0,0 +1,50 @@
+"""Priority and fair-share scheduling of model calls"""
+
+import threading
+import time
+
+from conftest import FakeBackend
+from llm_backend import ScheduledBackend, call_tag
+
+def test_freed_slots_go_to_urgent_then_fair_share():
+    gate = threading.Event()
+    order = []
+    lock = threading.Lock()
+
+    def responder(params):
+        label = params["messages"][0]["content"]
+        if label == "blocker":
+            gate.wait(timeout=10)
+        with lock:
+            order.append(label)
+        return "ok"
+
+    backend = ScheduledBackend(FakeBackend(responder), max_concurrent=1)
+
+    def call(label, priority, tenant):
+        with call_tag(priority, tenant):
+            backend.create(model="m", max_tokens=1, messages=[{"role": "user", "content": label}])
+
+    threads = [threading.Thread(target=call, args=("blocker", "normal", "a"))]
+    threads[0].start()
+    time.sleep(0.05)
+    queued = [("bulk-1", "batch", "bulk"), ("bulk-2", "batch", "bulk"), ("bulk-3", "batch", "bulk"),
+              ("small-1", "batch", "small"), ("chat", "interactive", "support")]
+    for args in queued:
+        thread = threading.Thread(target=call, args=args)
+        thread.start()
+        threads.append(thread)
+        time.sleep(0.02)
+    gate.set()
+    for thread in threads:
+        thread.join()
+
+    assert order[:3] == ["blocker", "chat", "bulk-1"]
+    # Tenant "small" is not stuck behind all of tenant "bulk"'s calls
+    assert order.index("small-1") < order.index("bulk-3")
+    assert backend.stats["queued"] == 5
+
+def test_calls_start_immediately_while_slots_are_free(backend):
+    scheduled = ScheduledBackend(backend, max_concurrent=4)
+    scheduled.create(model="m", max_tokens=1, messages=[])
+    assert scheduled.stats["queued"] == 0 and scheduled.stats["normal_calls"] == 1
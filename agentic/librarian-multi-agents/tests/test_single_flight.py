@@ -0,0 +1,72 @@
+"""Identical in-flight model calls are coalesced"""
+
+import threading
+import time
+
+import pytest
+
+from conftest import FakeBackend
+from llm_backend import DeadlineExceeded, SingleFlightBackend, call_deadline
+
+PARAMS = {"model": "m", "max_tokens": 10, "messages": [{"role": "user", "content": "hello"}]}
+
+def run_together(count, target):
+    results, errors = [], []
+
+    def call():
+        try:
+            results.append(target())
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+def slow_backend(delay, reply="answer"):
+    def responder(params):
+        time.sleep(delay)
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+    return FakeBackend(responder)
+
+def test_identical_concurrent_calls_share_one_request():
+    inner = slow_backend(0.2)
+    backend = SingleFlightBackend(inner)
+    results, errors = run_together(5, lambda: backend.create(**PARAMS))
+    assert errors == [] and [response.text for response in results] == ["answer"] * 5
+    assert len(inner.calls) == 1
+    assert backend.stats == {"calls": 1, "coalesced": 4}
+
+def test_nothing_is_cached_after_the_call_finishes(backend):
+    single = SingleFlightBackend(backend)
+    single.create(**PARAMS)
+    single.create(**PARAMS)
+    single.create(**{**PARAMS, "model": "other"})
+    assert len(backend.calls) == 3
+
+def test_failure_reaches_every_waiter():
+    backend = SingleFlightBackend(slow_backend(0.2, ConnectionError("down")))
+    results, errors = run_together(3, lambda: backend.create(**PARAMS))
+    assert results == [] and len(errors) == 3
+    assert all(isinstance(error, ConnectionError) for error in errors)
+
+def test_waiter_gives_up_at_its_own_deadline():
+    backend = SingleFlightBackend(slow_backend(0.5))
+    leader = threading.Thread(target=backend.create, kwargs=PARAMS)
+    leader.start()
+    time.sleep(0.05)
+    with call_deadline(time.monotonic() + 0.1):
+        with pytest.raises(DeadlineExceeded):
+            backend.create(**PARAMS)
+    leader.join()
+
+def test_leader_timeout_error_is_not_turned_into_a_deadline():
+    backend = SingleFlightBackend(slow_backend(0.2, TimeoutError("read timed out")))
+    results, errors = run_together(3, lambda: backend.create(**PARAMS))
+    assert len(errors) == 3
+    assert all(type(error) is TimeoutError and str(error) == "read timed out" for error in errors)
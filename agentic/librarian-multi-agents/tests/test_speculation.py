@@ -0,0 +1,69 @@
+"""Speculative digests started while the Lead Orchestrator plans"""
+
+import json
+from concurrent.futures import Future
+
+from conftest import FakeBackend
+from librarian_agents_team import AgentRole, DIGEST_DESCRIPTION, LibrarianAgentsTeam, Task
+from mock_server import _request_text, default_responder
+
+def digest_futures(*chunk_ids):
+    futures = {}
+    for chunk_id in chunk_ids:
+        future = Future()
+        future.set_result({"result": f"digest {chunk_id}", "status": "completed",
+                           "needs_clarification": False})
+        futures[chunk_id] = future
+    return futures
+
+def make_task(description, chunk_ids):
+    return Task(task_id="task_1", description=description, content="raw chunks",
+                assigned_to=AgentRole.SUBAGENT_1, chunk_ids=chunk_ids)
+
+def test_digest_task_uses_the_digests_as_its_result(backend):
+    team = LibrarianAgentsTeam(backend=backend)
+    task = make_task(DIGEST_DESCRIPTION, [1, 0])
+    stats = team.apply_speculation([task], digest_futures(0, 1, 2))
+    assert task.status == "completed"
+    assert task.result == "digest 0\n\ndigest 1"
+    assert stats == {"started": 3, "used": 2, "cancelled": 0}
+
+def test_summary_task_keeps_its_instructions_and_content(backend):
+    team = LibrarianAgentsTeam(backend=backend)
+    task = make_task("Summarize the risks as a numbered list for the board", [0])
+    stats = team.apply_speculation([task], digest_futures(0))
+    assert task.status == "pending" and task.result is None
+    assert task.content == "raw chunks"
+    assert stats["used"] == 0 and stats["cancelled"] == 0
+
+def test_other_tasks_are_left_alone(backend):
+    team = LibrarianAgentsTeam(backend=backend)
+    translate = make_task("Translate this section into French", [0])
+    partial = make_task(DIGEST_DESCRIPTION, [0, 5])
+    team.apply_speculation([translate, partial], digest_futures(0))
+    assert translate.content == partial.content == "raw chunks"
+    assert translate.status == partial.status == "pending"
+
+def test_planned_digest_task_finishes_without_its_own_call(long_document):
+    def responder(params):
+        text = _request_text(params)
+        if "JSON task breakdown" in text:
+            assert DIGEST_DESCRIPTION in text
+            return json.dumps({"tasks": [
+                {"task_id": "task_1", "description": DIGEST_DESCRIPTION,
+                 "assigned_to": "subagent_2", "content_section": "Section 3"},
+                {"task_id": "task_2", "description": "Quote the findings on topic 2",
+                 "assigned_to": "subagent_1", "content_section": "topic 2"},
+            ]})
+        return default_responder(params)
+
+    backend = FakeBackend(responder)
+    team = LibrarianAgentsTeam(backend=backend, speculative_chunks=50)
+    team.process_document("Summarize the findings", long_document)
+    stats = team.run_stats["speculation"]
+    assert stats["used"] > 0
+    task_calls = [text for text in backend.texts() if text.startswith("Content to process:")]
+    assert sum(DIGEST_DESCRIPTION in text for text in task_calls) == stats["started"]
+    assert sum("Quote the findings on topic 2" in text for text in task_calls) == 1
+    task_1 = team.current_tasks[0]
+    assert task_1.status == "completed" and task_1.result.startswith("Processed (Digest this section")
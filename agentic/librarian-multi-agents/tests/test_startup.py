@@ -0,0 +1,29 @@
+"""Heavy dependencies stay out of import time"""
+
+import os
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def loaded_modules(code):
+    result = subprocess.run([sys.executable, "-c", code + "; import sys; print(' '.join(sys.modules))"],
+                            cwd=HERE, capture_output=True, text=True, check=True)
+    return set(result.stdout.split())
+
+def test_imports_do_not_load_the_sdk_or_numpy():
+    modules = loaded_modules("import cli, librarian_agents_team, document_loader")
+    assert not {"anthropic", "httpx", "numpy", "pypdf", "docx"} & modules
+
+def test_client_is_created_on_first_use():
+    import llm_backend
+    fake = object()
+    previous = llm_backend._client
+    llm_backend.set_client(fake)
+    try:
+        assert llm_backend.get_client() is fake
+        assert llm_backend.AnthropicBackend().client is fake
+        from librarian_agents_team import client
+        assert client is fake
+    finally:
+        llm_backend.set_client(previous)
@@ -0,0 +1,84 @@
+"""Local table rendering and the table-conversion fast path"""
+
+import pytest
+
+from librarian_agents_team import LibrarianAgentsTeam
+from table_renderer import TableRenderer
+
+TABLES = [
+    {"table_number": 1, "data": [["Name", "Score"], ["Ada", "9"]]},
+    {"table_number": 2, "data": [["Region", "Q1", "Q2"], ["North", "10", "12"]]},
+    {"table_number": 3, "data": [["Year", "Total"], ["2024", "99"]]},
+]
+
+@pytest.mark.parametrize("request_text, expected", [
+    ("Convert the tables to HTML", "html"),
+    ("Render all tables as Markdown", "markdown"),
+    ("Export tables 1-2 to CSV", "csv"),
+    ("Summarize the tables in HTML", None),
+    ("Convert the tables to HTML and CSV", None),
+    ("Convert this report to Markdown including its tables", None),
+    ("Convert the document's tables to HTML", None),
+    ("Convert the first table to HTML", None),
+    ("Convert the Score column of table 1 to CSV", None),
+    ("Convert the text to Markdown", None),
+])
+def test_detect_conversion(request_text, expected):
+    assert TableRenderer.detect_conversion(request_text) == expected
+
+@pytest.mark.parametrize("request_text, numbers", [
+    ("Convert table 2 to HTML", [2]),
+    ("Convert tables 1 and 3 to CSV", [1, 3]),
+    ("Convert tables 2-3 to Markdown", [2, 3]),
+    ("Convert table no. 3 to HTML", [3]),
+    ("Convert the tables to HTML", None),
+])
+def test_requested_table_numbers(request_text, numbers):
+    assert TableRenderer.requested_table_numbers(request_text) == numbers
+
+def test_markdown_and_csv():
+    assert TableRenderer.to_markdown([["a", "b|c"], ["1"]]) == "| a | b\\|c |\n| --- | --- |\n| 1 |  |"
+    assert TableRenderer.to_csv([["a", "b,c"], ["1", "2"]]) == 'a,"b,c"\n1,2\n'
+
+def test_repeated_values_stay_separate_cells():
+    html = TableRenderer.to_html([["Item", "Q1", "Q2"], ["Widgets", "0", "0"], ["Gadgets", "0", "0"]])
+    assert "colspan" not in html and "rowspan" not in html
+    assert html.count("<td>0</td>") == 4
+
+def test_spans_come_from_cell_identity():
+    region, sales, north = object(), object(), object()
+    cells = [[region, sales, sales], [north, object(), object()], [north, object(), object()]]
+    spans = TableRenderer.spans_from_cells(cells)
+    assert spans[0] == [[1, 1], [1, 2], None]
+    assert spans[1][0] == [2, 1] and spans[2][0] is None
+    assert TableRenderer.spans_from_cells([[object(), object()]]) is None
+
+    table = [["Region", "Sales", "Sales"], ["North", "1", "2"], ["North", "3", "4"]]
+    html = TableRenderer.to_html(table, spans)
+    assert '<th colspan="2">Sales</th>' in html
+    assert '<td rowspan="2">North</td>' in html
+    rendered = TableRenderer.render_tables([{"table_number": 1, "data": table, "spans": spans}], "html")
+    assert '<td rowspan="2">North</td>' in rendered
+
+def test_render_rejects_unknown_format():
+    with pytest.raises(ValueError):
+        TableRenderer.render([["a"]], "xml")
+
+def test_numbered_table_is_rendered_alone(backend):
+    team = LibrarianAgentsTeam(backend=backend)
+    output = team.process_document("Convert table 2 to HTML", "document text", tables=TABLES)
+    assert "<h3>Table 2</h3>" in output
+    assert "Table 1" not in output and "Table 3" not in output
+    assert backend.calls == []
+
+def test_unknown_table_number_goes_to_the_model(backend):
+    team = LibrarianAgentsTeam(backend=backend)
+    team.process_document("Convert table 7 to HTML", "document text", tables=TABLES)
+    assert backend.calls
+
+def test_document_conversion_keeps_the_text(backend):
+    team = LibrarianAgentsTeam(backend=backend)
+    team.process_document("Convert this report to Markdown including its tables",
+                          "Body text of the report", tables=TABLES)
+    assert backend.calls
+    assert any("Body text of the report" in text for text in backend.texts())